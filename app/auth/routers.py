@@ -3,24 +3,25 @@ from fastapi import APIRouter, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm
 from app.auth.service import AuthService
 from app.auth.schemas import UserCreate, UserInDB
+from app.utils.metrics import TimedRoute
 from app.utils.security import authenticate, get_current_user
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post(
     "/auth/register", status_code=status.HTTP_201_CREATED, response_model=UserInDB
 )
-def register(user: UserCreate, service: AuthService = Depends()):
-    return service.register(user)
+async def register(user: UserCreate, service: AuthService = Depends()):
+    return await service.register(user)
 
 
 @router.post("/auth/login")
-def login(
+async def login(
     form: Annotated[OAuth2PasswordRequestForm, Depends()],
     auth_service: AuthService = Depends(),
 ):
-    return auth_service.login(form.username, form.password)
+    return await auth_service.login(form.username, form.password)
 
 
 @router.get(
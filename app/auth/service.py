@@ -1,10 +1,15 @@
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.auth.models import User
 from app.auth.schemas import UserCreate, UserInDB, TokenData, Token
-from app.utils.security import hash_password, verify_password, create_access_token
+from app.utils.security import (
+    hash_password,
+    verify_and_update_password,
+    create_access_token,
+)
 
 
 class AuthService:
@@ -12,21 +17,26 @@ class AuthService:
     def __init__(self, db: Session = Depends(get_db)):
         self.db = db
 
-    def register(self, user_data: UserCreate) -> UserInDB:
-
-        existed_user = self.find_user_by_email(user_data.email)
+    async def register(self, user_data: UserCreate) -> UserInDB:
+        # Async so the hash is awaited, the queries run on the threadpool
+        existed_user = await run_in_threadpool(
+            self.find_user_by_email, user_data.email
+        )
 
         if existed_user:
             raise HTTPException(status_code=400, detail="Email already registered")
 
         user_dict = user_data.model_dump()
 
-        hashed_password = hash_password(user_dict["password"])
+        hashed_password = await hash_password(user_dict["password"])
 
         user_dict["password"] = hashed_password
 
         user_dict["username"] = user_dict["email"]
 
+        return await run_in_threadpool(self._add_user, user_dict)
+
+    def _add_user(self, user_dict: dict) -> UserInDB:
         user = User(**user_dict)
 
         self.db.add(user)
@@ -35,18 +45,31 @@ class AuthService:
 
         return UserInDB.model_validate(user)
 
-    def login(self, username: str, password: str) -> Token:
+    async def login(self, username: str, password: str) -> Token:
 
-        user = self.find_user_by_email(username)
+        user = await run_in_threadpool(self.find_user_by_email, username)
 
-        if not user or not verify_password(password, user.password):
+        if user:
+            is_valid, new_hash = await verify_and_update_password(
+                password, user.password
+            )
+        else:
+            is_valid, new_hash = False, None
+
+        if not is_valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid username or password",
             )
 
+        # Read before the commit expires it
         token_data = TokenData(user_id=user.id)  # type: ignore
 
+        # Rehash with the current bcrypt cost
+        if new_hash:
+            user.password = new_hash
+            await run_in_threadpool(self.db.commit)
+
         access_token = create_access_token(token_data)
 
         return Token(access_token=access_token, token_type="bearer")
@@ -0,0 +1,186 @@
+import csv
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import typer
+
+from app.config import settings
+from app.database import SessionLocal, create_tables, engine
+from app.auth.models import User  # noqa: F401
+from app.client.models import Client  # noqa: F401
+from app.item.models import Item  # noqa: F401
+from app.invoice.models import Invoice, InvoiceItem  # noqa: F401
+from app.payment.models import Payment  # noqa: F401
+from app.jobs.models import Job  # noqa: F401
+from app.events.models import Event  # noqa: F401
+from app.events.service import EventService
+from app.fx.service import FxRateService
+from app.report.service import RollupService, horizon_start
+from app.invoice.service import InvoiceService
+from app.invoice.sweeper import sweep_overdue_invoices
+from app.jobs.service import JobService
+from app.jobs.worker import Worker
+from app.utils.partitions import archive_partitions, ensure_partitions
+from app.utils.tenancy import set_current_owner
+
+cli = typer.Typer()
+
+
+@cli.command()
+def refresh_rollups(
+    start: Optional[str] = typer.Option(None, help="First day, YYYY-MM-DD"),
+    end: Optional[str] = typer.Option(None, help="Last day, YYYY-MM-DD"),
+    days: Optional[int] = typer.Option(
+        None, help="Refresh only the last N days instead of the whole horizon"
+    ),
+):
+    end_day = date.fromisoformat(end) if end else date.today()
+    if start:
+        start_day = date.fromisoformat(start)
+    elif days is not None:
+        start_day = end_day - timedelta(days=days)
+    else:
+        start_day = horizon_start()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        rows = RollupService(db).refresh(start_day, end_day)
+    finally:
+        db.close()
+
+    typer.echo(f"Rebuilt {rows} rollup rows from {start_day} to {end_day}")
+
+
+@cli.command()
+def sweep_overdue(
+    chunk_size: Optional[int] = typer.Option(None, help="Invoices per batch"),
+):
+    swept = sweep_overdue_invoices(chunk_size)
+    typer.echo(f"Marked {swept} invoices as overdue")
+
+
+@cli.command()
+def recalculate_invoices(
+    issued_from: Optional[str] = typer.Option(None, help="First day, YYYY-MM-DD"),
+    issued_to: Optional[str] = typer.Option(None, help="Exclusive end, YYYY-MM-DD"),
+    client_id: Optional[int] = typer.Option(None),
+    owner_id: Optional[int] = typer.Option(None, help="Only this user's invoices"),
+    chunk_size: Optional[int] = typer.Option(None, help="Invoices per transaction"),
+):
+    db = SessionLocal()
+    try:
+        if owner_id is not None:
+            set_current_owner(db, owner_id)
+        result = InvoiceService(db).recalculate(
+            date.fromisoformat(issued_from) if issued_from else None,
+            date.fromisoformat(issued_to) if issued_to else None,
+            client_id,
+            chunk_size,
+        )
+    finally:
+        db.close()
+
+    typer.echo(
+        f"Checked {result.invoices} invoices, changed {result.invoices_changed} "
+        f"invoices and {result.items_changed} items"
+    )
+
+
+@cli.command()
+def import_fx_rates(
+    path: str = typer.Argument(..., help="CSV file with currency,day,rate columns"),
+):
+    with open(path, newline="") as source:
+        rows = [
+            {
+                "currency": row["currency"],
+                "day": date.fromisoformat(row["day"]),
+                "rate": row["rate"],
+            }
+            for row in csv.DictReader(source)
+        ]
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        filled = FxRateService(db).import_rates(rows)
+    finally:
+        db.close()
+    typer.echo(f"Imported {len(rows)} rates, filled {filled} days")
+
+
+@cli.command()
+def fill_fx_rates():
+    db = SessionLocal()
+    try:
+        filled = FxRateService(db).fill_gaps(date.today())
+        db.commit()
+    finally:
+        db.close()
+    typer.echo(f"Filled {filled} days")
+
+
+@cli.command()
+def run_worker(
+    queue: str = typer.Option("default"),
+    concurrency: Optional[int] = typer.Option(None, help="Jobs run at once"),
+    batch_size: Optional[int] = typer.Option(None, help="Jobs claimed at once"),
+):
+    create_tables()
+    Worker(queue, concurrency, batch_size).run()
+
+
+@cli.command()
+def purge_jobs(
+    days: int = typer.Option(7, help="Keep jobs finished in the last N days"),
+):
+    db = SessionLocal()
+    try:
+        purged = JobService(db).purge(datetime.now() - timedelta(days=days))
+    finally:
+        db.close()
+    typer.echo(f"Purged {purged} finished jobs")
+
+
+@cli.command()
+def purge_events(
+    hours: int = typer.Option(
+        settings.events_retention_hours, help="Keep events of the last N hours"
+    ),
+):
+    db = SessionLocal()
+    try:
+        purged = EventService(db).purge(datetime.now() - timedelta(hours=hours))
+    finally:
+        db.close()
+    typer.echo(f"Purged {purged} events")
+
+
+@cli.command()
+def create_partitions(
+    months_ahead: int = typer.Option(
+        settings.partition_months_ahead, help="Months to create past the current one"
+    ),
+    since: Optional[str] = typer.Option(None, help="First month, YYYY-MM-DD"),
+):
+    with engine.begin() as conn:
+        created = ensure_partitions(
+            conn, months_ahead, date.fromisoformat(since) if since else None
+        )
+    typer.echo(f"Created {len(created)} partitions")
+
+
+@cli.command()
+def archive(
+    before: str = typer.Option(..., help="Archive months ending before YYYY-MM-DD"),
+):
+    with engine.begin() as conn:
+        archived = archive_partitions(conn, date.fromisoformat(before))
+    for name in archived:
+        typer.echo(f"Archived {name}")
+    typer.echo(f"Archived {len(archived)} partitions")
+
+
+if __name__ == "__main__":
+    cli()
@@ -7,10 +7,12 @@ from sqlalchemy import (
     Integer,
     Boolean,
     ForeignKey,
+    Index,
     func,
 )
 
 from app.database import Base
+from app.utils.search import search_text, trigram_index
 
 
 class Client(Base):
@@ -26,6 +28,19 @@ class Client(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=datetime.now)
+    # Bumped on every write, for optimistic concurrency
+    version = Column(Integer, nullable=False, server_default="1")
     owner = relationship("User", back_populates="clients")
     invoices = relationship("Invoice", back_populates="client")
     payments = relationship("Payment", back_populates="client")
+
+    __table_args__ = (Index("ix_clients_owner_id_id", "owner_id", "id"),)
+    # ORM flushes check and bump it too
+    __mapper_args__ = {"version_id_col": version}
+
+
+client_search_text = search_text(
+    Client.first_name, Client.last_name, Client.email, Client.phone
+)
+
+trigram_index("ix_clients_search_trgm", Client.owner_id, client_search_text)
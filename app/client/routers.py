@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, status
-from typing import List
+from fastapi import APIRouter, Depends, Query, Response, status
+from typing import List, Optional
 
 from app.client.service import ClientService
 from app.client.schemas import (
@@ -7,8 +7,12 @@ from app.client.schemas import (
     ClientUpdate,
     ClientInDB,
 )
+from app.utils.metrics import TimedRoute
+from app.utils.search import SEARCH_LIMIT
+from app.utils.security import get_current_user
+from app.utils.versioning import if_match, set_etag
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(get_current_user)])
 
 
 @router.get("/clients", response_model=List[ClientInDB])
@@ -23,16 +27,36 @@ def create_client(client: ClientCreate, service: ClientService = Depends()):
     return service.create_client(client)
 
 
+# Declared before /clients/{client_id}, which would otherwise match "search"
+@router.get("/clients/search", response_model=List[ClientInDB])
+def search_clients(
+    q: str = Query(..., min_length=3),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=50),
+    service: ClientService = Depends(),
+):
+    return service.search_clients(q, limit)
+
+
 @router.get("/clients/{client_id}", response_model=ClientInDB)
-def get_client(client_id: int, service: ClientService = Depends()):
-    return service.get_client(client_id)
+def get_client(
+    client_id: int, response: Response, service: ClientService = Depends()
+):
+    client = service.get_client(client_id)
+    set_etag(response, client.version)
+    return client
 
 
 @router.put("/clients/{client_id}", response_model=ClientInDB)
 def update_client(
-    client_id: int, client: ClientUpdate, service: ClientService = Depends()
+    client_id: int,
+    client: ClientUpdate,
+    response: Response,
+    version: Optional[int] = Depends(if_match),
+    service: ClientService = Depends(),
 ):
-    return service.update_client(client_id, client)
+    updated = service.update_client(client_id, client, version)
+    set_etag(response, updated.version)
+    return updated
 
 
 @router.delete("/clients/{client_id}")
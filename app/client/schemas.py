@@ -13,7 +13,7 @@ class ClientBase(BaseModel):
 
 
 class ClientCreate(ClientBase):
-    owner_id: int
+    pass
 
 
 class ClientUpdate(ClientBase):
@@ -25,6 +25,7 @@ class ClientInDB(ClientBase):
     created_at: datetime
     updated_at: datetime
     owner_id: int
+    version: int
 
     class Config:
         from_attributes = True
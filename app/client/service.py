@@ -1,9 +1,13 @@
 from fastapi import Depends, HTTPException, status
 from sqlalchemy import delete, update
 from sqlalchemy.orm import Session
+from typing import Optional
 
 from app.database import get_db
-from app.client.models import Client
+from app.client.models import Client, client_search_text
+from app.utils.search import search_query
+from app.utils.tenancy import require_current_owner
+from app.utils.versioning import update_failed, version_filter
 from app.client.schemas import (
     ClientCreate,
     ClientUpdate,
@@ -17,9 +21,14 @@ class ClientService:
         self.db = db
 
     def get_client_list(self, skip: int = 0, limit: int = 100):
-        clients = self.db.query(Client).offset(skip).limit(limit).all()
+        clients = (
+            self.db.query(Client).order_by(Client.id).offset(skip).limit(limit).all()
+        )
         return clients
 
+    def search_clients(self, q: str, limit: int):
+        return self.db.scalars(search_query(Client, client_search_text, q, limit)).all()
+
     def get_client(self, client_id: int) -> ClientInDB:
         client = self.db.query(Client).filter(Client.id == client_id).first()
 
@@ -32,6 +41,7 @@ class ClientService:
 
     def create_client(self, client_data: ClientCreate) -> ClientInDB:
         client_dict = client_data.model_dump()
+        client_dict["owner_id"] = require_current_owner(self.db)
 
         client = Client(**client_dict)
         self.db.add(client)
@@ -41,18 +51,25 @@ class ClientService:
 
         return ClientInDB.model_validate(client)
 
-    def update_client(self, client_id: int, client_data: ClientUpdate) -> ClientInDB:
+    def update_client(
+        self,
+        client_id: int,
+        client_data: ClientUpdate,
+        version: Optional[int] = None,
+    ) -> ClientInDB:
         client_dict = client_data.model_dump()
 
         stmt = (
             update(Client)
-            .where(Client.id == client_id)
-            .values(**client_dict)
+            .where(Client.id == client_id, *version_filter(Client.version, version))
+            .values(**client_dict, version=Client.version + 1)
             .returning(Client)
         )
 
         result = self.db.execute(stmt)
-        updated_client = result.scalar_one()
+        updated_client = result.scalar_one_or_none()
+        if updated_client is None:
+            raise update_failed(self.db, Client.id, client_id, "Client")
 
         self.db.commit()
 
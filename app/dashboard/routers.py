@@ -0,0 +1,19 @@
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends
+
+from app.auth.models import User
+from app.dashboard.service import DashboardService
+from app.dashboard.schemas import Dashboard
+from app.utils.metrics import TimedRoute
+from app.utils.security import get_current_user
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/dashboard", response_model=Dashboard)
+async def get_dashboard(
+    current_user: Annotated[User, Depends(get_current_user)],
+    base_currency: Optional[str] = None,
+    service: DashboardService = Depends(),
+):
+    return await service.get_dashboard(current_user.id, base_currency)
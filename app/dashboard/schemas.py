@@ -0,0 +1,45 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+from app.invoice.schemas import InvoiceStatus
+from app.payment.schemas import PaymentInDB
+
+
+class InvoiceSummary(BaseModel):
+    id: int
+    client_id: int
+    status: InvoiceStatus
+    currency: Optional[str] = "USD"
+    total_amount: Optional[float] = 0
+    paid_amount: Optional[float] = 0
+    issuing_date: datetime
+    due_date: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class TopClient(BaseModel):
+    client_id: int
+    first_name: str
+    last_name: Optional[str] = None
+    currency: str
+    invoiced_amount: float
+
+    class Config:
+        from_attributes = True
+
+
+class SectionTiming(BaseModel):
+    elapsed_ms: float
+    cached: bool
+
+
+class Dashboard(BaseModel):
+    recent_invoices: list[InvoiceSummary]
+    recent_payments: list[PaymentInDB]
+    outstanding_total: dict[str, float]
+    overdue_count: int
+    top_clients: list[TopClient]
+    timings: dict[str, SectionTiming]
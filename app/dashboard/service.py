@@ -0,0 +1,158 @@
+import asyncio
+import time
+from datetime import date, datetime
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.database import SessionLocal
+from app.client.models import Client
+from app.fx.service import FxRateService, currency_column, normalize_currency
+from app.invoice.models import Invoice
+from app.payment.models import Payment
+from app.invoice.schemas import InvoiceStatus
+from app.invoice.service import OPEN_STATUSES
+from app.payment.schemas import PaymentInDB
+from app.dashboard.schemas import (
+    Dashboard,
+    InvoiceSummary,
+    SectionTiming,
+    TopClient,
+)
+from app.utils.cache import TTLCache
+from app.utils.profiling import profiled
+
+RECENT_LIMIT = 10
+TOP_CLIENTS_LIMIT = 5
+
+SECTION_CACHES = {
+    "recent_invoices": TTLCache(ttl=5),
+    "recent_payments": TTLCache(ttl=5),
+    "outstanding_total": TTLCache(ttl=30),
+    "overdue_count": TTLCache(ttl=30),
+    "top_clients": TTLCache(ttl=300),
+}
+
+
+class DashboardService:
+
+    async def get_dashboard(
+        self, owner_id: int, base_currency: Optional[str] = None
+    ) -> Dashboard:
+        # Every section runs on its own session, so the queries run concurrently
+        # on separate connections
+        results = await asyncio.gather(
+            *(
+                run_in_threadpool(self._run_section, name, owner_id)
+                for name in SECTION_CACHES
+            )
+        )
+
+        sections = {}
+        timings = {}
+        for name, (value, timing) in zip(SECTION_CACHES, results):
+            sections[name] = value
+            timings[name] = timing
+
+        base = normalize_currency(base_currency)
+        if base is not None:
+            sections["outstanding_total"] = await run_in_threadpool(
+                self._convert_totals, sections["outstanding_total"], base
+            )
+
+        return Dashboard(**sections, timings=timings)
+
+    @profiled
+    def _run_section(self, name: str, owner_id: int):
+        started = time.perf_counter()
+        cache = SECTION_CACHES[name]
+
+        hit, value = cache.get(owner_id)
+        if not hit:
+            db = SessionLocal()
+            try:
+                value = getattr(self, name)(db, owner_id)
+            finally:
+                db.close()
+            cache.set(owner_id, value)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return value, SectionTiming(elapsed_ms=round(elapsed_ms, 3), cached=hit)
+
+    @profiled
+    def _convert_totals(self, totals: dict[str, float], base: str) -> dict:
+        # The balance is owed now, so it converts at today's rates. The rates
+        # come from the in-process cache, the session only queries on a miss.
+        db = SessionLocal()
+        try:
+            return FxRateService(db).convert_totals(totals, base, date.today())
+        finally:
+            db.close()
+
+    def recent_invoices(self, db: Session, owner_id: int) -> list[InvoiceSummary]:
+        invoices = db.execute(
+            select(Invoice)
+            .where(Invoice.owner_id == owner_id)
+            .order_by(Invoice.issuing_date.desc(), Invoice.id.desc())
+            .limit(RECENT_LIMIT)
+        ).scalars()
+        return [InvoiceSummary.model_validate(invoice) for invoice in invoices]
+
+    def recent_payments(self, db: Session, owner_id: int) -> list[PaymentInDB]:
+        payments = db.execute(
+            select(Payment)
+            .where(Payment.owner_id == owner_id)
+            .order_by(Payment.payment_date.desc(), Payment.id.desc())
+            .limit(RECENT_LIMIT)
+        ).scalars()
+        return [PaymentInDB.model_validate(payment) for payment in payments]
+
+    def outstanding_total(self, db: Session, owner_id: int) -> dict[str, float]:
+        currency = currency_column(Invoice.currency)
+        rows = db.execute(
+            select(
+                currency,
+                func.sum(Invoice.total_amount - func.coalesce(Invoice.paid_amount, 0)),
+            )
+            .where(
+                Invoice.owner_id == owner_id,
+                Invoice.status != InvoiceStatus.PAID,
+            )
+            .group_by(currency)
+        ).all()
+        return {currency: float(amount or 0) for currency, amount in rows}
+
+    def overdue_count(self, db: Session, owner_id: int) -> int:
+        # Also counts invoices the overdue sweeper has not reached yet
+        return db.execute(
+            select(func.count())
+            .select_from(Invoice)
+            .where(
+                Invoice.owner_id == owner_id,
+                or_(
+                    Invoice.status == InvoiceStatus.OVERDUE,
+                    Invoice.status.in_(OPEN_STATUSES)
+                    & (Invoice.due_date < datetime.now()),
+                ),
+            )
+        ).scalar_one()
+
+    def top_clients(self, db: Session, owner_id: int) -> list[TopClient]:
+        currency = currency_column(Invoice.currency)
+        invoiced_amount = func.sum(Invoice.total_amount)
+        rows = db.execute(
+            select(
+                Client.id.label("client_id"),
+                Client.first_name,
+                Client.last_name,
+                currency.label("currency"),
+                invoiced_amount.label("invoiced_amount"),
+            )
+            .join(Invoice, Invoice.client_id == Client.id)
+            .where(Invoice.owner_id == owner_id)
+            .group_by(Client.id, currency)
+            .order_by(invoiced_amount.desc())
+            .limit(TOP_CLIENTS_LIMIT)
+        ).mappings()
+        return [TopClient.model_validate(dict(row)) for row in rows]
@@ -1,8 +1,12 @@
-from sqlalchemy import create_engine
+import os
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, text
 
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from app.config import settings
+from app.utils.partitions import ensure_partitions
+from app.utils.request_stats import instrument_engine
 
 
 engine = create_engine(
@@ -10,18 +14,52 @@ engine = create_engine(
     echo=False,
 )
 
+instrument_engine(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _reset_pool_after_fork():
+    # A forked child starts with an empty pool. The parent's connections are
+    # left open for the parent, closing them here would break its sessions.
+    engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
+    """The request's session, shared by every dependency that asks for it.
+
+    FastAPI resolves it once per request. The session checks out a
+    connection at its first statement, so requests that fail before
+    querying, or never query, do not touch the pool. Async, so that creating
+    and closing it takes no threadpool round trip. Only a session still
+    holding a connection is closed on the threadpool, as closing it rolls
+    back over the network.
+
+    get_current_user queries it before the route runs, so services find it
+    already in a transaction: they flush and commit, and never call begin().
+    """
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        if db.in_transaction():
+            await run_in_threadpool(db.close)
+        else:
+            db.close()
 
 
 def create_tables():
+    # Needed by the trigram search indexes
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+
     Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        ensure_partitions(conn, settings.partition_months_ahead)
@@ -0,0 +1,141 @@
+import asyncio
+from collections import defaultdict
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import engine
+from app.events.service import CHANNEL, parse_payload
+from app.utils.logger import logger
+
+RECONNECT_DELAY_SECONDS = 1
+
+
+class Subscription:
+    """Events of one owner waiting to be sent to one client.
+
+    A client that falls more than EVENTS_QUEUE_SIZE events behind is
+    disconnected, it resumes from the outbox with its last event id.
+    """
+
+    def __init__(self, owner_id: int):
+        self.owner_id = owner_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.events_queue_size)
+
+    def put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self) -> None:
+        # None ends the stream, queued events are dropped to make room for it
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class EventBroker:
+    """Fans the NOTIFY events out to the subscribers in this process.
+
+    There is one LISTEN connection per process, read on the event loop. When
+    it drops, subscribers are disconnected so that they resume from the
+    outbox, and the broker reconnects.
+    """
+
+    def __init__(self):
+        self.subscriptions: dict[int, set[Subscription]] = defaultdict(set)
+        self.connection = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reconnect_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        await self._listen()
+
+    async def stop(self) -> None:
+        if self.reconnect_task is not None:
+            self.reconnect_task.cancel()
+            self.reconnect_task = None
+        self._close_connection()
+        self._close_subscriptions()
+
+    def subscribe(self, owner_id: int) -> Subscription:
+        subscription = Subscription(owner_id)
+        self.subscriptions[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self.subscriptions.get(subscription.owner_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.owner_id]
+
+    def _connect(self):
+        # A pool connection detached for good, with the engine's settings
+        proxy = engine.raw_connection()
+        proxy.detach()
+        connection = proxy.dbapi_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return connection
+
+    async def _listen(self) -> None:
+        self.connection = await run_in_threadpool(self._connect)
+        self.loop.add_reader(self.connection.fileno(), self._on_readable)
+
+    def _on_readable(self) -> None:
+        try:
+            self.connection.poll()
+        except Exception as e:
+            logger.error(f"Event listener connection lost: {e}")
+            self._close_connection()
+            self._close_subscriptions()
+            self.reconnect_task = self.loop.create_task(self._reconnect())
+            return
+
+        notifies = self.connection.notifies
+        while notifies:
+            notify = notifies.pop(0)
+            try:
+                event = parse_payload(notify.payload)
+            except (KeyError, ValueError):
+                logger.error(f"Malformed event payload: {notify.payload}")
+                continue
+            for subscription in list(self.subscriptions.get(event["owner_id"], ())):
+                subscription.put(event)
+
+    async def _reconnect(self) -> None:
+        while True:
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.error(f"Event listener reconnect failed: {e}")
+            else:
+                logger.info("Event listener reconnected")
+                self.reconnect_task = None
+                return
+
+    def _close_connection(self) -> None:
+        if self.connection is None:
+            return
+        try:
+            self.loop.remove_reader(self.connection.fileno())
+        except Exception:
+            pass
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+
+    def _close_subscriptions(self) -> None:
+        for subscriptions in list(self.subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.close()
+
+
+broker = EventBroker()
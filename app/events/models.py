@@ -0,0 +1,41 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    Integer,
+    Index,
+    func,
+)
+
+from app.database import Base
+from app.events.schemas import EventAction, EventEntity
+
+
+class Event(Base):
+    """Outbox of changes, only ids so that rows stay small."""
+
+    __tablename__ = "events"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # No foreign key, events outlive the rows and users they describe
+    owner_id = Column(Integer, nullable=False)
+    entity = Column(Enum(EventEntity), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    action = Column(Enum(EventAction), nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_events_owner_id_id", "owner_id", "id"),
+        # Rows are appended in time order, a BRIN index is enough for purging
+        Index("ix_events_created_at", "created_at", postgresql_using="brin"),
+    )
+
+
+class EventPurge(Base):
+    """How far the outbox was purged, a single row."""
+
+    __tablename__ = "event_purges"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    # Every event with an id up to this one was deleted
+    purged_through = Column(BigInteger, nullable=False)
+    purged_at = Column(DateTime, nullable=False, server_default=func.now())
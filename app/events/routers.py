@@ -0,0 +1,96 @@
+import asyncio
+import json
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.auth.models import User
+from app.config import settings
+from app.database import SessionLocal
+from app.events.broker import broker
+from app.events.service import EventService
+from app.utils.metrics import TimedRoute
+from app.utils.security import get_current_user
+
+router = APIRouter(route_class=TimedRoute)
+
+
+def _format(event: dict) -> str:
+    data = {key: value for key, value in event.items() if key != "owner_id"}
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['entity']}.{event['action']}\n"
+        f"data: {json.dumps(data)}\n\n"
+    )
+
+
+def _replay(owner_id: int, after: int) -> tuple[bool, list[dict]]:
+    db = SessionLocal()
+    try:
+        service = EventService(db)
+        if not service.is_retained(after):
+            return False, []
+        return True, service.get_events_after(
+            owner_id, after, settings.events_replay_limit
+        )
+    finally:
+        db.close()
+
+
+async def _stream(owner_id: int, after: Optional[int]):
+    # Subscribed before replaying, so nothing falls between the two. Live
+    # events already replayed are skipped by id: ids are taken at INSERT but
+    # rows show up at COMMIT, so a replay can hold 105 while 104 is still
+    # uncommitted, and 104 must get through once its NOTIFY arrives.
+    subscription = broker.subscribe(owner_id)
+    try:
+        yield f"retry: {settings.events_retry_ms}\n\n"
+
+        replayed = set()
+        while after is not None:
+            retained, events = await run_in_threadpool(_replay, owner_id, after)
+            if not retained:
+                # Events since the client's id were purged, it has to reload
+                yield "event: reset\ndata: {}\n\n"
+                break
+            for event in events:
+                replayed.add(event["id"])
+                yield _format(event)
+            if events:
+                after = events[-1]["id"]
+            if len(events) < settings.events_replay_limit:
+                break
+
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), settings.events_heartbeat_seconds
+                )
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                return
+            if event["id"] in replayed:
+                replayed.discard(event["id"])
+                continue
+            yield _format(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def get_events(
+    current_user: Annotated[User, Depends(get_current_user)],
+    last_event_id: Optional[int] = Header(None),
+    after: Optional[int] = None,
+):
+    # Browsers send Last-Event-ID when they reconnect, ?after= is for the
+    # first connection of a client that already has data
+    return StreamingResponse(
+        _stream(current_user.id, last_event_id if last_event_id is not None else after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
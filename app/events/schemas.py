@@ -0,0 +1,12 @@
+import enum
+
+
+class EventEntity(enum.Enum):
+    INVOICE = "invoice"
+    PAYMENT = "payment"
+
+
+class EventAction(enum.Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
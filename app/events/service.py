@@ -0,0 +1,134 @@
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import Text, cast, delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.events.models import Event, EventPurge
+from app.events.schemas import EventAction, EventEntity
+
+CHANNEL = "events"
+
+
+def record_events(
+    db: Session,
+    entity: EventEntity,
+    action: EventAction,
+    rows: Iterable[tuple[int, int]],
+) -> None:
+    """Adds (owner_id, entity_id) changes to the outbox and notifies listeners.
+
+    Both are part of the caller's transaction: PostgreSQL delivers the
+    notifications on commit and drops them on rollback.
+    """
+    values = [
+        {
+            "owner_id": owner_id,
+            "entity": entity,
+            "entity_id": entity_id,
+            "action": action,
+        }
+        for owner_id, entity_id in rows
+    ]
+    if not values:
+        return
+
+    inserted = (
+        insert(Event.__table__)
+        .values(values)
+        .returning(Event.id, Event.owner_id, Event.entity_id)
+        .cte("inserted")
+    )
+    # id,owner_id,entity,entity_id,action
+    payload = func.concat_ws(
+        ",",
+        inserted.c.id,
+        inserted.c.owner_id,
+        entity.name,
+        inserted.c.entity_id,
+        action.name,
+    )
+    db.execute(
+        select(func.pg_notify(CHANNEL, cast(payload, Text))).select_from(inserted)
+    )
+
+
+def parse_payload(payload: str) -> dict:
+    event_id, owner_id, entity, entity_id, action = payload.split(",")
+    return event_as_dict(
+        int(event_id),
+        int(owner_id),
+        EventEntity[entity],
+        int(entity_id),
+        EventAction[action],
+    )
+
+
+def event_as_dict(
+    event_id: int,
+    owner_id: int,
+    entity: EventEntity,
+    entity_id: int,
+    action: EventAction,
+) -> dict:
+    return {
+        "id": event_id,
+        "owner_id": owner_id,
+        "entity": entity.value,
+        "entity_id": entity_id,
+        "action": action.value,
+    }
+
+
+class EventService:
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_events_after(self, owner_id: int, after: int, limit: int) -> list[dict]:
+        rows = self.db.execute(
+            select(
+                Event.id, Event.owner_id, Event.entity, Event.entity_id, Event.action
+            )
+            .where(Event.owner_id == owner_id, Event.id > after)
+            .order_by(Event.id)
+            .limit(limit)
+        ).all()
+        return [event_as_dict(*row) for row in rows]
+
+    def is_retained(self, after: int) -> bool:
+        # Ids are shared by all owners and have gaps (rolled back inserts,
+        # sequence caching), so the purge records how far it went instead
+        # of guessing from the oldest kept id
+        purged_through: Optional[int] = self.db.scalar(
+            select(EventPurge.purged_through)
+        )
+        return purged_through is None or purged_through <= after
+
+    def purge(self, before: datetime) -> int:
+        # Deletes a prefix of the ids, so a single watermark describes it
+        purged_through: Optional[int] = self.db.scalar(
+            select(func.max(Event.id)).where(Event.created_at < before)
+        )
+        if purged_through is None:
+            return 0
+
+        result = self.db.execute(
+            delete(Event)
+            .where(Event.id <= purged_through)
+            .execution_options(synchronize_session=False)
+        )
+        stmt = pg_insert(EventPurge).values(id=1, purged_through=purged_through)
+        self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[EventPurge.id],
+                set_={
+                    "purged_through": func.greatest(
+                        EventPurge.purged_through, stmt.excluded.purged_through
+                    ),
+                    "purged_at": func.now(),
+                },
+            )
+        )
+        self.db.commit()
+        return result.rowcount
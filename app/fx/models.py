@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    String,
+    Numeric,
+    func,
+)
+
+from app.database import Base
+
+
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+    currency = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    # Value of one unit of the currency in FX_REFERENCE_CURRENCY
+    rate = Column(Numeric, nullable=False)
+    # Copied forward from the last published rate, replaced on the next import
+    is_filled = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=datetime.now)
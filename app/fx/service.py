@@ -0,0 +1,163 @@
+from datetime import date
+from decimal import Decimal
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import and_, case, delete, func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+from typing import Iterable, Optional
+
+from app.config import settings
+from app.database import get_db
+from app.fx.models import FxRate
+from app.utils.cache import TTLCache
+
+# (currency, day) -> rate in the reference currency, None when there is none
+rate_cache = TTLCache(ttl=settings.fx_rate_cache_ttl_seconds, maxsize=10_000)
+
+
+def normalize_currency(currency: Optional[str]) -> Optional[str]:
+    return currency.strip().upper() if currency else None
+
+
+def currency_column(column):
+    # Invoices and payments keep the currency as entered, rates are stored
+    # normalized, so joins and groups compare the normalized code
+    return func.upper(func.trim(func.coalesce(column, "USD")))
+
+
+class Conversion:
+    """SQL joins converting amounts of a row's currency on a row's day.
+
+    fx_rates has a row per currency and day (gaps are filled on import), so
+    both joins are primary key lookups.
+    """
+
+    def __init__(self, base: str, currency, day):
+        reference = settings.fx_reference_currency
+        self.base = base
+        self.source = aliased(FxRate)
+        self.source_on = and_(self.source.currency == currency, self.source.day == day)
+        source_rate = case((currency == reference, literal(1)), else_=self.source.rate)
+
+        self.target = None
+        target_rate = literal(1)
+        if base != reference:
+            self.target = aliased(FxRate)
+            self.target_on = and_(self.target.currency == base, self.target.day == day)
+            target_rate = self.target.rate
+
+        self.rate = source_rate / target_rate
+
+    def join(self, stmt):
+        stmt = stmt.outerjoin(self.source, self.source_on)
+        if self.target is not None:
+            stmt = stmt.outerjoin(self.target, self.target_on)
+        return stmt
+
+    def amount(self, amount):
+        return amount * self.rate
+
+    def missing(self):
+        # Rows without a rate on either side, their amounts sum to NULL
+        return func.count() - func.count(self.rate)
+
+
+def check_missing_rates(rows, base: str) -> None:
+    if any(row["missing"] for row in rows):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Missing FX rates to convert to {base}",
+        )
+
+
+class FxRateService:
+
+    def __init__(self, db: Session = Depends(get_db)):
+        self.db = db
+
+    def get_rates(self, currencies: Iterable[str], day: date) -> dict:
+        rates = {}
+        misses = []
+        for currency in set(currencies):
+            if currency == settings.fx_reference_currency:
+                rates[currency] = Decimal(1)
+                continue
+            hit, rate = rate_cache.get((currency, day))
+            if hit:
+                rates[currency] = rate
+            else:
+                misses.append(currency)
+
+        if misses:
+            # One query for every missing currency, the latest rate on or
+            # before the day
+            loaded = dict(
+                self.db.execute(
+                    select(FxRate.currency, FxRate.rate)
+                    .where(FxRate.currency.in_(misses), FxRate.day <= day)
+                    .order_by(FxRate.currency, FxRate.day.desc())
+                    .distinct(FxRate.currency)
+                ).all()
+            )
+            for currency in misses:
+                rates[currency] = loaded.get(currency)
+                rate_cache.set((currency, day), rates[currency])
+
+        return rates
+
+    def convert_totals(self, totals: dict, base: str, day: date) -> dict:
+        rates = self.get_rates([*totals, base], day)
+        if any(rates[currency] is None for currency in [*totals, base]):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Missing FX rates to convert to {base}",
+            )
+
+        converted = sum(
+            Decimal(str(amount)) * rates[currency]
+            for currency, amount in totals.items()
+        )
+        return {base: float(converted / rates[base])}
+
+    def import_rates(self, rows: list[dict], fill_until: Optional[date] = None) -> int:
+        stmt = insert(FxRate).values(
+            [
+                {
+                    "currency": normalize_currency(row["currency"]),
+                    "day": row["day"],
+                    "rate": row["rate"],
+                    "is_filled": False,
+                }
+                for row in rows
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FxRate.currency, FxRate.day],
+            set_={"rate": stmt.excluded.rate, "is_filled": False},
+        )
+        self.db.execute(stmt)
+        self.db.execute(delete(FxRate).where(FxRate.is_filled))
+        filled = self.fill_gaps(fill_until or date.today())
+        self.db.commit()
+        rate_cache.clear()
+        return filled
+
+    def fill_gaps(self, until: date) -> int:
+        # Every day from a currency's first rate on gets the last published rate,
+        # so conversions join on equality
+        result = self.db.execute(
+            text(
+                "INSERT INTO fx_rates (currency, day, rate, is_filled) "
+                "SELECT c.currency, d.day::date, r.rate, true "
+                "FROM (SELECT currency, min(day) AS first_day FROM fx_rates "
+                "GROUP BY currency) c "
+                "CROSS JOIN LATERAL generate_series("
+                "c.first_day, CAST(:until AS date), interval '1 day') AS d(day) "
+                "CROSS JOIN LATERAL (SELECT f.rate FROM fx_rates f "
+                "WHERE f.currency = c.currency AND f.day <= d.day "
+                "ORDER BY f.day DESC LIMIT 1) r "
+                "ON CONFLICT (currency, day) DO NOTHING"
+            ),
+            {"until": until},
+        )
+        return result.rowcount
@@ -9,6 +9,7 @@ from sqlalchemy import (
     Boolean,
     Enum,
     ForeignKey,
+    Index,
     func,
 )
 
@@ -18,12 +19,13 @@ from app.invoice.schemas import InvoiceStatus
 
 class Invoice(Base):
     __tablename__ = "invoices"
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
     client_id = Column(Integer, ForeignKey("clients.id"))
     status = Column(Enum(InvoiceStatus), default=InvoiceStatus.UNPAID)
     description = Column(String, nullable=True)
-    issuing_date = Column(DateTime, nullable=False)
+    # Partition key, part of the primary key as PostgreSQL requires
+    issuing_date = Column(DateTime, primary_key=True, nullable=False)
     due_date = Column(DateTime, nullable=False)
     fully_paid_date = Column(DateTime, nullable=True)
     total_amount = Column(Numeric)
@@ -32,16 +34,37 @@ class Invoice(Base):
     is_sent = Column(Boolean, default=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=datetime.now)
+    # Bumped on every write, for optimistic concurrency
+    version = Column(Integer, nullable=False, server_default="1")
     owner = relationship("User", back_populates="invoices")
     client = relationship("Client", back_populates="invoices")
-    invoice_items = relationship("InvoiceItem", back_populates="invoice")
-    payments = relationship("Payment", back_populates="invoice")
+    invoice_items = relationship(
+        "InvoiceItem",
+        back_populates="invoice",
+        primaryjoin="Invoice.id == foreign(InvoiceItem.invoice_id)",
+    )
+    payments = relationship(
+        "Payment",
+        back_populates="invoice",
+        primaryjoin="Invoice.id == foreign(Payment.invoice_id)",
+    )
+
+    __table_args__ = (
+        Index("ix_invoices_status_due_date", "status", "due_date"),
+        Index("ix_invoices_owner_id_id", "owner_id", "id"),
+        Index("ix_invoices_owner_id_issuing_date", "owner_id", "issuing_date"),
+        Index("ix_invoices_owner_id_client_id", "owner_id", "client_id"),
+        {"postgresql_partition_by": "RANGE (issuing_date)"},
+    )
+    # ORM flushes check and bump it too
+    __mapper_args__ = {"version_id_col": version}
 
 
 class InvoiceItem(Base):
     __tablename__ = "invoice_items"
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="CASCADE"))
+    # No foreign key, a partitioned invoices table has no unique id to reference
+    invoice_id = Column(Integer, index=True)
     item_id = Column(Integer, ForeignKey("items.id"))
     quantity = Column(Integer, nullable=False)
     price = Column(Numeric, nullable=False)
@@ -50,6 +73,8 @@ class InvoiceItem(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=datetime.now)
     invoice = relationship(
-        "Invoice", back_populates="invoice_items", passive_deletes=True
+        "Invoice",
+        back_populates="invoice_items",
+        primaryjoin="Invoice.id == foreign(InvoiceItem.invoice_id)",
     )
     item = relationship("Item", back_populates="invoice_items")
@@ -0,0 +1,239 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from typing import Iterator, Optional
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.invoice.schemas import InvoiceInDB
+from app.utils.pdf import PAGE_HEIGHT, PAGE_WIDTH, PDFDocument
+
+MARGIN = 50
+ROW_HEIGHT = 16
+
+# Stale versions handed out or written this recently are kept, a response
+# may be about to open them
+STALE_GRACE_SECONDS = 60
+
+# Rendering runs in worker processes so it does not hold the threadpool the
+# sync endpoints share. Renders beyond the workers plus the queue depth are
+# rejected instead of waiting, like password hashing.
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+_render_slots = threading.BoundedSemaphore(
+    settings.pdf_render_workers + settings.pdf_render_queue_depth
+)
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=settings.pdf_render_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _render_pool
+
+
+def shutdown_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
+
+
+def _amount(value) -> str:
+    return f"{value or 0:,.2f}"
+
+
+def render_invoice(data: dict) -> bytes:
+    # Runs in a worker process, takes the JSON dump of an InvoiceInDB
+    invoice = InvoiceInDB.model_validate(data)
+    currency = invoice.currency or "USD"
+    document = PDFDocument()
+    right = PAGE_WIDTH - MARGIN
+
+    y = PAGE_HEIGHT - MARGIN
+    document.text(MARGIN, y, f"Invoice #{invoice.id}", size=20, bold=True)
+    document.text_right(right, y, invoice.status.value.replace("_", " ").upper())
+    y -= 30
+    for label, value in (
+        ("Client", f"#{invoice.client_id}"),
+        ("Issued", invoice.issuing_date.strftime("%Y-%m-%d")),
+        ("Due", invoice.due_date.strftime("%Y-%m-%d")),
+        ("Currency", currency),
+    ):
+        document.text(MARGIN, y, label, bold=True)
+        document.text(MARGIN + 80, y, value)
+        y -= ROW_HEIGHT
+
+    columns = (("Item", MARGIN), ("Quantity", 330), ("Price", 430), ("Amount", right))
+
+    def header(y: float) -> float:
+        for label, x in columns:
+            if x == MARGIN:
+                document.text(x, y, label, bold=True)
+            else:
+                document.text_right(x, y, label, bold=True)
+        document.line(MARGIN, y - 4, right, y - 4)
+        return y - ROW_HEIGHT - 4
+
+    y = header(y - 20)
+    for item in invoice.items:
+        if y < MARGIN + 3 * ROW_HEIGHT:
+            document.new_page()
+            y = header(PAGE_HEIGHT - MARGIN)
+        document.text(MARGIN, y, item.item_name[:45])
+        document.text_right(330, y, str(item.quantity))
+        document.text_right(430, y, _amount(item.price))
+        document.text_right(right, y, _amount(item.item_amount))
+        y -= ROW_HEIGHT
+
+    document.line(MARGIN, y + ROW_HEIGHT - 4, right, y + ROW_HEIGHT - 4)
+    y -= 4
+    balance = (invoice.total_amount or 0) - (invoice.paid_amount or 0)
+    for label, value, bold in (
+        ("Total", invoice.total_amount, True),
+        ("Paid", invoice.paid_amount, False),
+        ("Balance due", balance, True),
+    ):
+        document.text_right(430, y, label, bold=bold)
+        document.text_right(right, y, f"{_amount(value)} {currency}", bold=bold)
+        y -= ROW_HEIGHT
+
+    return document.render()
+
+
+def _cache_dir() -> str:
+    return settings.pdf_cache_dir or os.path.join(
+        tempfile.gettempdir(), "invoice-pdfs"
+    )
+
+
+def cache_path(invoice: InvoiceInDB) -> str:
+    # Keyed by a hash of the render input, so a renamed item gives a new file
+    # as well as a new updated_at. Stale versions are removed on write.
+    version = hashlib.sha256(invoice.model_dump_json().encode()).hexdigest()[:20]
+    return os.path.join(_cache_dir(), f"{invoice.id}-{version}.pdf")
+
+
+def _cached(path: str) -> bool:
+    # The modification time marks the file as just handed out, so a newer
+    # version written meanwhile does not remove it before it is opened
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _store(invoice: InvoiceInDB, content: bytes) -> str:
+    path = cache_path(invoice)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    # Written under a temporary name and renamed, readers never see half a file
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as output:
+        output.write(content)
+    os.replace(temporary, path)
+
+    prefix = f"{invoice.id}-"
+    expired = time.time() - STALE_GRACE_SECONDS
+    for name in os.listdir(directory):
+        stale = os.path.join(directory, name)
+        if name.startswith(prefix) and name.endswith(".pdf") and stale != path:
+            try:
+                if os.path.getmtime(stale) < expired:
+                    os.remove(stale)
+            except FileNotFoundError:
+                pass
+    return path
+
+
+def _submit(invoice: InvoiceInDB, blocking: bool) -> Future:
+    if not _render_slots.acquire(blocking=blocking):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many documents being rendered, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        future = _get_render_pool().submit(
+            render_invoice, invoice.model_dump(mode="json")
+        )
+    except BaseException:
+        # A shut down or broken pool, the slot was never handed to a render
+        _render_slots.release()
+        raise
+    future.add_done_callback(lambda _: _render_slots.release())
+    return future
+
+
+def invoice_pdf(invoice: InvoiceInDB, blocking: bool = False) -> str:
+    """Returns the path of the rendered invoice, rendering it on a miss."""
+    path = cache_path(invoice)
+    if _cached(path):
+        return path
+    return _store(invoice, _submit(invoice, blocking).result())
+
+
+def _filename(invoice: InvoiceInDB) -> str:
+    return f"invoice-{invoice.id}.pdf"
+
+
+def invoice_pdf_zip(invoices: list[InvoiceInDB]) -> Iterator[bytes]:
+    """Streams a zip of the invoices, renders run in parallel.
+
+    Cached documents go out first, the others as their renders finish.
+    """
+    buffer = _ChunkBuffer()
+    pending = {}
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for invoice in invoices:
+            path = cache_path(invoice)
+            if _cached(path):
+                archive.write(path, _filename(invoice))
+                yield buffer.take()
+            else:
+                # A batch waits for render slots instead of failing half way
+                pending[_submit(invoice, blocking=True)] = invoice
+
+        for future in as_completed(pending):
+            invoice = pending[future]
+            content = future.result()
+            _store(invoice, content)
+            archive.writestr(_filename(invoice), content)
+            yield buffer.take()
+    yield buffer.take()
+
+
+class _ChunkBuffer:
+    """Write-only file object for zipfile, emptied after every member."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
@@ -1,19 +1,41 @@
-from fastapi import APIRouter, Depends, status
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from typing import List, Optional
 
+from app.invoice.pdf import invoice_pdf, invoice_pdf_zip
 from app.invoice.service import InvoiceService
 from app.invoice.schemas import (
     InvoiceCreate,
     InvoiceUpdate,
     InvoiceInDB,
+    InvoiceRecalculation,
 )
+from app.utils.batch import id_list
+from app.utils.fields import FieldSelection, sparse_response
+from app.utils.metrics import TimedRoute
+from app.utils.security import get_current_user
+from app.utils.versioning import if_match, set_etag
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(get_current_user)])
+
+PDF_BATCH_LIMIT = 100
+
+invoice_fields = FieldSelection(InvoiceInDB, relations=("items",))
 
 @router.get("/invoices")
 def get_invoice_list(
-    skip: int = 0, limit: int = 100, service: InvoiceService = Depends()
+    skip: int = 0,
+    limit: int = 100,
+    issued_from: Optional[datetime] = None,
+    issued_to: Optional[datetime] = None,
+    ids: Optional[List[int]] = Depends(id_list),
+    fields: Optional[frozenset] = Depends(invoice_fields),
+    service: InvoiceService = Depends(),
 ):
-    return service.get_invoice_list(skip, limit)
+    if ids is not None:
+        return service.get_invoices(ids, fields)
+    return service.get_invoice_list(skip, limit, issued_from, issued_to, fields)
 
 
 @router.post("/invoices", status_code=status.HTTP_201_CREATED, response_model=InvoiceInDB)
@@ -21,16 +43,87 @@ def create_invoice(invoice: InvoiceCreate, service: InvoiceService = Depends()):
     return service.create_invoice(invoice)
 
 
+@router.post("/invoices/recalculate", response_model=InvoiceRecalculation)
+def recalculate_invoices(
+    issued_from: Optional[datetime] = None,
+    issued_to: Optional[datetime] = None,
+    client_id: Optional[int] = None,
+    background: bool = False,
+    service: InvoiceService = Depends(),
+):
+    if background:
+        job_id = service.enqueue_recalculation(issued_from, issued_to, client_id)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED, content={"job_id": job_id}
+        )
+    return service.recalculate(issued_from, issued_to, client_id)
+
+
+# Declared before /invoices/{invoice_id}, which would otherwise match "pdf"
+@router.get("/invoices/pdf")
+def get_invoice_pdf_zip(
+    ids: List[int] = Query(...), service: InvoiceService = Depends()
+):
+    if len(ids) > PDF_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {PDF_BATCH_LIMIT} invoices per download",
+        )
+    invoices = service.get_invoices(ids)
+    return StreamingResponse(
+        invoice_pdf_zip(invoices),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="invoices.zip"'},
+    )
+
+
+@router.get("/clients/{client_id}/invoices", response_model=List[InvoiceInDB])
+def get_client_invoices(
+    client_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[frozenset] = Depends(invoice_fields),
+    service: InvoiceService = Depends(),
+):
+    invoices = service.get_client_invoices(client_id, skip, limit, fields)
+    return invoices if fields is None else sparse_response(invoices)
+
+
 @router.get("/invoices/{invoice_id}", response_model=InvoiceInDB)
-def get_invoice(invoice_id: int, service: InvoiceService = Depends()):
-    return service.get_invoice(invoice_id)
+def get_invoice(
+    invoice_id: int,
+    response: Response,
+    fields: Optional[frozenset] = Depends(invoice_fields),
+    service: InvoiceService = Depends(),
+):
+    invoice = service.get_invoice(invoice_id, fields)
+    if fields is not None:
+        return sparse_response(invoice)
+    set_etag(response, invoice.version)
+    return invoice
+
+
+@router.get("/invoices/{invoice_id}/pdf")
+def get_invoice_pdf(invoice_id: int, service: InvoiceService = Depends()):
+    invoice = service.get_invoice(invoice_id)
+    return FileResponse(
+        invoice_pdf(invoice),
+        media_type="application/pdf",
+        filename=f"invoice-{invoice.id}.pdf",
+    )
 
 
 @router.put("/invoices/{invoice_id}", response_model=InvoiceInDB)
 def update_invoice(
-    invoice_id: int, invoice: InvoiceUpdate, service: InvoiceService = Depends()
+    invoice_id: int,
+    invoice: InvoiceUpdate,
+    response: Response,
+    version: Optional[int] = Depends(if_match),
+    service: InvoiceService = Depends(),
 ):
-    return service.update_invoice(invoice_id, invoice)
+    updated = service.update_invoice(invoice_id, invoice, version)
+    set_etag(response, updated.version)
+    return updated
 
 
 @router.delete("/invoices/{invoice_id}")
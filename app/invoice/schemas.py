@@ -8,6 +8,7 @@ class InvoiceStatus(enum.Enum):
     UNPAID = "unpaid"
     PARTIALLY_PAID = "partially_paid"
     PAID = "paid"
+    OVERDUE = "overdue"
 
 
 class InvoiceItemBase(BaseModel):
@@ -47,7 +48,6 @@ class InvoiceBase(BaseModel):
 
 class InvoiceCreate(InvoiceBase):
     client_id: int
-    owner_id: int
     issuing_date: Optional[datetime] = datetime.now()
     due_date: Optional[datetime] = datetime.now()
     items: list[InvoiceItemCreate]
@@ -68,7 +68,14 @@ class InvoiceInDB(InvoiceBase):
     fully_paid_date: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
+    version: int
     items: list[InvoiceItemInDB]
 
     class Config:
         from_attributes = True
+
+
+class InvoiceRecalculation(BaseModel):
+    invoices: int
+    items_changed: int
+    invoices_changed: int
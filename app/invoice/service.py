@@ -1,18 +1,55 @@
+from datetime import datetime
+from decimal import Decimal
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import delete, insert, update
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from typing import List, Optional
 
+from app.config import settings
 from app.database import get_db
+from app.client.models import Client
 from app.payment.models import Payment
 from app.invoice.models import Invoice, InvoiceItem
+from app.item.models import Item
+from app.events.schemas import EventAction, EventEntity
+from app.events.service import record_events
+from app.jobs.service import enqueue
+from app.report.service import RollupService
+from app.utils.batch import check_found
+from app.utils.fields import sparse_model
+from app.utils.tenancy import get_current_owner, require_current_owner
+from app.utils.versioning import precondition_failed, version_filter
 from app.invoice.schemas import (
+    InvoiceStatus,
     InvoiceItemInDB,
     InvoiceCreate,
     InvoiceUpdate,
     InvoiceInDB,
+    InvoiceRecalculation,
 )
 
+OPEN_STATUSES = (InvoiceStatus.UNPAID, InvoiceStatus.PARTIALLY_PAID)
+
+
+def invoice_status(
+    total_amount=Invoice.total_amount,
+    paid_amount=Invoice.paid_amount,
+    due_date=Invoice.due_date,
+):
+    # SQL expression deriving the status from the amounts and the due date
+    paid_amount = func.coalesce(paid_amount, 0)
+    return case(
+        (paid_amount >= total_amount, InvoiceStatus.PAID.name),
+        (due_date < datetime.now(), InvoiceStatus.OVERDUE.name),
+        (paid_amount > 0, InvoiceStatus.PARTIALLY_PAID.name),
+        else_=InvoiceStatus.UNPAID.name,
+    ).cast(Invoice.status.type)
+
+
+def line_amount(quantity: int, price) -> Decimal:
+    # Exact, the float price from the request is read back as its decimal text
+    return Decimal(str(price)) * quantity
 
 
 class InvoiceService:
@@ -20,19 +57,28 @@ class InvoiceService:
     def __init__(self, db: Session = Depends(get_db)):
         self.db = db
 
-    def get_invoice_list(self, skip: int = 0, limit: int = 100) -> List[InvoiceInDB]:
+    def get_invoice_list(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        issued_from: Optional[datetime] = None,
+        issued_to: Optional[datetime] = None,
+        fields: Optional[frozenset] = None,
+    ) -> list:
 
         if limit > 100:
             limit = 100
 
-        invoices = (
-            self.db.query(Invoice)
-            .join(Invoice.invoice_items)
-            .join(InvoiceItem.item)
-            .options(joinedload(Invoice.invoice_items).joinedload(InvoiceItem.item))
-            .offset(skip)
-            .limit(limit)
-            .all()
+        query = self.db.query(Invoice)
+
+        # Plain comparisons on the partition key let PostgreSQL prune partitions
+        if issued_from is not None:
+            query = query.filter(Invoice.issuing_date >= issued_from)
+        if issued_to is not None:
+            query = query.filter(Invoice.issuing_date < issued_to)
+
+        invoices = self._load(
+            query.order_by(Invoice.id).offset(skip).limit(limit), fields
         )
 
         if not invoices:
@@ -40,98 +86,194 @@ class InvoiceService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="No invoices found"
             )
 
-        invoice_list = []
-        for invoice in invoices:
-            invoice_items = [
-                InvoiceItemInDB(**item.__dict__, item_name=item.item.name)
-                for item in invoice.invoice_items
-            ]
+        return invoices
 
-            invoice_in_db = InvoiceInDB(**invoice.__dict__, items=invoice_items)
-            invoice_list.append(invoice_in_db)
+    def get_invoices(
+        self, invoice_ids: List[int], fields: Optional[frozenset] = None
+    ) -> list:
+        invoices = self._load(
+            self.db.query(Invoice)
+            .filter(Invoice.id.in_(invoice_ids))
+            .order_by(Invoice.id),
+            fields,
+        )
+        check_found(invoice_ids, [invoice.id for invoice in invoices], "Invoices")
+        return invoices
+
+    def get_client_invoices(
+        self,
+        client_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[frozenset] = None,
+    ) -> list:
+        if limit > 100:
+            limit = 100
 
-        return invoice_list
+        client = self.db.query(Client.id).filter(Client.id == client_id).first()
+        if client is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Client not found"
+            )
 
-    def get_invoice(self, invoice_id: int) -> InvoiceInDB:
-        invoice = (
+        return self._load(
             self.db.query(Invoice)
-            .join(Invoice.invoice_items)
-            .join(InvoiceItem.item)
-            .options(joinedload(Invoice.invoice_items).joinedload(InvoiceItem.item))
-            .filter(Invoice.id == invoice_id)
-            .first()
+            .filter(Invoice.client_id == client_id)
+            .order_by(Invoice.id)
+            .offset(skip)
+            .limit(limit),
+            fields,
         )
 
-        if invoice is None:
+    def get_invoice(self, invoice_id: int, fields: Optional[frozenset] = None):
+        # A single invoice joins its lines instead of a second query
+        invoices = self._load(
+            self.db.query(Invoice).filter(Invoice.id == invoice_id),
+            fields,
+            loader=joinedload,
+        )
+
+        if not invoices:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Invoice not found"
             )
 
-        invoice_items = [
-            InvoiceItemInDB(**item.__dict__, item_name=item.item.name)
-            for item in invoice.invoice_items
-        ]
+        return invoices[0]
+
+    def _load(
+        self, query, fields: Optional[frozenset] = None, loader=selectinload
+    ) -> list:
+        """Loads InvoiceInDB objects, or only the fields when they are given.
+
+        The lines of every invoice, with their item names, come in one more
+        query instead of one per invoice. Without "items" in the fields they
+        are not loaded at all, and only the fields' columns are selected.
+        """
+        with_items = fields is None or "items" in fields
+        if with_items:
+            query = query.options(
+                loader(Invoice.invoice_items).joinedload(InvoiceItem.item)
+            )
 
-        return InvoiceInDB(**invoice.__dict__, items=invoice_items)
+        if fields is None:
+            model = InvoiceInDB
+            columns = None
+        else:
+            model = sparse_model(InvoiceInDB, fields)
+            columns = fields - {"items"}
+            query = query.options(
+                load_only(*(getattr(Invoice, name) for name in columns))
+            )
+
+        invoices = []
+        for invoice in query.all():
+            values = (
+                invoice.__dict__
+                if columns is None
+                else {name: getattr(invoice, name) for name in columns}
+            )
+            if with_items:
+                values = dict(
+                    values,
+                    items=[
+                        InvoiceItemInDB(**item.__dict__, item_name=item.item.name)
+                        for item in invoice.invoice_items
+                    ],
+                )
+            invoices.append(model(**values))
+        return invoices
 
     def create_invoice(self, invoice_data: InvoiceCreate) -> InvoiceInDB:
         invoice_dict = invoice_data.model_dump()
+        invoice_dict["owner_id"] = require_current_owner(self.db)
         items = invoice_dict.pop("items")
 
+        # The Core inserts below are not scoped, the client and the items are
+        # checked to belong to the owner before anything is written
+        client = (
+            self.db.query(Client.id)
+            .filter(Client.id == invoice_dict["client_id"])
+            .first()
+        )
+        if client is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Client not found"
+            )
+        item_names = self._item_names({item["item_id"] for item in items})
+
         try:
-            with self.db.begin():
-                invoice_stmt = insert(Invoice).values(**invoice_dict).returning(Invoice)
-                result = self.db.execute(invoice_stmt)
-                invoice = result.scalar_one()
-
-                invoice_items_data = []
-                for item in items:
-                    item_dict = item
-                    item_dict["invoice_id"] = invoice.id
-                    invoice_items_data.append(item_dict)
-
-                invoice_items_stmt = (
-                    insert(InvoiceItem)
-                    .values(invoice_items_data)
-                    .returning(InvoiceItem)
+            invoice_stmt = insert(Invoice).values(**invoice_dict).returning(Invoice)
+            result = self.db.execute(invoice_stmt)
+            invoice = result.scalar_one()
+
+            invoice_items_data = []
+            for item in items:
+                item_dict = item
+                item_dict["invoice_id"] = invoice.id
+                item_dict["item_amount"] = line_amount(
+                    item_dict["quantity"], item_dict["price"]
                 )
+                invoice_items_data.append(item_dict)
 
-                result = self.db.execute(invoice_items_stmt)
+            invoice_items_stmt = (
+                insert(InvoiceItem).values(invoice_items_data).returning(InvoiceItem)
+            )
+
+            result = self.db.execute(invoice_items_stmt)
 
-                invoice_items = result.scalars().all()
+            invoice_items = result.scalars().all()
 
-                total_amount = sum(item["quantity"] * item["price"] for item in items)
+            total_amount = sum(item.item_amount for item in invoice_items)
 
-                # Update the invoice
-                invoice_stmt = (
-                    update(Invoice)
-                    .where(Invoice.id == invoice.id)
-                    .values(total_amount=total_amount)
-                    .returning(Invoice)
+            # Update the invoice
+            invoice_stmt = (
+                update(Invoice)
+                .where(
+                    Invoice.id == invoice.id,
+                    Invoice.issuing_date == invoice.issuing_date,
                 )
+                .values(total_amount=total_amount)
+                .returning(Invoice)
+            )
 
-                result = self.db.execute(invoice_stmt)
-                invoice = result.scalar_one()
+            result = self.db.execute(invoice_stmt)
+            invoice = result.scalar_one()
 
-                invoice_items_pydantic = [
-                    InvoiceItemInDB(**item.__dict__, item_name=item.item.name)
-                    for item in invoice_items
-                ]
+            RollupService(self.db).record_invoiced(
+                invoice.owner_id,
+                invoice.issuing_date,
+                invoice.currency,
+                invoice.total_amount,
+            )
+            record_events(
+                self.db,
+                EventEntity.INVOICE,
+                EventAction.CREATED,
+                [(invoice.owner_id, invoice.id)],
+            )
 
-                return InvoiceInDB(
-                    **invoice.__dict__,
-                    items=invoice_items_pydantic,
-                )
+            invoice_items_pydantic = [
+                InvoiceItemInDB(**item.__dict__, item_name=item_names[item.item_id])
+                for item in invoice_items
+            ]
 
-        except Exception as e:
-            self.db.rollback()
-            raise HTTPException(
-                status_code=500,
-                detail=str(e),
+            # Built before the commit expires the loaded rows
+            created = InvoiceInDB(
+                **invoice.__dict__,
+                items=invoice_items_pydantic,
             )
+            self.db.commit()
+        except SQLAlchemyError:
+            self.db.rollback()
+            raise
+
+        return created
 
     def update_invoice(
-        self, invoice_id: int, invoice_data: InvoiceUpdate
+        self,
+        invoice_id: int,
+        invoice_data: InvoiceUpdate,
+        version: Optional[int] = None,
     ) -> InvoiceInDB:
 
         # Check if there is related payments:
@@ -144,18 +286,31 @@ class InvoiceService:
                 detail="Invoice can not be updated if there is a related payments",
             )
 
+        previous = (
+            self.db.query(Invoice.currency, Invoice.total_amount)
+            .filter(Invoice.id == invoice_id)
+            .one_or_none()
+        )
+        if previous is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Invoice not found"
+            )
+
         invoice_dict = invoice_data.model_dump()
         items = invoice_dict.pop("items")
+        item_names = self._item_names({item["item_id"] for item in items})
 
-        # Update the invoice
+        # Update the invoice, unless it changed since the client read it
         invoice_stmt = (
             update(Invoice)
-            .where(Invoice.id == invoice_id)
-            .values(**invoice_dict)
+            .where(Invoice.id == invoice_id, *version_filter(Invoice.version, version))
+            .values(**invoice_dict, version=Invoice.version + 1)
             .returning(Invoice)
         )
         result = self.db.execute(invoice_stmt)
-        invoice = result.scalar_one()
+        invoice = result.scalar_one_or_none()
+        if invoice is None:
+            raise precondition_failed("Invoice")
 
         # Delete existing items
         self.db.execute(delete(InvoiceItem).where(InvoiceItem.invoice_id == invoice_id))
@@ -164,6 +319,9 @@ class InvoiceService:
         for item in items:
             item_dict = item
             item_dict["invoice_id"] = invoice.id
+            item_dict["item_amount"] = line_amount(
+                item_dict["quantity"], item_dict["price"]
+            )
             invoice_items_data.append(item_dict)
 
         invoice_items_stmt = (
@@ -174,12 +332,15 @@ class InvoiceService:
 
         invoice_items = result.scalars().all()
 
-        total_amount = sum(item["quantity"] * item["price"] for item in items)
+        total_amount = sum(item.item_amount for item in invoice_items)
 
         # Update the invoice
         invoice_stmt = (
             update(Invoice)
-            .where(Invoice.id == invoice.id)
+            .where(
+                Invoice.id == invoice.id,
+                Invoice.issuing_date == invoice.issuing_date,
+            )
             .values(total_amount=total_amount)
             .returning(Invoice)
         )
@@ -187,17 +348,270 @@ class InvoiceService:
         result = self.db.execute(invoice_stmt)
         invoice = result.scalar_one()
 
+        # Move the old total out of the daily rollup and the new one in
+        rollup = RollupService(self.db)
+        if previous.currency == invoice.currency:
+            rollup.record_invoiced(
+                invoice.owner_id,
+                invoice.issuing_date,
+                invoice.currency,
+                invoice.total_amount - (previous.total_amount or 0),
+                count=0,
+            )
+        else:
+            rollup.record_invoiced(
+                invoice.owner_id,
+                invoice.issuing_date,
+                previous.currency,
+                -(previous.total_amount or 0),
+                count=-1,
+            )
+            rollup.record_invoiced(
+                invoice.owner_id,
+                invoice.issuing_date,
+                invoice.currency,
+                invoice.total_amount,
+            )
+        record_events(
+            self.db,
+            EventEntity.INVOICE,
+            EventAction.UPDATED,
+            [(invoice.owner_id, invoice.id)],
+        )
+
         invoice_items_pydantic = [
-            InvoiceItemInDB(**item.__dict__, item_name=item.item.name)
+            InvoiceItemInDB(**item.__dict__, item_name=item_names[item.item_id])
             for item in invoice_items
         ]
 
-        return InvoiceInDB(
+        # Built before the commit expires the loaded rows
+        updated = InvoiceInDB(
             **invoice.__dict__,
             items=invoice_items_pydantic,
         )
+        self.db.commit()
+
+        return updated
+
+    def _item_names(self, item_ids: set) -> dict:
+        # One query for all lines instead of lazy loading item by item. Scoped
+        # to the owner, another tenant's items are reported as not found.
+        item_names = dict(
+            self.db.query(Item.id, Item.name).filter(Item.id.in_(item_ids)).all()
+        )
+        check_found(item_ids, item_names, "Items")
+        return item_names
+
+    def mark_overdue(self, chunk_size: int, now: Optional[datetime] = None) -> int:
+        # Lock a bounded chunk, skipping rows held by payments in flight
+        due = (
+            select(Invoice.id)
+            .where(
+                Invoice.status.in_(OPEN_STATUSES),
+                Invoice.due_date < (now or datetime.now()),
+            )
+            .limit(chunk_size)
+            .with_for_update(skip_locked=True)
+        )
+
+        swept = self.db.execute(
+            update(Invoice)
+            .where(Invoice.id.in_(due.scalar_subquery()))
+            .values(status=InvoiceStatus.OVERDUE, version=Invoice.version + 1)
+            .returning(Invoice.owner_id, Invoice.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        record_events(self.db, EventEntity.INVOICE, EventAction.UPDATED, swept)
+        self.db.commit()
+
+        return len(swept)
+
+    def recalculate(
+        self,
+        issued_from: Optional[datetime] = None,
+        issued_to: Optional[datetime] = None,
+        client_id: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ) -> InvoiceRecalculation:
+        chunk_size = chunk_size or settings.recalculation_chunk_size
+        result = InvoiceRecalculation(invoices=0, items_changed=0, invoices_changed=0)
+        rollup = RollupService(self.db)
+        last_id = 0
+
+        while True:
+            chunk = select(Invoice.id).where(Invoice.id > last_id)
+            if issued_from is not None:
+                chunk = chunk.where(Invoice.issuing_date >= issued_from)
+            if issued_to is not None:
+                chunk = chunk.where(Invoice.issuing_date < issued_to)
+            if client_id is not None:
+                chunk = chunk.where(Invoice.client_id == client_id)
+            ids = self.db.scalars(chunk.order_by(Invoice.id).limit(chunk_size)).all()
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            items_changed, changed = self._recalculate_chunk(ids)
+            # Committed with the totals, so a run stopped halfway leaves the
+            # rollups in line with the invoices. Totals moved, counts did not
+            for row in changed:
+                delta = row.total_amount - (row.previous_total or 0)
+                if delta:
+                    rollup.record_invoiced(
+                        row.owner_id, row.issuing_date, row.currency, delta, count=0
+                    )
+            self.db.commit()
+
+            result.invoices += len(ids)
+            result.items_changed += items_changed
+            result.invoices_changed += len(changed)
+
+        return result
+
+    def enqueue_recalculation(
+        self,
+        issued_from: Optional[datetime] = None,
+        issued_to: Optional[datetime] = None,
+        client_id: Optional[int] = None,
+    ) -> int:
+        job_id = enqueue(
+            self.db,
+            "invoices.recalculate",
+            {
+                "owner_id": get_current_owner(self.db),
+                "issued_from": issued_from.isoformat() if issued_from else None,
+                "issued_to": issued_to.isoformat() if issued_to else None,
+                "client_id": client_id,
+            },
+        )
+        self.db.commit()
+        return job_id
+
+    def _recalculate_chunk(self, ids: list[int]):
+        amount = InvoiceItem.quantity * InvoiceItem.price
+        items_changed = self.db.execute(
+            update(InvoiceItem)
+            .where(
+                InvoiceItem.invoice_id.in_(ids),
+                InvoiceItem.item_amount.is_distinct_from(amount),
+            )
+            .values(item_amount=amount)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        totals = (
+            select(
+                InvoiceItem.invoice_id,
+                func.sum(InvoiceItem.item_amount).label("total_amount"),
+            )
+            .where(InvoiceItem.invoice_id.in_(ids))
+            .group_by(InvoiceItem.invoice_id)
+            .subquery()
+        )
+        previous = (
+            select(Invoice.id, Invoice.issuing_date, Invoice.total_amount)
+            .where(Invoice.id.in_(ids))
+            .subquery()
+        )
+        new_status = invoice_status(total_amount=totals.c.total_amount)
+        fully_paid = func.coalesce(Invoice.paid_amount, 0) >= totals.c.total_amount
+
+        # Only rows whose total or status actually changes are written
+        changed = self.db.execute(
+            update(Invoice)
+            .where(
+                Invoice.id == totals.c.invoice_id,
+                Invoice.id == previous.c.id,
+                Invoice.issuing_date == previous.c.issuing_date,
+                (Invoice.total_amount.is_distinct_from(totals.c.total_amount))
+                | (Invoice.status.is_distinct_from(new_status)),
+            )
+            .values(
+                total_amount=totals.c.total_amount,
+                status=new_status,
+                fully_paid_date=case(
+                    (fully_paid, func.coalesce(Invoice.fully_paid_date, func.now())),
+                    else_=None,
+                ),
+                version=Invoice.version + 1,
+            )
+            .returning(
+                Invoice.id,
+                Invoice.owner_id,
+                Invoice.issuing_date,
+                Invoice.currency,
+                Invoice.total_amount,
+                previous.c.total_amount.label("previous_total"),
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        record_events(
+            self.db,
+            EventEntity.INVOICE,
+            EventAction.UPDATED,
+            [(row.owner_id, row.id) for row in changed],
+        )
+
+        return items_changed, changed
 
     def delete_invoice(self, invoice_id: int) -> None:
-        stmt = delete(Invoice).where(Invoice.id == invoice_id)
-        self.db.execute(stmt)
+        stmt = (
+            delete(Invoice)
+            .where(Invoice.id == invoice_id)
+            .returning(
+                Invoice.owner_id,
+                Invoice.issuing_date,
+                Invoice.currency,
+                Invoice.total_amount,
+            )
+        )
+        deleted = self.db.execute(stmt).one_or_none()
+
+        if deleted is None:
+            self.db.commit()
+            return
+
+        rollup = RollupService(self.db)
+        rollup.record_invoiced(
+            deleted.owner_id,
+            deleted.issuing_date,
+            deleted.currency,
+            -(deleted.total_amount or 0),
+            count=-1,
+        )
+
+        # Items and payments have no foreign key cascade on the partitioned table
+        self.db.execute(delete(InvoiceItem).where(InvoiceItem.invoice_id == invoice_id))
+        payments = self.db.execute(
+            delete(Payment)
+            .where(Payment.invoice_id == invoice_id)
+            .returning(
+                Payment.id,
+                Payment.owner_id,
+                Payment.payment_date,
+                Payment.currency,
+                Payment.amount,
+            )
+        ).all()
+        for payment in payments:
+            rollup.record_collected(
+                payment.owner_id,
+                payment.payment_date,
+                payment.currency,
+                -payment.amount,
+                count=-1,
+            )
+
+        record_events(
+            self.db,
+            EventEntity.INVOICE,
+            EventAction.DELETED,
+            [(deleted.owner_id, invoice_id)],
+        )
+        record_events(
+            self.db,
+            EventEntity.PAYMENT,
+            EventAction.DELETED,
+            [(payment.owner_id, payment.id) for payment in payments],
+        )
         self.db.commit()
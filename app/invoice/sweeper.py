@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import SessionLocal
+from app.invoice.service import InvoiceService
+from app.utils.logger import logger
+
+
+def sweep_overdue_invoices(chunk_size: Optional[int] = None) -> int:
+    chunk_size = chunk_size or settings.overdue_sweep_chunk_size
+    now = datetime.now()
+    swept = 0
+
+    db = SessionLocal()
+    try:
+        service = InvoiceService(db)
+        while True:
+            count = service.mark_overdue(chunk_size, now)
+            swept += count
+            if count < chunk_size:
+                break
+    finally:
+        db.close()
+
+    if swept:
+        logger.info(f"Marked {swept} invoices as overdue")
+
+    return swept
+
+
+async def run_overdue_sweeper(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(sweep_overdue_invoices)
+        except Exception as e:
+            logger.error(f"Overdue sweep failed: {e}")
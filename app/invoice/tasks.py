@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.invoice.pdf import invoice_pdf
+from app.invoice.service import InvoiceService
+from app.invoice.sweeper import sweep_overdue_invoices
+from app.jobs.service import task
+from app.utils.tenancy import set_current_owner
+
+
+def _datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+@task("invoices.recalculate")
+def recalculate_invoices(
+    db: Session,
+    owner_id: Optional[int] = None,
+    issued_from: Optional[str] = None,
+    issued_to: Optional[str] = None,
+    client_id: Optional[int] = None,
+):
+    if owner_id is not None:
+        set_current_owner(db, owner_id)
+    InvoiceService(db).recalculate(
+        _datetime(issued_from), _datetime(issued_to), client_id
+    )
+
+
+@task("invoices.render_pdf")
+def render_invoice_pdf(db: Session, invoice_id: int, owner_id: int):
+    set_current_owner(db, owner_id)
+    invoice_pdf(InvoiceService(db).get_invoice(invoice_id), blocking=True)
+
+
+@task("invoices.sweep_overdue")
+def sweep_overdue(db: Session, chunk_size: Optional[int] = None):
+    sweep_overdue_invoices(chunk_size)
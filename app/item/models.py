@@ -8,10 +8,12 @@ from sqlalchemy import (
     Numeric,
     Boolean,
     ForeignKey,
+    Index,
     func,
 )
 
 from app.database import Base
+from app.utils.search import search_text, trigram_index
 
 
 class Item(Base):
@@ -24,5 +26,16 @@ class Item(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=datetime.now)
+    # Bumped on every write, for optimistic concurrency
+    version = Column(Integer, nullable=False, server_default="1")
     owner = relationship("User", back_populates="items")
     invoice_items = relationship("InvoiceItem", back_populates="item")
+
+    __table_args__ = (Index("ix_items_owner_id_id", "owner_id", "id"),)
+    # ORM flushes check and bump it too
+    __mapper_args__ = {"version_id_col": version}
+
+
+item_search_text = search_text(Item.name, Item.description)
+
+trigram_index("ix_items_search_trgm", Item.owner_id, item_search_text)
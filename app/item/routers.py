@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, status
-from typing import List
+from fastapi import APIRouter, Depends, Query, Response, status
+from typing import List, Optional
 
 from app.item.service import ItemService
 from app.item.schemas import (
@@ -7,12 +7,24 @@ from app.item.schemas import (
     ItemUpdate,
     ItemInDB,
 )
+from app.utils.batch import id_list
+from app.utils.metrics import TimedRoute
+from app.utils.search import SEARCH_LIMIT
+from app.utils.security import get_current_user
+from app.utils.versioning import if_match, set_etag
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(get_current_user)])
 
 
 @router.get("/items", response_model=List[ItemInDB])
-def get_item_list(skip: int = 0, limit: int = 100, service: ItemService = Depends()):
+def get_item_list(
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[List[int]] = Depends(id_list),
+    service: ItemService = Depends(),
+):
+    if ids is not None:
+        return service.get_items(ids)
     return service.get_item_list(skip, limit)
 
 
@@ -21,14 +33,34 @@ def create_item(item: ItemCreate, service: ItemService = Depends()):
     return service.create_item(item)
 
 
+# Declared before /items/{item_id}, which would otherwise match "search"
+@router.get("/items/search", response_model=List[ItemInDB])
+def search_items(
+    q: str = Query(..., min_length=3),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=50),
+    service: ItemService = Depends(),
+):
+    return service.search_items(q, limit)
+
+
 @router.get("/items/{item_id}", response_model=ItemInDB)
-def get_item(item_id: int, service: ItemService = Depends()):
-    return service.get_item(item_id)
+def get_item(item_id: int, response: Response, service: ItemService = Depends()):
+    item = service.get_item(item_id)
+    set_etag(response, item.version)
+    return item
 
 
 @router.put("/items/{item_id}", response_model=ItemInDB)
-def update_item(item_id: int, item: ItemUpdate, service: ItemService = Depends()):
-    return service.update_item(item_id, item)
+def update_item(
+    item_id: int,
+    item: ItemUpdate,
+    response: Response,
+    version: Optional[int] = Depends(if_match),
+    service: ItemService = Depends(),
+):
+    updated = service.update_item(item_id, item, version)
+    set_etag(response, updated.version)
+    return updated
 
 
 @router.delete("/items/{item_id}")
@@ -11,7 +11,7 @@ class ItemBase(BaseModel):
 
 
 class ItemCreate(ItemBase):
-    owner_id: int
+    pass
 
 
 class ItemUpdate(ItemBase):
@@ -23,6 +23,7 @@ class ItemInDB(ItemBase):
     owner_id: int
     created_at: datetime
     updated_at: datetime
+    version: int
 
     class Config:
         from_attributes = True
@@ -1,9 +1,14 @@
 from fastapi import Depends, HTTPException, status
 from sqlalchemy import delete, update
 from sqlalchemy.orm import Session
+from typing import List, Optional
 
 from app.database import get_db
-from app.item.models import Item
+from app.item.models import Item, item_search_text
+from app.utils.batch import check_found
+from app.utils.search import search_query
+from app.utils.tenancy import require_current_owner
+from app.utils.versioning import update_failed, version_filter
 from app.item.schemas import (
     ItemCreate,
     ItemUpdate,
@@ -17,9 +22,19 @@ class ItemService:
         self.db = db
 
     def get_item_list(self, skip: int = 0, limit: int = 100):
-        clients = self.db.query(Item).offset(skip).limit(limit).all()
+        clients = self.db.query(Item).order_by(Item.id).offset(skip).limit(limit).all()
         return clients
 
+    def get_items(self, item_ids: List[int]):
+        items = (
+            self.db.query(Item).filter(Item.id.in_(item_ids)).order_by(Item.id).all()
+        )
+        check_found(item_ids, [item.id for item in items], "Items")
+        return items
+
+    def search_items(self, q: str, limit: int):
+        return self.db.scalars(search_query(Item, item_search_text, q, limit)).all()
+
     def get_item(self, item_id: int) -> ItemInDB:
 
         item = self.db.query(Item).filter(Item.id == item_id).first()
@@ -32,6 +47,7 @@ class ItemService:
 
     def create_item(self, item_data: ItemCreate) -> ItemInDB:
         item_dict = item_data.model_dump()
+        item_dict["owner_id"] = require_current_owner(self.db)
 
         item = Item(**item_dict)
         self.db.add(item)
@@ -41,15 +57,22 @@ class ItemService:
 
         return ItemInDB.model_validate(item)
 
-    def update_item(self, item_id: int, item_data: ItemUpdate) -> ItemInDB:
+    def update_item(
+        self, item_id: int, item_data: ItemUpdate, version: Optional[int] = None
+    ) -> ItemInDB:
         item_dict = item_data.model_dump()
 
         stmt = (
-            update(Item).where(Item.id == item_id).values(**item_dict).returning(Item)
+            update(Item)
+            .where(Item.id == item_id, *version_filter(Item.version, version))
+            .values(**item_dict, version=Item.version + 1)
+            .returning(Item)
         )
 
         result = self.db.execute(stmt)
-        updated_item = result.scalar_one()
+        updated_item = result.scalar_one_or_none()
+        if updated_item is None:
+            raise update_failed(self.db, Item.id, item_id, "Item")
 
         self.db.commit()
 
@@ -0,0 +1,43 @@
+from datetime import datetime
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    Index,
+    Integer,
+    String,
+    func,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.database import Base
+from app.jobs.schemas import JobStatus
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    queue = Column(String, nullable=False, default="default")
+    task = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    # When a queued job may run, or when a running job's claim expires and
+    # another worker may take it
+    run_at = Column(DateTime, nullable=False, server_default=func.now())
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Finished jobs drop out of the index, claiming only walks pending ones
+        Index(
+            "ix_jobs_claim",
+            "queue",
+            "run_at",
+            postgresql_where=status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+        ),
+    )
@@ -0,0 +1,172 @@
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.jobs.models import Job
+from app.jobs.schemas import JobStatus
+
+PENDING = (JobStatus.QUEUED, JobStatus.RUNNING)
+
+# Task name -> handler, filled by the task modules the worker imports
+TASKS: dict[str, Callable] = {}
+
+
+def task(name: str):
+    """Registers a handler, called as handler(db, **payload)."""
+
+    def register(handler: Callable) -> Callable:
+        TASKS[name] = handler
+        return handler
+
+    return register
+
+
+def enqueue(
+    db: Session,
+    task_name: str,
+    payload: Optional[dict] = None,
+    queue: str = "default",
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+) -> int:
+    """Adds a job in the caller's transaction, it runs only if that commits."""
+    values = {
+        "queue": queue,
+        "task": task_name,
+        "payload": payload or {},
+        "max_attempts": max_attempts or settings.job_max_attempts,
+    }
+    if delay:
+        values["run_at"] = func.now() + timedelta(seconds=delay)
+    return db.execute(insert(Job).values(values).returning(Job.id)).scalar_one()
+
+
+def backoff(attempts: int) -> float:
+    delay = min(
+        settings.job_backoff_max_seconds,
+        settings.job_backoff_seconds * 2 ** (attempts - 1),
+    )
+    # Jitter keeps jobs that failed together from retrying together
+    return delay * random.uniform(0.5, 1)
+
+
+@dataclass
+class ClaimedJob:
+    id: int
+    task: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+
+class JobService:
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def claim(self, queue: str, limit: int, worker: str) -> list[ClaimedJob]:
+        # Rows another worker holds are skipped rather than waited for. A
+        # claimed job's run_at moves to the end of its visibility timeout, so
+        # a job whose worker died becomes claimable again.
+        claimable = (
+            select(Job.id)
+            .where(
+                Job.queue == queue,
+                Job.status.in_(PENDING),
+                Job.run_at <= func.now(),
+                Job.attempts < Job.max_attempts,
+            )
+            .order_by(Job.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        rows = self.db.execute(
+            update(Job)
+            .where(Job.id.in_(claimable.scalar_subquery()))
+            .values(
+                status=JobStatus.RUNNING,
+                attempts=Job.attempts + 1,
+                run_at=func.now()
+                + timedelta(seconds=settings.job_visibility_timeout_seconds),
+                locked_by=worker,
+            )
+            .returning(
+                Job.id, Job.task, Job.payload, Job.attempts, Job.max_attempts
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        self.db.commit()
+        return [ClaimedJob(*row) for row in rows]
+
+    def complete(self, jobs: list[ClaimedJob]) -> None:
+        # Matching the attempt leaves a job alone once another worker took it
+        # over after its claim expired
+        if not jobs:
+            return
+        self.db.execute(
+            update(Job)
+            .where(
+                tuple_(Job.id, Job.attempts).in_(
+                    [(job.id, job.attempts) for job in jobs]
+                ),
+                Job.status == JobStatus.RUNNING,
+            )
+            .values(status=JobStatus.DONE, finished_at=func.now(), locked_by=None)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def fail(self, job: ClaimedJob, error: str) -> None:
+        values = {"last_error": error[:2000], "locked_by": None}
+        if job.attempts >= job.max_attempts:
+            values.update(status=JobStatus.FAILED, finished_at=func.now())
+        else:
+            values.update(
+                status=JobStatus.QUEUED,
+                run_at=func.now() + timedelta(seconds=backoff(job.attempts)),
+            )
+        self.db.execute(
+            update(Job)
+            .where(
+                Job.id == job.id,
+                Job.attempts == job.attempts,
+                Job.status == JobStatus.RUNNING,
+            )
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def fail_expired(self, queue: str) -> int:
+        # Claims that ran out on their last attempt are never claimed again
+        result = self.db.execute(
+            update(Job)
+            .where(
+                Job.queue == queue,
+                Job.status == JobStatus.RUNNING,
+                Job.run_at <= func.now(),
+                Job.attempts >= Job.max_attempts,
+            )
+            .values(
+                status=JobStatus.FAILED,
+                finished_at=func.now(),
+                last_error="Visibility timeout expired",
+                locked_by=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
+
+    def purge(self, before: datetime) -> int:
+        result = self.db.execute(
+            delete(Job)
+            .where(Job.status == JobStatus.DONE, Job.finished_at < before)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
@@ -0,0 +1,131 @@
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.jobs.service import TASKS, ClaimedJob, JobService
+from app.utils.logger import logger
+import app.invoice.tasks  # noqa: F401
+
+
+class Worker:
+    """Runs the jobs of one queue on a pool of threads.
+
+    It claims no more jobs than it has idle threads, so a claimed job never
+    waits in this process while another worker could run it. Completions are
+    written back in one statement per batch.
+    """
+
+    def __init__(
+        self,
+        queue: str = "default",
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self.queue = queue
+        self.concurrency = concurrency or settings.job_worker_concurrency
+        self.batch_size = batch_size or settings.job_batch_size
+        self.poll_interval = (
+            settings.job_poll_interval_seconds
+            if poll_interval is None
+            else poll_interval
+        )
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.completed = 0
+        self.failed = 0
+
+    def stop(self, *args) -> None:
+        self.stopping.set()
+
+    def run(self, stop_when_empty: bool = False) -> None:
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        logger.info(
+            f"Worker {self.name} running queue {self.queue} "
+            f"with {self.concurrency} threads"
+        )
+        db = SessionLocal()
+        service = JobService(db)
+        running: dict[Future, ClaimedJob] = {}
+        try:
+            with ThreadPoolExecutor(
+                self.concurrency, thread_name_prefix=f"job-{self.queue}"
+            ) as executor:
+                while not self.stopping.is_set():
+                    wanted = min(self.concurrency - len(running), self.batch_size)
+                    jobs = []
+                    if wanted:
+                        jobs = service.claim(self.queue, wanted, self.name)
+                    for job in jobs:
+                        running[executor.submit(self._execute, job)] = job
+
+                    if not running:
+                        if stop_when_empty:
+                            break
+                        service.fail_expired(self.queue)
+                        self.stopping.wait(self.poll_interval)
+                        continue
+
+                    # A full batch with threads still idle means more jobs are
+                    # likely waiting, claim again right away
+                    more = wanted and len(jobs) == wanted
+                    idle = len(running) < self.concurrency
+                    done, _ = wait(
+                        running,
+                        timeout=0 if more and idle else self.poll_interval,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    self._finish(service, running, done)
+
+                # Jobs already claimed run to the end on shutdown
+                done, _ = wait(running)
+                self._finish(service, running, done)
+        finally:
+            db.close()
+
+        logger.info(
+            f"Worker {self.name} stopped after {self.completed} jobs, "
+            f"{self.failed} failed"
+        )
+
+    def _finish(self, service: JobService, running: dict, done) -> None:
+        completed = []
+        for future in done:
+            job = running.pop(future)
+            error = future.result()
+            if error is None:
+                completed.append(job)
+            else:
+                self.failed += 1
+                service.fail(job, error)
+        service.complete(completed)
+        self.completed += len(completed)
+
+    def _execute(self, job: ClaimedJob) -> Optional[str]:
+        handler = TASKS.get(job.task)
+        if handler is None:
+            return f"Unknown task {job.task}"
+
+        db = SessionLocal()
+        try:
+            handler(db, **job.payload)
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            logger.error(
+                f"Job {job.id} ({job.task}) failed on attempt {job.attempts} "
+                f"of {job.max_attempts}",
+                exc_info=True,
+            )
+            return f"{type(exc).__name__}: {exc}"
+        finally:
+            db.close()
+        return None
@@ -1,23 +1,64 @@
-from fastapi import FastAPI, HTTPException, Request
+import asyncio
+import hmac
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.config import settings
 from app.utils.logger import logger
+from app.utils.admission import AdmissionMiddleware, controller as admission
+from app.utils.encoding import EncodingMiddleware, NegotiatedResponse
+from app.utils.metrics import MetricsMiddleware, registry
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.slow_queries import recorder
+from app.utils.request_stats import RequestStatsMiddleware
 from app.auth.routers import router as auth_router
 from app.item.routers import router as item_router
 from app.payment.routers import router as payment_router
 from app.invoice.routers import router as invoice_router
 from app.client.routers import router as client_router
+from app.report.routers import router as report_router
+from app.dashboard.routers import router as dashboard_router
+from app.events.routers import router as events_router
+from app.events.broker import broker
+from app.invoice.sweeper import run_overdue_sweeper
 from app.database import create_tables
+from app.invoice.pdf import shutdown_render_pool
+from app.utils.security import shutdown_hash_pool
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
 
-create_tables()
+    if settings.overdue_sweep_interval_seconds > 0:
+        tasks.append(
+            asyncio.create_task(
+                run_overdue_sweeper(settings.overdue_sweep_interval_seconds)
+            )
+        )
+
+    if settings.events_enabled:
+        await broker.start()
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+
+    if settings.events_enabled:
+        await broker.stop()
 
-logger.basicConfig()
-logger.getLogger("sqlalchemy.engine").setLevel(logger.INFO)
+    shutdown_hash_pool()
+    shutdown_render_pool()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=NegotiatedResponse)
+
+create_tables()
 
 
 app.include_router(auth_router)
@@ -25,6 +66,23 @@ app.include_router(client_router)
 app.include_router(item_router)
 app.include_router(invoice_router)
 app.include_router(payment_router)
+app.include_router(report_router)
+app.include_router(dashboard_router)
+if settings.events_enabled:
+    app.include_router(events_router)
+
+# Innermost, so the metrics include the time spent compressing
+app.add_middleware(
+    EncodingMiddleware, minimum_size=settings.compression_minimum_size
+)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+# Outside the profiler, inside the metrics so rejections are counted
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestStatsMiddleware)
 
 
 @app.exception_handler(HTTPException)
@@ -33,6 +91,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"message": exc.detail},
+        headers=exc.headers,
     )
 
 
@@ -57,3 +116,36 @@ async def request_validation_exception_handler(
 @app.get("/")
 def home():
     return {"message": "Invoice Tracker App"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body = registry.render()
+    if settings.admission_enabled:
+        body += admission.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+def slow_query_token(x_slow_query_token: Optional[str] = Header(None)):
+    # Statement shapes and plans describe the schema, only for operators
+    if not settings.slow_query_token or not hmac.compare_digest(
+        (x_slow_query_token or "").encode("latin-1"),
+        settings.slow_query_token.encode("latin-1"),
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized"
+        )
+
+
+if settings.slow_query_endpoint_enabled:
+
+    @app.get(
+        "/internal/slow-queries",
+        include_in_schema=False,
+        dependencies=[Depends(slow_query_token)],
+    )
+    def slow_queries():
+        return recorder.snapshot()
+
+
+registry.prepare(app.routes)
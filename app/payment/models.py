@@ -8,6 +8,7 @@ from sqlalchemy import (
     Numeric,
     Enum,
     ForeignKey,
+    Index,
     func,
 )
 
@@ -17,18 +18,35 @@ from app.payment.schemas import PaymentStatus, PaymentMethod
 
 class Payment(Base):
     __tablename__ = "payments"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
     client_id = Column(Integer, ForeignKey("clients.id"))
-    invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="CASCADE"))
+    # No foreign key, a partitioned invoices table has no unique id to reference
+    invoice_id = Column(Integer)
     status = Column(Enum(PaymentStatus), default=PaymentStatus.COMPLETED)
     description = Column(String, nullable=True)
     amount = Column(Numeric, nullable=False)
     currency = Column(String, default="USD")
     payment_method = Column(Enum(PaymentMethod), default=PaymentMethod.CASH)
-    payment_date = Column(DateTime, nullable=False)
+    # Partition key, part of the primary key as PostgreSQL requires
+    payment_date = Column(DateTime, primary_key=True, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=datetime.now)
+    # Bumped on every write, for optimistic concurrency
+    version = Column(Integer, nullable=False, server_default="1")
     owner = relationship("User", back_populates="payments")
     client = relationship("Client", back_populates="payments")
-    invoice = relationship("Invoice", back_populates="payments", passive_deletes=True)
+    invoice = relationship(
+        "Invoice",
+        back_populates="payments",
+        primaryjoin="Invoice.id == foreign(Payment.invoice_id)",
+    )
+
+    __table_args__ = (
+        Index("ix_payments_owner_id_id", "owner_id", "id"),
+        Index("ix_payments_owner_id_payment_date", "owner_id", "payment_date"),
+        Index("ix_payments_invoice_id", "invoice_id"),
+        {"postgresql_partition_by": "RANGE (payment_date)"},
+    )
+    # ORM flushes check and bump it too
+    __mapper_args__ = {"version_id_col": version}
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, status
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, Response, status
+from typing import List, Optional
 
 from app.payment.service import PaymentService
 from app.payment.schemas import (
@@ -7,15 +8,26 @@ from app.payment.schemas import (
     PaymentUpdate,
     PaymentInDB,
 )
+from app.utils.batch import id_list
+from app.utils.metrics import TimedRoute
+from app.utils.security import get_current_user
+from app.utils.versioning import if_match, set_etag
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(get_current_user)])
 
 
 @router.get("/payments", response_model=List[PaymentInDB])
 def get_payment_list(
-    skip: int = 0, limit: int = 100, service: PaymentService = Depends()
+    skip: int = 0,
+    limit: int = 100,
+    paid_from: Optional[datetime] = None,
+    paid_to: Optional[datetime] = None,
+    ids: Optional[List[int]] = Depends(id_list),
+    service: PaymentService = Depends(),
 ):
-    return service.get_payment_list(skip, limit)
+    if ids is not None:
+        return service.get_payments(ids)
+    return service.get_payment_list(skip, limit, paid_from, paid_to)
 
 
 @router.post(
@@ -25,16 +37,36 @@ def create_payment(payment: PaymentCreate, service: PaymentService = Depends()):
     return service.create_payment(payment)
 
 
+@router.get("/invoices/{invoice_id}/payments", response_model=List[PaymentInDB])
+def get_invoice_payments(
+    invoice_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    service: PaymentService = Depends(),
+):
+    return service.get_invoice_payments(invoice_id, skip, limit)
+
+
 @router.get("/payments/{payment_id}", response_model=PaymentInDB)
-def get_payment(payment_id: int, service: PaymentService = Depends()):
-    return service.get_payment(payment_id)
+def get_payment(
+    payment_id: int, response: Response, service: PaymentService = Depends()
+):
+    payment = service.get_payment(payment_id)
+    set_etag(response, payment.version)
+    return payment
 
 
 @router.put("/payments/{payment_id}", response_model=PaymentInDB)
 def update_payment(
-    payment_id: int, payment: PaymentUpdate, service: PaymentService = Depends()
+    payment_id: int,
+    payment: PaymentUpdate,
+    response: Response,
+    version: Optional[int] = Depends(if_match),
+    service: PaymentService = Depends(),
 ):
-    return service.update_payment(payment_id, payment)
+    updated = service.update_payment(payment_id, payment, version)
+    set_etag(response, updated.version)
+    return updated
 
 
 @router.delete("/payments/{payment_id}")
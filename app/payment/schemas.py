@@ -25,7 +25,6 @@ class PaymentBase(BaseModel):
 
 
 class PaymentCreate(PaymentBase):
-    owner_id: int
     client_id: int
     invoice_id: int
     payment_date: Optional[datetime] = datetime.now()
@@ -43,6 +42,7 @@ class PaymentInDB(PaymentBase):
     payment_date: datetime
     created_at: datetime
     updated_at: datetime
+    version: int
 
     class Config:
         from_attributes = True
@@ -2,12 +2,21 @@ from decimal import Decimal
 from fastapi import Depends, HTTPException, status
 from sqlalchemy import delete, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
+from typing import List, Optional
 
 from app.database import get_db
+from app.utils.batch import check_found
+from app.events.schemas import EventAction, EventEntity
+from app.events.service import record_events
 from app.invoice.models import Invoice
 from app.payment.models import Payment
+from app.report.service import RollupService
+from app.utils.tenancy import require_current_owner
+from app.utils.versioning import precondition_failed
 from app.invoice.schemas import InvoiceStatus
+from app.invoice.service import invoice_status
 from app.payment.schemas import (
     PaymentCreate,
     PaymentUpdate,
@@ -20,8 +29,51 @@ class PaymentService:
     def __init__(self, db: Session = Depends(get_db)):
         self.db = db
 
-    def get_payment_list(self, skip: int = 0, limit: int = 100):
-        return self.db.query(Payment).offset(skip).limit(limit).all()
+    def get_payment_list(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        paid_from: Optional[datetime] = None,
+        paid_to: Optional[datetime] = None,
+    ):
+        query = self.db.query(Payment)
+
+        # Plain comparisons on the partition key let PostgreSQL prune partitions
+        if paid_from is not None:
+            query = query.filter(Payment.payment_date >= paid_from)
+        if paid_to is not None:
+            query = query.filter(Payment.payment_date < paid_to)
+
+        return query.order_by(Payment.id).offset(skip).limit(limit).all()
+
+    def get_payments(self, payment_ids: List[int]):
+        payments = (
+            self.db.query(Payment)
+            .filter(Payment.id.in_(payment_ids))
+            .order_by(Payment.id)
+            .all()
+        )
+        check_found(payment_ids, [payment.id for payment in payments], "Payments")
+        return payments
+
+    def get_invoice_payments(self, invoice_id: int, skip: int = 0, limit: int = 100):
+        if limit > 100:
+            limit = 100
+
+        invoice = self.db.query(Invoice.id).filter(Invoice.id == invoice_id).first()
+        if invoice is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Invoice not found"
+            )
+
+        return (
+            self.db.query(Payment)
+            .filter(Payment.invoice_id == invoice_id)
+            .order_by(Payment.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
 
     def get_payment(self, payment_id: int) -> PaymentInDB:
         payment = self.db.query(Payment).filter(Payment.id == payment_id).first()
@@ -35,6 +87,7 @@ class PaymentService:
 
     def create_payment(self, payment_data: PaymentCreate) -> PaymentInDB:
         payment_dict = payment_data.model_dump()
+        payment_dict["owner_id"] = require_current_owner(self.db)
 
         # Retrieve the invoice
         invoice = (
@@ -46,6 +99,13 @@ class PaymentService:
         if invoice is None:
             raise HTTPException(status_code=404, detail="Invoice not found.")
 
+        # The invoice is scoped to the owner, its client is the owner's too
+        if payment_dict["client_id"] != invoice.client_id:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="The payment's client is not the invoice's client.",
+            )
+
         if invoice.status is InvoiceStatus.PAID:
             raise HTTPException(
                 status_code=400, detail="Invoice is already fully paid."
@@ -69,12 +129,19 @@ class PaymentService:
         # Update invoice
         self.db.execute(
             update(Invoice)
-            .where(Invoice.id == invoice.id)
-            .values(paid_amount=new_paid_amount)
+            .where(
+                Invoice.id == invoice.id,
+                Invoice.issuing_date == invoice.issuing_date,
+            )
+            .values(paid_amount=new_paid_amount, version=Invoice.version + 1)
         )
 
         invoice.payments.append(payment)
 
+        RollupService(self.db).record_collected(
+            payment.owner_id, payment.payment_date, payment.currency, payment.amount
+        )
+
         # Check if invoice is fully paid
         fully_paid_check = (
             self.db.query(Invoice.paid_amount == invoice.total_amount)
@@ -85,20 +152,38 @@ class PaymentService:
         if fully_paid_check:
             self.db.execute(
                 update(Invoice)
-                .where(Invoice.id == invoice.id)
+                .where(
+                    Invoice.id == invoice.id,
+                    Invoice.issuing_date == invoice.issuing_date,
+                )
                 .values(
                     status=InvoiceStatus.PAID,
                     fully_paid_date=payment_dict["payment_date"] or datetime.now(),
                 )
             )
+        else:
+            # Partially paid, or still overdue if the due date has passed
+            self.db.execute(
+                update(Invoice)
+                .where(
+                    Invoice.id == invoice.id,
+                    Invoice.issuing_date == invoice.issuing_date,
+                )
+                .values(status=invoice_status())
+            )
 
+        self.db.flush()
+        self._record_events(payment, EventAction.CREATED)
         self.db.commit()
         self.db.refresh(payment)
 
         return PaymentInDB.model_validate(payment)
 
     def update_payment(
-        self, payment_id: int, payment_data: PaymentUpdate
+        self,
+        payment_id: int,
+        payment_data: PaymentUpdate,
+        version: Optional[int] = None,
     ) -> PaymentInDB:
         payment_dict = payment_data.model_dump()
 
@@ -108,6 +193,9 @@ class PaymentService:
         if payment is None:
             raise HTTPException(status_code=404, detail="Payment not found.")
 
+        if version is not None and payment.version != version:
+            raise precondition_failed("Payment")
+
         # Retrieve the invoice
         invoice = (
             self.db.query(Invoice)
@@ -132,23 +220,47 @@ class PaymentService:
                 detail=f"New total payments amount {new_total_payments_amount} should not exceed the invoice total amount {invoice.total_amount}",
             )
 
+        RollupService(self.db).record_collected(
+            payment.owner_id,
+            payment.payment_date,
+            payment.currency,
+            Decimal(str(payment_dict["amount"])) - Decimal(str(payment.amount)),
+            count=0,
+        )
+
         # Update the payment
         payment.amount = payment_dict["amount"]
 
         self.db.add(payment)
 
+        # Flushed now, before the invoice UPDATEs autoflush it: the payment's
+        # UPDATE only matches the version read above, a concurrent update in
+        # between is a conflict as well
+        try:
+            self.db.flush()
+        except StaleDataError:
+            raise precondition_failed("Payment")
+
         # Update the invoice paid amount
         self.db.execute(
             update(Invoice)
-            .where(Invoice.id == invoice.id)
-            .values(paid_amount=new_total_payments_amount)
+            .where(
+                Invoice.id == invoice.id,
+                Invoice.issuing_date == invoice.issuing_date,
+            )
+            .values(
+                paid_amount=new_total_payments_amount, version=Invoice.version + 1
+            )
         )
 
         # Check if invoice is fully paid and update status and fully paid date
         if new_total_payments_amount == invoice.total_amount:
             self.db.execute(
                 update(Invoice)
-                .where(Invoice.id == invoice.id)
+                .where(
+                    Invoice.id == invoice.id,
+                    Invoice.issuing_date == invoice.issuing_date,
+                )
                 .values(
                     status=InvoiceStatus.PAID,
                     fully_paid_date=datetime.now(),
@@ -157,10 +269,14 @@ class PaymentService:
         else:
             self.db.execute(
                 update(Invoice)
-                .where(Invoice.id == invoice.id)
-                .values(status=InvoiceStatus.PARTIALLY_PAID)
+                .where(
+                    Invoice.id == invoice.id,
+                    Invoice.issuing_date == invoice.issuing_date,
+                )
+                .values(status=invoice_status(), fully_paid_date=None)
             )
 
+        self._record_events(payment, EventAction.UPDATED)
         self.db.commit()
 
         self.db.refresh(payment)
@@ -189,12 +305,44 @@ class PaymentService:
             # Update the invoice status and paid amount
             self.db.execute(
                 update(Invoice)
-                .where(Invoice.id == invoice.id)
+                .where(
+                    Invoice.id == invoice.id,
+                    Invoice.issuing_date == invoice.issuing_date,
+                )
                 .values(
-                    paid_amount=new_paid_amount, status=InvoiceStatus.PARTIALLY_PAID
+                    paid_amount=new_paid_amount,
+                    status=invoice_status(paid_amount=new_paid_amount),
+                    fully_paid_date=None,
+                    version=Invoice.version + 1,
                 )
             )
 
+        RollupService(self.db).record_collected(
+            payment.owner_id,
+            payment.payment_date,
+            payment.currency,
+            -payment.amount,
+            count=-1,
+        )
+
         self.db.execute(delete(Payment).where(Payment.id == payment_id))
 
+        self._record_events(
+            payment, EventAction.DELETED, invoice_changed=invoice is not None
+        )
         self.db.commit()
+
+    def _record_events(
+        self, payment: Payment, action: EventAction, invoice_changed: bool = True
+    ) -> None:
+        # A payment always moves its invoice's paid amount and status
+        record_events(
+            self.db, EventEntity.PAYMENT, action, [(payment.owner_id, payment.id)]
+        )
+        if invoice_changed:
+            record_events(
+                self.db,
+                EventEntity.INVOICE,
+                EventAction.UPDATED,
+                [(payment.owner_id, payment.invoice_id)],
+            )
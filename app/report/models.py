@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    String,
+    Integer,
+    Numeric,
+    ForeignKey,
+    func,
+)
+
+from app.database import Base
+
+
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    currency = Column(String, primary_key=True, default="USD")
+    invoiced_amount = Column(Numeric, nullable=False, default=0)
+    collected_amount = Column(Numeric, nullable=False, default=0)
+    invoice_count = Column(Integer, nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=datetime.now)
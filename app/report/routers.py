@@ -0,0 +1,21 @@
+from datetime import date
+from fastapi import APIRouter, Depends
+from typing import List, Optional
+
+from app.report.service import ReportService
+from app.report.schemas import Granularity, TimeseriesPoint
+from app.utils.metrics import TimedRoute
+from app.utils.security import get_current_user
+
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(get_current_user)])
+
+
+@router.get("/reports/timeseries", response_model=List[TimeseriesPoint])
+def get_timeseries(
+    granularity: Granularity = Granularity.DAY,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    base_currency: Optional[str] = None,
+    service: ReportService = Depends(),
+):
+    return service.get_timeseries(granularity, start, end, base_currency)
@@ -0,0 +1,16 @@
+import enum
+from pydantic import BaseModel
+from datetime import date
+
+
+class Granularity(enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class TimeseriesPoint(BaseModel):
+    period: date
+    currency: str
+    invoiced_amount: float = 0
+    collected_amount: float = 0
@@ -0,0 +1,283 @@
+from datetime import date, datetime, time, timedelta
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import Date, cast, delete, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.config import settings
+from app.database import get_db
+from app.fx.service import (
+    Conversion,
+    check_missing_rates,
+    currency_column,
+    normalize_currency,
+)
+from app.invoice.models import Invoice
+from app.payment.models import Payment
+from app.report.models import DailyRollup
+from app.report.schemas import Granularity, TimeseriesPoint
+
+
+def horizon_start() -> date:
+    return date.today() - timedelta(days=settings.rollup_horizon_days)
+
+
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _day_range(start: date, end: date):
+    return datetime.combine(start, time.min), datetime.combine(
+        end + timedelta(days=1), time.min
+    )
+
+
+class RollupService:
+
+    def __init__(self, db: Session = Depends(get_db)):
+        self.db = db
+
+    def record_invoiced(
+        self, owner_id: int, issuing_date, currency, amount, count: int = 1
+    ) -> None:
+        self._apply(
+            owner_id,
+            issuing_date,
+            currency,
+            invoiced_amount=amount or 0,
+            invoice_count=count,
+        )
+
+    def record_collected(
+        self, owner_id: int, payment_date, currency, amount, count: int = 1
+    ) -> None:
+        self._apply(
+            owner_id,
+            payment_date,
+            currency,
+            collected_amount=amount or 0,
+            payment_count=count,
+        )
+
+    def _apply(self, owner_id: int, moment, currency, **deltas) -> None:
+        if owner_id is None or moment is None:
+            return
+
+        values = {
+            "owner_id": owner_id,
+            "day": _day(moment),
+            "currency": normalize_currency(currency) or "USD",
+            "invoiced_amount": 0,
+            "collected_amount": 0,
+            "invoice_count": 0,
+            "payment_count": 0,
+        }
+        values.update(deltas)
+
+        stmt = insert(DailyRollup).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyRollup.owner_id, DailyRollup.day, DailyRollup.currency],
+            set_={
+                column: getattr(DailyRollup, column) + stmt.excluded[column]
+                for column in deltas
+            },
+        )
+        self.db.execute(stmt)
+
+    def refresh(self, start: date, end: date) -> int:
+        lower, upper = _day_range(start, end)
+
+        invoiced = select(
+            Invoice.owner_id.label("owner_id"),
+            cast(Invoice.issuing_date, Date).label("day"),
+            currency_column(Invoice.currency).label("currency"),
+            func.coalesce(Invoice.total_amount, 0).label("invoiced_amount"),
+            literal(0).label("collected_amount"),
+            literal(1).label("invoice_count"),
+            literal(0).label("payment_count"),
+        ).where(
+            Invoice.owner_id.is_not(None),
+            Invoice.issuing_date >= lower,
+            Invoice.issuing_date < upper,
+        )
+
+        collected = select(
+            Payment.owner_id.label("owner_id"),
+            cast(Payment.payment_date, Date).label("day"),
+            currency_column(Payment.currency).label("currency"),
+            literal(0).label("invoiced_amount"),
+            Payment.amount.label("collected_amount"),
+            literal(0).label("invoice_count"),
+            literal(1).label("payment_count"),
+        ).where(
+            Payment.owner_id.is_not(None),
+            Payment.payment_date >= lower,
+            Payment.payment_date < upper,
+        )
+
+        combined = union_all(invoiced, collected).subquery()
+        aggregated = select(
+            combined.c.owner_id,
+            combined.c.day,
+            combined.c.currency,
+            func.sum(combined.c.invoiced_amount),
+            func.sum(combined.c.collected_amount),
+            func.sum(combined.c.invoice_count),
+            func.sum(combined.c.payment_count),
+        ).group_by(combined.c.owner_id, combined.c.day, combined.c.currency)
+
+        self.db.execute(
+            delete(DailyRollup).where(DailyRollup.day >= start, DailyRollup.day <= end)
+        )
+        result = self.db.execute(
+            insert(DailyRollup).from_select(
+                [
+                    "owner_id",
+                    "day",
+                    "currency",
+                    "invoiced_amount",
+                    "collected_amount",
+                    "invoice_count",
+                    "payment_count",
+                ],
+                aggregated,
+            )
+        )
+        self.db.commit()
+
+        return result.rowcount
+
+
+class ReportService:
+
+    def __init__(self, db: Session = Depends(get_db)):
+        self.db = db
+
+    def get_timeseries(
+        self,
+        granularity: Granularity,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        base_currency: Optional[str] = None,
+    ) -> List[TimeseriesPoint]:
+        base = normalize_currency(base_currency)
+        end = end or date.today()
+        start = start or end - timedelta(days=365)
+
+        if start > end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start must not be after end",
+            )
+
+        points = {}
+
+        # Days covered by the rollup table are read from it, older days fall
+        # back to aggregating the source tables.
+        boundary = horizon_start()
+
+        if start < boundary:
+            fallback_end = min(end, boundary - timedelta(days=1))
+            for rows in (
+                self._invoiced_rows(granularity, start, fallback_end, base),
+                self._collected_rows(granularity, start, fallback_end, base),
+            ):
+                self._merge(points, rows)
+
+        if end >= boundary:
+            rollup_start = max(start, boundary)
+            self._merge(
+                points, self._rollup_rows(granularity, rollup_start, end, base)
+            )
+
+        return [points[key] for key in sorted(points)]
+
+    def _rollup_rows(
+        self, granularity: Granularity, start: date, end: date, base: Optional[str]
+    ):
+        return self._aggregate(
+            granularity,
+            DailyRollup.day,
+            DailyRollup.currency,
+            {
+                "invoiced_amount": DailyRollup.invoiced_amount,
+                "collected_amount": DailyRollup.collected_amount,
+            },
+            [DailyRollup.day >= start, DailyRollup.day <= end],
+            base,
+        )
+
+    def _invoiced_rows(
+        self, granularity: Granularity, start: date, end: date, base: Optional[str]
+    ):
+        lower, upper = _day_range(start, end)
+        return self._aggregate(
+            granularity,
+            Invoice.issuing_date,
+            currency_column(Invoice.currency),
+            {"invoiced_amount": Invoice.total_amount},
+            [Invoice.issuing_date >= lower, Invoice.issuing_date < upper],
+            base,
+        )
+
+    def _collected_rows(
+        self, granularity: Granularity, start: date, end: date, base: Optional[str]
+    ):
+        lower, upper = _day_range(start, end)
+        return self._aggregate(
+            granularity,
+            Payment.payment_date,
+            currency_column(Payment.currency),
+            {"collected_amount": Payment.amount},
+            [Payment.payment_date >= lower, Payment.payment_date < upper],
+            base,
+        )
+
+    def _aggregate(
+        self,
+        granularity: Granularity,
+        moment,
+        currency,
+        amounts: dict,
+        criteria: list,
+        base: Optional[str],
+    ):
+        period = cast(func.date_trunc(granularity.value, moment), Date)
+
+        if base is None:
+            stmt = select(
+                period.label("period"),
+                currency.label("currency"),
+                *(func.sum(amount).label(name) for name, amount in amounts.items()),
+            ).group_by(period, currency)
+        else:
+            # Converted on the day of each row, then summed per period
+            conversion = Conversion(base, currency, cast(moment, Date))
+            stmt = conversion.join(
+                select(
+                    period.label("period"),
+                    literal(base).label("currency"),
+                    *(
+                        func.sum(conversion.amount(amount)).label(name)
+                        for name, amount in amounts.items()
+                    ),
+                    conversion.missing().label("missing"),
+                ).group_by(period)
+            )
+
+        rows = self.db.execute(stmt.where(*criteria)).mappings().all()
+        if base is not None:
+            check_missing_rates(rows, base)
+        return rows
+
+    def _merge(self, points: dict, rows) -> None:
+        for row in rows:
+            key = (row["period"], row["currency"])
+            point = points.get(key)
+            if point is None:
+                point = points[key] = TimeseriesPoint(
+                    period=row["period"], currency=row["currency"]
+                )
+            point.invoiced_amount += float(row.get("invoiced_amount") or 0)
+            point.collected_amount += float(row.get("collected_amount") or 0)
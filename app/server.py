@@ -0,0 +1,284 @@
+"""Prefork server.
+
+The master binds the socket and starts a zygote, a fresh interpreter that
+imports and warms the app once, then forks the workers from it. Workers
+share the warm memory copy-on-write. SIGHUP starts a new zygote with the
+current code and, once its workers are serving, gracefully stops the old
+one. Both generations accept on the same socket, so no connection is
+refused during a reload.
+
+    python -m app.server serve --workers 4
+"""
+import gc
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import typer
+import uvicorn
+
+from app.config import settings
+from app.utils.logger import logger
+
+# Between worker restarts, and between zygote restarts after a crash
+RESPAWN_DELAY_SECONDS = 1
+# Zygotes that keep failing are restarted at doubling delays up to this
+MAX_RESPAWN_DELAY_SECONDS = 60
+
+cli = typer.Typer()
+
+
+def warm_app():
+    """Imports the app and does the one-off work every worker would repeat."""
+    from sqlalchemy.orm import configure_mappers
+
+    from app.database import engine
+    from app.main import app
+
+    # Mappers are otherwise configured by the first query of every worker
+    configure_mappers()
+    # Builds the JSON schema of every request and response model
+    app.openapi()
+
+    # No connection may be shared with the workers
+    engine.dispose()
+
+    # Keeps the collector from writing to the shared objects, which would
+    # copy their pages into every worker
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+class WorkerServer(uvicorn.Server):
+    """Reports to the master once serving, exits when the zygote is gone."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+        self.zygote_pid = os.getppid()
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+
+    async def on_tick(self, counter: int) -> bool:
+        if os.getppid() != self.zygote_pid:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+def _run_worker(app, sock: socket.socket, ready_fd: int, graceful_timeout: float):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Reloads are the master's business
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    config = uvicorn.Config(app, timeout_graceful_shutdown=graceful_timeout)
+    server = WorkerServer(config, ready_fd)
+    server.run(sockets=[sock])
+    return 0 if server.started else 1
+
+
+@cli.command(hidden=True)
+def zygote(
+    fd: int = typer.Option(...),
+    ready_fd: int = typer.Option(...),
+    workers: int = typer.Option(...),
+    graceful_timeout: float = typer.Option(...),
+):
+    app = warm_app()
+    sock = socket.socket(fileno=fd)
+    master_pid = os.getppid()
+    children: set[int] = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _run_worker(app, sock, ready_fd, graceful_timeout)
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            children.discard(pid)
+            if not stopping:
+                code = os.waitstatus_to_exitcode(status)
+                logger.error(f"Worker {pid} exited with status {code}")
+                time.sleep(RESPAWN_DELAY_SECONDS)
+                spawn()
+            continue
+        if not stopping and os.getppid() != master_pid:
+            logger.error("Master process gone, stopping workers")
+            stop(signal.SIGTERM, None)
+        time.sleep(0.1)
+
+
+class Generation:
+    """A zygote and its workers, running the code as of their start."""
+
+    def __init__(self, sock: socket.socket, workers: int, graceful_timeout: float):
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.ready_fd, write_fd = os.pipe()
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "app.server",
+                "zygote",
+                "--fd",
+                str(sock.fileno()),
+                "--ready-fd",
+                str(write_fd),
+                "--workers",
+                str(workers),
+                "--graceful-timeout",
+                str(graceful_timeout),
+            ],
+            pass_fds=(sock.fileno(), write_fd),
+        )
+        os.close(write_fd)
+        self.stopped = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        # Every worker writes one byte once it accepts connections
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.workers:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.process.poll() is not None:
+                return False
+            if select.select([self.ready_fd], [], [], remaining)[0]:
+                ready += len(os.read(self.ready_fd, self.workers))
+        return True
+
+    def drain(self, timeout: float) -> None:
+        # Readiness of respawned workers, read so the pipe never fills up
+        if select.select([self.ready_fd], [], [], timeout)[0]:
+            os.read(self.ready_fd, 1024)
+
+    def stop(self) -> None:
+        if self.stopped:
+            return
+        self.stopped = True
+        self.process.terminate()
+        try:
+            self.process.wait(self.graceful_timeout + 5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        os.close(self.ready_fd)
+
+
+def _stopping(signals: list) -> bool:
+    return signal.SIGTERM in signals or signal.SIGINT in signals
+
+
+def _sleep(seconds: float, signals: list) -> None:
+    # Cut short by a stop signal
+    deadline = time.monotonic() + seconds
+    while not _stopping(signals):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, 0.5))
+
+
+@cli.command()
+def serve(
+    host: str = typer.Option("127.0.0.1"),
+    port: int = typer.Option(8000),
+    workers: Optional[int] = typer.Option(None, help="Worker processes"),
+    graceful_timeout: Optional[float] = typer.Option(
+        None, help="Seconds in-flight requests get to finish on stop or reload"
+    ),
+):
+    workers = workers or settings.server_workers
+    if graceful_timeout is None:
+        graceful_timeout = settings.server_graceful_timeout_seconds
+
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+
+    signals = []
+    for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: signals.append(signum))
+
+    current = Generation(sock, workers, graceful_timeout)
+    if not current.wait_ready(settings.server_ready_timeout_seconds):
+        current.stop()
+        logger.error("Workers did not start")
+        raise typer.Exit(1)
+    logger.info(f"Serving on http://{host}:{port} with {workers} workers")
+
+    respawn_delay = RESPAWN_DELAY_SECONDS
+    while True:
+        if _stopping(signals):
+            break
+
+        if signal.SIGHUP in signals:
+            signals.clear()
+            logger.info("Reloading")
+            new = Generation(sock, workers, graceful_timeout)
+            # The old generation keeps serving until the new one is ready
+            if new.wait_ready(settings.server_ready_timeout_seconds):
+                current.stop()
+                current = new
+                logger.info("Reloaded")
+            else:
+                new.stop()
+                logger.error("Reload failed, the previous workers keep serving")
+
+        if current.process.poll() is not None:
+            current.stop()
+            logger.error(f"Zygote exited, starting a new one in {respawn_delay}s")
+            _sleep(respawn_delay, signals)
+            if _stopping(signals):
+                break
+            current = Generation(sock, workers, graceful_timeout)
+            if not current.wait_ready(settings.server_ready_timeout_seconds):
+                # Stopped, so the next pass starts another one after a longer
+                # delay
+                current.stop()
+                logger.error("Restarted zygote did not start its workers")
+                respawn_delay = min(respawn_delay * 2, MAX_RESPAWN_DELAY_SECONDS)
+                continue
+            logger.info("Zygote restarted")
+            respawn_delay = RESPAWN_DELAY_SECONDS
+
+        current.drain(1)
+
+    current.stop()
+    sock.close()
+
+
+if __name__ == "__main__":
+    cli()
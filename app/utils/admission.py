@@ -0,0 +1,240 @@
+import asyncio
+from collections import defaultdict, deque
+from typing import Optional
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.utils.security import bearer_owner_id
+
+RETRY_AFTER_SECONDS = 1
+
+READ = "read"
+WRITE = "write"
+REPORT = "report"
+AUTH = "auth"
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+REPORT_PREFIXES = ("/reports", "/dashboard", "/invoices/pdf", "/invoices/recalculate")
+
+# Long lived streams and operational endpoints never wait for a slot
+EXEMPT_PREFIXES = ("/events", "/metrics", "/internal/", "/docs", "/redoc", "/openapi")
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """The limit a request counts against, None for exempt requests."""
+    if path == "/" or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/auth"):
+        return AUTH
+    if path.startswith(REPORT_PREFIXES) or path.endswith("/pdf"):
+        return REPORT
+    if method in READ_METHODS:
+        return READ
+    return WRITE
+
+
+class Limiter:
+    """A concurrency limit with a bounded FIFO queue of waiting requests.
+
+    Slots are handed from a finishing request to the first waiter, so a new
+    arrival never overtakes the queue.
+    """
+
+    def __init__(self, limit: int, queue_size: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = defaultdict(int)
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self.waiters) >= self.queue_size:
+            self.rejected["queue_full"] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self.rejected["timeout"] += 1
+            return False
+        except asyncio.CancelledError:
+            # The client went away just after being handed a slot
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    """Concurrency limits per route class and per owner.
+
+    The sync routes share one threadpool and one connection pool. A bounded
+    number of requests of each class run at a time, the next ones wait in
+    line for up to ADMISSION_QUEUE_TIMEOUT_SECONDS and are rejected with 503
+    when the line is full or the wait runs out. An owner with
+    ADMISSION_OWNER_LIMIT requests already in flight gets 429, so a single
+    tenant can not take every slot of a class.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, int],
+        queue_size: int,
+        queue_timeout: float,
+        owner_limit: int,
+    ):
+        self.limiters = {
+            name: Limiter(limit, queue_size) for name, limit in limits.items()
+        }
+        self.queue_timeout = queue_timeout
+        self.owner_limit = owner_limit
+        self.owners: dict[int, int] = {}
+        self.owner_rejected = defaultdict(int)
+
+    def render(self) -> str:
+        lines = []
+        for name, description, kind, value in (
+            (
+                "admission_in_flight",
+                "Requests holding a slot.",
+                "gauge",
+                lambda limiter: limiter.active,
+            ),
+            (
+                "admission_queue_depth",
+                "Requests waiting for a slot.",
+                "gauge",
+                lambda limiter: len(limiter.waiters),
+            ),
+            (
+                "admission_limit",
+                "Slots per route class.",
+                "gauge",
+                lambda limiter: limiter.limit,
+            ),
+            (
+                "admission_admitted_total",
+                "Requests admitted.",
+                "counter",
+                lambda limiter: limiter.admitted,
+            ),
+        ):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for route_class, limiter in self.limiters.items():
+                lines.append(f'{name}{{class="{route_class}"}} {value(limiter)}')
+
+        lines.append("# HELP admission_rejected_total Requests turned away.")
+        lines.append("# TYPE admission_rejected_total counter")
+        for route_class, limiter in self.limiters.items():
+            rejected = dict(limiter.rejected)
+            rejected["owner_limit"] = self.owner_rejected[route_class]
+            for reason, count in rejected.items():
+                lines.append(
+                    f'admission_rejected_total{{class="{route_class}",'
+                    f'reason="{reason}"}} {count}'
+                )
+
+        lines.append(
+            "# HELP admission_owners_in_flight Owners with requests in flight."
+        )
+        lines.append("# TYPE admission_owners_in_flight gauge")
+        lines.append(f"admission_owners_in_flight {len(self.owners)}")
+        return "\n".join(lines) + "\n"
+
+
+controller = AdmissionController(
+    {
+        READ: settings.admission_read_limit,
+        WRITE: settings.admission_write_limit,
+        REPORT: settings.admission_report_limit,
+        AUTH: settings.admission_auth_limit,
+    },
+    queue_size=settings.admission_queue_size,
+    queue_timeout=settings.admission_queue_timeout_seconds,
+    owner_limit=settings.admission_owner_limit,
+)
+
+
+def _rejection(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"message": message},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+class AdmissionMiddleware:
+
+    def __init__(self, app, controller: AdmissionController = controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        limiter = controller.limiters[name]
+
+        # Requests without a valid token are left to fail authentication
+        owner_id = bearer_owner_id(scope["headers"])
+        if owner_id is not None:
+            in_flight = controller.owners.get(owner_id, 0)
+            if in_flight >= controller.owner_limit:
+                controller.owner_rejected[name] += 1
+                response = _rejection(
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    "Too many concurrent requests for this account",
+                )
+                await response(scope, receive, send)
+                return
+            # Counted while waiting too, one owner can not fill the queue
+            controller.owners[owner_id] = in_flight + 1
+
+        try:
+            if not await limiter.acquire(controller.queue_timeout):
+                response = _rejection(
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "Server busy, try again later",
+                )
+                await response(scope, receive, send)
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                limiter.release()
+        finally:
+            if owner_id is not None:
+                remaining = controller.owners[owner_id] - 1
+                if remaining:
+                    controller.owners[owner_id] = remaining
+                else:
+                    del controller.owners[owner_id]
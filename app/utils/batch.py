@@ -0,0 +1,39 @@
+from typing import Iterable, Optional
+from fastapi import HTTPException, Query, status
+
+BATCH_LIMIT = 100
+
+
+def id_list(
+    ids: Optional[str] = Query(
+        None, description=f"Comma separated ids, at most {BATCH_LIMIT}"
+    ),
+) -> Optional[list[int]]:
+    """Dependency parsing ?ids=1,2,3, None when the parameter is absent."""
+    if ids is None:
+        return None
+    try:
+        # Duplicates are dropped, the first occurrence keeps its place
+        parsed = list(
+            dict.fromkeys(int(value) for value in ids.split(",") if value.strip())
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be comma separated integers",
+        )
+    if not parsed or len(parsed) > BATCH_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {BATCH_LIMIT} ids per request",
+        )
+    return parsed
+
+
+def check_found(ids: Iterable[int], found: Iterable[int], name: str) -> None:
+    missing = set(ids) - set(found)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{name} not found: {sorted(missing)}",
+        )
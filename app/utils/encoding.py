@@ -0,0 +1,254 @@
+import time
+import zlib
+from contextvars import ContextVar
+from typing import Optional
+
+from app.utils.metrics import TimedJSONResponse, record_serialization
+
+# Both are optional, a missing one is just never negotiated
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_TYPE, "application/x-msgpack")
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Already compressed formats are sent as they are
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/msgpack",
+    "application/xml",
+    "text/",
+)
+
+current_media_type: ContextVar[str] = ContextVar(
+    "current_media_type", default=JSON_TYPE
+)
+
+
+def _preferences(header: str) -> dict[str, float]:
+    # "gzip, zstd;q=0.8" -> {"gzip": 1.0, "zstd": 0.8}
+    preferences = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            preferences[name.strip().lower()] = quality
+    return preferences
+
+
+def negotiate_media_type(accept: str) -> str:
+    if msgpack is None or not accept:
+        return JSON_TYPE
+    preferences = _preferences(accept)
+    msgpack_quality = max(preferences.get(name, 0.0) for name in MSGPACK_TYPES)
+    json_quality = max(
+        preferences.get(JSON_TYPE, 0.0),
+        preferences.get("application/*", 0.0),
+        preferences.get("*/*", 0.0),
+    )
+    if msgpack_quality > 0 and msgpack_quality >= json_quality:
+        return MSGPACK_TYPE
+    return JSON_TYPE
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    preferences = _preferences(accept_encoding)
+    # zstd compresses as well as gzip at a fraction of the CPU
+    if zstandard is not None and preferences.get("zstd", 0.0) > 0:
+        return "zstd"
+    if preferences.get("gzip", 0.0) > 0:
+        return "gzip"
+    return None
+
+
+class NegotiatedResponse(TimedJSONResponse):
+    """JSON, or MessagePack when the request's Accept header prefers it."""
+
+    # Same signature as JSONResponse, OpenAPI reads the default status code
+    def __init__(
+        self,
+        content=None,
+        status_code: int = 200,
+        headers=None,
+        media_type: Optional[str] = None,
+        background=None,
+    ):
+        if media_type is None and current_media_type.get() == MSGPACK_TYPE:
+            media_type = MSGPACK_TYPE
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content) -> bytes:
+        if self.media_type != MSGPACK_TYPE:
+            return super().render(content)
+        started = time.perf_counter()
+        body = msgpack.packb(content)
+        record_serialization(started)
+        return body
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return zlib.compress(body, GZIP_LEVEL, wbits=31)
+
+
+class StreamCompressor:
+    """Compresses a body chunk by chunk, every chunk is flushed as it comes."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self.sync_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.sync_flush = zlib.Z_SYNC_FLUSH
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flushed so a stream of events is not held back in the compressor
+        return self.compressor.compress(data) + self.compressor.flush(self.sync_flush)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _with_vary(headers: list, values: list[bytes]) -> list:
+    existing = _header(headers, b"vary")
+    headers = [(key, value) for key, value in headers if key.lower() != b"vary"]
+    names = [value.strip() for value in existing.split(b",")] if existing else []
+    for value in values:
+        if value.lower() not in (name.lower() for name in names):
+            names.append(value)
+    headers.append((b"vary", b", ".join(names)))
+    return headers
+
+
+class EncodingMiddleware:
+    """Negotiates the response format and compresses large responses.
+
+    Accept picks JSON or MessagePack for the routes' NegotiatedResponse
+    bodies. Accept-Encoding picks zstd or gzip for compressible responses of
+    at least COMPRESSION_MINIMUM_SIZE bytes. Streaming responses are
+    compressed as they go.
+    """
+
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope["headers"]
+        media_type = negotiate_media_type(
+            (_header(headers, b"accept") or b"").decode("latin-1")
+        )
+        encoding = negotiate_encoding(
+            (_header(headers, b"accept-encoding") or b"").decode("latin-1")
+        )
+
+        token = current_media_type.set(media_type)
+        try:
+            await self.app(
+                scope, receive, _Responder(send, encoding, self.minimum_size).send
+            )
+        finally:
+            current_media_type.reset(token)
+
+
+class _Responder:
+
+    def __init__(self, send, encoding: Optional[str], minimum_size: int):
+        self.downstream = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.stream: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+        if self.stream is not None:
+            await self._send_chunk(message)
+            return
+
+        headers = list(self.start_message.get("headers", []))
+        content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+        vary = []
+        if content_type.startswith((JSON_TYPE, MSGPACK_TYPE)):
+            vary.append(b"Accept")
+        compressible = content_type.startswith(COMPRESSIBLE_TYPES) and not _header(
+            headers, b"content-encoding"
+        )
+        if compressible:
+            vary.append(b"Accept-Encoding")
+        if vary:
+            headers = _with_vary(headers, vary)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if (
+            self.encoding is None
+            or not compressible
+            or (not more_body and len(body) < self.minimum_size)
+        ):
+            self.passthrough = True
+            await self.downstream(dict(self.start_message, headers=headers))
+            await self.downstream(message)
+            return
+
+        headers = [
+            (key, value) for key, value in headers if key.lower() != b"content-length"
+        ]
+        headers.append((b"content-encoding", self.encoding.encode()))
+
+        if not more_body:
+            body = compress(body, self.encoding)
+            headers.append((b"content-length", str(len(body)).encode()))
+            await self.downstream(dict(self.start_message, headers=headers))
+            await self.downstream({"type": "http.response.body", "body": body})
+            return
+
+        self.stream = StreamCompressor(self.encoding)
+        await self.downstream(dict(self.start_message, headers=headers))
+        await self._send_chunk(message)
+
+    async def _send_chunk(self, message):
+        more_body = message.get("more_body", False)
+        data = self.stream.chunk(message.get("body", b""))
+        if not more_body:
+            data += self.stream.finish()
+        await self.downstream(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
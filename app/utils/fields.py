@@ -0,0 +1,63 @@
+from functools import lru_cache
+from typing import Optional
+from fastapi import HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ConfigDict, create_model
+
+from app.utils.encoding import NegotiatedResponse
+
+
+def _names(value: str) -> set[str]:
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class FieldSelection:
+    """Dependency for ?fields=a,b&include=relation on a response model.
+
+    Resolves to None when neither is given, for the full representation.
+    Otherwise it is the set of fields to return: the listed ones (all when
+    only include is given), the included relations, and id. Relations are
+    left out unless included.
+    """
+
+    def __init__(self, model: type[BaseModel], relations: tuple[str, ...] = ()):
+        self.relations = frozenset(relations)
+        self.columns = frozenset(model.model_fields) - self.relations
+
+    def __call__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma separated fields"),
+        include: Optional[str] = Query(None, description="Related data to embed"),
+    ) -> Optional[frozenset]:
+        if fields is None and include is None:
+            return None
+
+        selected = self.columns if fields is None else _names(fields)
+        included = _names(include) if include else set()
+        unknown = (selected - self.columns) | (included - self.relations)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {sorted(unknown)}",
+            )
+        return frozenset(selected | included | {"id"})
+
+
+@lru_cache(maxsize=256)
+def sparse_model(model: type[BaseModel], fields: frozenset) -> type[BaseModel]:
+    # The same field definitions, so values validate and serialize the same
+    return create_model(
+        f"Sparse{model.__name__}",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (info.annotation, info)
+            for name, info in model.model_fields.items()
+            if name in fields
+        },
+    )
+
+
+def sparse_response(content) -> NegotiatedResponse:
+    # Sparse objects do not satisfy the route's response_model, they are sent
+    # as they are
+    return NegotiatedResponse(jsonable_encoder(content))
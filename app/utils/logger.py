@@ -1,7 +1,37 @@
-import logging as logger
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
 
+from app.config import settings
 
-class CustomFormatter(logger.Formatter):
+# Attributes every LogRecord has, anything else was passed through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class CustomFormatter(logging.Formatter):
 
     white = "\x1b[97;20m"
     grey = "\x1b[38;20m"
@@ -12,23 +42,105 @@ class CustomFormatter(logger.Formatter):
     bold_red = "\x1b[31;1m"
     reset = "\x1b[0m"
 
-    fmt = "%(asctime)s - {}%(levelname)-8s{} - %(name)s.%(funcName)s - %(message)s"
+    fmt = "%(asctime)s - %(levelname)-8s - %(name)s.%(funcName)s - %(message)s"
 
     FORMATS = {
-        logger.DEBUG: white + fmt + reset,
-        logger.INFO: cyan + fmt + reset,
-        logger.WARNING: yellow + fmt + reset,
-        logger.ERROR: red + fmt + reset,
-        logger.CRITICAL: bold_red + fmt + reset,
+        logging.DEBUG: white + fmt + reset,
+        logging.INFO: cyan + fmt + reset,
+        logging.WARNING: yellow + fmt + reset,
+        logging.ERROR: red + fmt + reset,
+        logging.CRITICAL: bold_red + fmt + reset,
     }
 
+    def __init__(self):
+        super().__init__()
+        # Built once instead of on every record
+        self.formatters = {
+            level: logging.Formatter(log_fmt, datefmt="%H:%M:%S")
+            for level, log_fmt in self.FORMATS.items()
+        }
+
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logger.Formatter(log_fmt, datefmt="%H:%M:%S")
+        formatter = self.formatters.get(record.levelno, self.formatters[logging.INFO])
         return formatter.format(record)
 
 
-handler = logger.StreamHandler()
-handler.setFormatter(CustomFormatter())
+class SamplingFilter(logging.Filter):
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        # Warnings and errors are always kept
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        # Records stay in this process, so only the message is resolved here
+        # and formatting happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener = None
+
+
+def configure_logging(stream=None) -> QueueListener:
+    global _listener
+
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if settings.log_format == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(CustomFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = NonBlockingQueueHandler(log_queue)
+    if settings.log_sample_rates:
+        handler.addFilter(SamplingFilter(settings.log_sample_rates))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.log_level)
+
+    # SQL is only logged through the slow query log
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+    return _listener
+
+
+def _restart_listener():
+    global _listener
+
+    # The listener thread does not survive a fork
+    _listener = None
+    configure_logging()
+
+
+def shutdown_logging():
+    global _listener
+
+    # Flushes the queued records
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+configure_logging()
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_listener)
 
-logger.basicConfig(level=logger.DEBUG, handlers=[handler])
+logger = logging.getLogger("app")
+sql_logger = logging.getLogger("app.sql")
@@ -0,0 +1,247 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.routing import Route
+
+from app.utils.profiling import profiled
+from app.utils.request_stats import RequestStats, current_request_stats
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        # The last slot holds observations above the largest bucket
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ("method", "path", "status_counts", "duration", "db", "serialization")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        # Indexed by status class, 1xx..5xx
+        self.status_counts = [0] * 6
+        self.duration = Histogram()
+        self.db = Histogram()
+        self.serialization = Histogram()
+
+    def observe(self, status_code: int, elapsed: float, stats: RequestStats) -> None:
+        self.status_counts[min(status_code // 100, 5)] += 1
+        self.duration.observe(elapsed)
+        self.db.observe(stats.db_time)
+        self.serialization.observe(stats.serialization_time)
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.routes: dict = {}
+        self.unmatched: dict = {}
+        # Plain starlette routes (/openapi.json, /docs) put only their
+        # endpoint in the scope, APIRoute also puts itself
+        self.endpoints: dict = {}
+
+    def prepare(self, routes) -> None:
+        # Allocate the metrics of every known route up front
+        for route in routes:
+            if isinstance(route, Route):
+                self.endpoints[route.endpoint] = route
+            methods = getattr(route, "methods", None) or ("GET",)
+            for method in methods:
+                self.routes[(route.path, method)] = RouteMetrics(method, route.path)
+
+    def route_for(self, scope):
+        route = scope.get("route")
+        if route is None and "endpoint" in scope:
+            route = self.endpoints.get(scope["endpoint"])
+        return route
+
+    def get(self, route, method: str) -> RouteMetrics:
+        if route is None:
+            metrics = self.unmatched.get(method)
+            if metrics is None:
+                metrics = self.unmatched[method] = RouteMetrics(method, "unmatched")
+            return metrics
+
+        key = (route.path, method)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteMetrics(method, route.path)
+        return metrics
+
+    def render(self) -> str:
+        all_metrics = list(self.routes.values()) + list(self.unmatched.values())
+        lines = [
+            "# HELP http_requests_total Requests by route and status class.",
+            "# TYPE http_requests_total counter",
+        ]
+        for metrics in all_metrics:
+            labels = _labels(metrics)
+            for status_class, count in enumerate(metrics.status_counts):
+                if count:
+                    lines.append(
+                        f'http_requests_total{{{labels},code="{status_class}xx"}} {count}'
+                    )
+
+        for name, attribute, description in (
+            ("http_request_duration_seconds", "duration", "Total request time."),
+            ("http_request_db_seconds", "db", "Time spent executing SQL."),
+            (
+                "http_request_serialization_seconds",
+                "serialization",
+                "Time from the endpoint's return to the rendered body.",
+            ),
+        ):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for metrics in all_metrics:
+                histogram = getattr(metrics, attribute)
+                if not histogram.count:
+                    continue
+                labels = _labels(metrics)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(metrics: RouteMetrics) -> str:
+    return f'method="{metrics.method}",route="{metrics.path}"'
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Reuse the stats of RequestStatsMiddleware when it is installed
+        stats = current_request_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestStats(scope["path"])
+            token = current_request_stats.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            if token is not None:
+                current_request_stats.reset(token)
+            route = self.registry.route_for(scope)
+            self.registry.get(route, scope["method"]).observe(
+                status_code, elapsed, stats
+            )
+
+
+def _start_serialization() -> None:
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.serialization_started = time.perf_counter()
+
+
+def _timed_endpoint(call):
+    if asyncio.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            result = await call(*args, **kwargs)
+            _start_serialization()
+            return result
+
+    else:
+
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            result = call(*args, **kwargs)
+            _start_serialization()
+            return result
+
+    return endpoint
+
+
+class TimedRoute(APIRoute):
+    """Starts the serialization clock when the endpoint returns.
+
+    FastAPI then validates the result against the response_model and runs
+    jsonable_encoder before the response class renders it, usually the
+    larger part of the cost.
+    """
+
+    def get_route_handler(self):
+        # Wrapped once per route, the request handler calls dependant.call
+        call = self.dependant.call
+        if not asyncio.iscoroutinefunction(call):
+            # Runs on the threadpool, where the profiler has to be told
+            call = profiled(call)
+        self.dependant.call = _timed_endpoint(call)
+        return super().get_route_handler()
+
+
+def record_serialization(started: float) -> None:
+    """Adds the time since the endpoint returned, or since `started`."""
+    stats = current_request_stats.get()
+    if stats is None:
+        return
+    if stats.serialization_started is not None:
+        started = stats.serialization_started
+        stats.serialization_started = None
+    stats.serialization_time += time.perf_counter() - started
+
+
+class TimedJSONResponse(JSONResponse):
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = super().render(content)
+        record_serialization(started)
+        return body
@@ -0,0 +1,162 @@
+import re
+from datetime import date
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.utils.logger import logger
+
+# Partitioned table -> partition key. Partitions hold one calendar month each
+# and are named <table>_y<year>m<month>, rows outside them land in
+# <table>_default.
+PARTITIONED_TABLES = {
+    "invoices": "issuing_date",
+    "payments": "payment_date",
+}
+
+PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+PARTITION_LOCK_KEY = 7_031_001
+
+
+def _lock(conn: Connection) -> None:
+    # Serializes partition maintenance between workers starting at once
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def list_partitions(conn: Connection, parent: str) -> dict[str, date]:
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:parent)"
+        ),
+        {"parent": parent},
+    ).scalars()
+
+    partitions = {}
+    for name in rows:
+        match = PARTITION_NAME.search(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def create_default_partition(conn: Connection, table: str) -> None:
+    conn.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    )
+
+
+def create_month_partition(conn: Connection, table: str, month: date) -> bool:
+    name = partition_name(table, month)
+    if name in list_partitions(conn, table):
+        return False
+
+    key = PARTITIONED_TABLES[table]
+    bounds = {"lower": month, "upper": add_months(month, 1)}
+
+    # Rows of this month may already sit in the default partition, move them
+    # before attaching or the attach fails its constraint check
+    conn.execute(
+        text(
+            f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {table}_default "
+            f"WHERE {key} >= :lower AND {key} < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        bounds,
+    )
+    conn.execute(
+        text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+        )
+    )
+    return True
+
+
+def ensure_partitions(
+    conn: Connection,
+    months_ahead: int = 3,
+    since: Optional[date] = None,
+) -> list[str]:
+    _lock(conn)
+    created = []
+    first = month_start(since or date.today())
+    last = add_months(month_start(date.today()), months_ahead)
+
+    for table in PARTITIONED_TABLES:
+        create_default_partition(conn, table)
+        month = first
+        while month <= last:
+            if create_month_partition(conn, table, month):
+                created.append(partition_name(table, month))
+            month = add_months(month, 1)
+
+    return created
+
+
+def _ensure_archive_parent(conn: Connection, table: str) -> None:
+    key = PARTITIONED_TABLES[table]
+    conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {table}_archive "
+            f"(LIKE {table} INCLUDING DEFAULTS) PARTITION BY RANGE ({key})"
+        )
+    )
+
+
+def _archivable(conn: Connection, table: str, partition: str) -> bool:
+    # Only partitions without anything left to collect leave the hot table
+    if table == "invoices":
+        stmt = f"SELECT EXISTS (SELECT 1 FROM {partition} WHERE status <> 'PAID')"
+    else:
+        stmt = (
+            f"SELECT EXISTS (SELECT 1 FROM {partition} p "
+            f"JOIN invoices i ON i.id = p.invoice_id WHERE i.status <> 'PAID')"
+        )
+    return not conn.execute(text(stmt)).scalar()
+
+
+def archive_partitions(conn: Connection, before: date) -> list[str]:
+    _lock(conn)
+    archived = []
+
+    for table in PARTITIONED_TABLES:
+        _ensure_archive_parent(conn, table)
+
+        for partition, month in sorted(list_partitions(conn, table).items()):
+            upper = add_months(month, 1)
+            if upper > before or not _archivable(conn, table, partition):
+                continue
+
+            # The detached partition stays queryable through <table>_archive
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+            conn.execute(
+                text(
+                    f"ALTER TABLE {table}_archive ATTACH PARTITION {partition} "
+                    f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+                )
+            )
+            archived.append(partition)
+            logger.info(f"Archived partition {partition}")
+
+    return archived
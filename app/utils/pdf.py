@@ -0,0 +1,102 @@
+import zlib
+
+# A4 in points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+FONTS = {"regular": "Helvetica", "bold": "Helvetica-Bold"}
+
+
+def _escape(value: str) -> bytes:
+    encoded = value.encode("cp1252", errors="replace")
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class PDFDocument:
+    """A minimal PDF writer for text and rules in the standard fonts.
+
+    Coordinates are in points from the bottom left corner of the page.
+    """
+
+    def __init__(self):
+        self.pages: list[list[bytes]] = []
+        self.new_page()
+
+    def new_page(self) -> None:
+        self.pages.append([])
+
+    def text(self, x: float, y: float, value: str, size: float = 10, bold=False):
+        font = b"F2" if bold else b"F1"
+        self.pages[-1].append(
+            b"BT /%s %.1f Tf %.2f %.2f Td (%s) Tj ET"
+            % (font, size, x, y, _escape(value))
+        )
+
+    def text_right(self, x: float, y: float, value: str, size: float = 10, bold=False):
+        # Helvetica digits are 0.556 em wide, close enough for right aligned
+        # amounts
+        self.text(x - len(value) * size * 0.556, y, value, size, bold)
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.5):
+        self.pages[-1].append(
+            b"%.2f w %.2f %.2f m %.2f %.2f l S" % (width, x1, y1, x2, y2)
+        )
+
+    def render(self) -> bytes:
+        objects: list[bytes] = []
+
+        def add(body: bytes) -> int:
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(b"")
+        pages = add(b"")
+        fonts = {
+            name: add(
+                b"<< /Type /Font /Subtype /Type1 /BaseFont /%s "
+                b"/Encoding /WinAnsiEncoding >>" % base.encode()
+            )
+            for name, base in (("F1", FONTS["regular"]), ("F2", FONTS["bold"]))
+        }
+        resources = b"<< /Font << /F1 %d 0 R /F2 %d 0 R >> >>" % (
+            fonts["F1"],
+            fonts["F2"],
+        )
+
+        page_ids = []
+        for operations in self.pages:
+            content = zlib.compress(b"\n".join(operations))
+            stream = add(
+                b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+                % (len(content), content)
+            )
+            page_ids.append(
+                add(
+                    b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+                    b"/Resources %s /Contents %d 0 R >>"
+                    % (pages, PAGE_WIDTH, PAGE_HEIGHT, resources, stream)
+                )
+            )
+
+        objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages
+        objects[pages - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % page for page in page_ids),
+            len(page_ids),
+        )
+
+        output = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+        xref = len(output)
+        output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        for offset in offsets:
+            output += b"%010d 00000 n \n" % offset
+        output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1,
+            catalog,
+            xref,
+        )
+        return bytes(output)
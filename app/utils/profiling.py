@@ -0,0 +1,291 @@
+import asyncio
+import functools
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.request_stats import RequestStats, current_request_stats
+from app.utils.security import bearer_owner_id
+
+PROFILE_HEADER = b"x-profile-token"
+
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "current_profile", default=None
+)
+
+# Thread id -> profile of the request the thread is running a call for
+_threads: dict[int, "RequestProfile"] = {}
+
+
+def _run_profiled(profile: "RequestProfile", call, args, kwargs):
+    thread_id = threading.get_ident()
+    previous = _threads.get(thread_id)
+    _threads[thread_id] = profile
+    try:
+        return call(*args, **kwargs)
+    finally:
+        if previous is None:
+            del _threads[thread_id]
+        else:
+            _threads[thread_id] = previous
+
+
+def profiled(call):
+    """Attributes the thread running `call` to the request being profiled.
+
+    For functions run on the threadpool. The context variable is copied into
+    the thread, the sampler, which can not read it, looks the thread up here.
+    """
+
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return call(*args, **kwargs)
+        return _run_profiled(profile, call, args, kwargs)
+
+    return wrapper
+
+
+def _short_path(filename: str) -> str:
+    _, marker, tail = filename.rpartition("site-packages" + os.sep)
+    if marker:
+        return tail
+    return os.path.relpath(filename) if filename.startswith(os.getcwd()) else filename
+
+
+def _label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    """Stack samples of every thread working on one request."""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        # Created on the event loop, by the request's task
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.task = asyncio.current_task()
+
+    def sample(self) -> None:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == self.loop_thread:
+                # Only while the loop runs this request's task
+                if asyncio.current_task(self.loop) is not self.task:
+                    continue
+                base = _MIDDLEWARE_CODE
+            elif _threads.get(thread_id) is self:
+                base = _run_profiled.__code__
+            else:
+                continue
+            stack = self._request_stack(frame, base)
+            if stack:
+                self.samples[stack] += 1
+        self.sample_count += 1
+
+    def _request_stack(self, frame, base) -> Optional[tuple]:
+        # The frames above the one that started the request's work. A thread
+        # that moved on between the checks above and here has no such frame.
+        stack = []
+        while frame is not None:
+            if frame.f_code is base:
+                return tuple(reversed(stack))
+            stack.append(_label(frame.f_code))
+            frame = frame.f_back
+        return None
+
+    def report(self, status_code: int, elapsed: float, stats: RequestStats) -> dict:
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        for stack, count in self.samples.items():
+            self_samples[stack[-1]] += count
+            for label in set(stack):
+                total_samples[label] += count
+
+        # The sampler only runs when it gets the GIL, so its real interval can
+        # be longer than configured. Time is estimated from each sample share.
+        sample_ms = elapsed * 1000 / max(self.sample_count, 1)
+        queries = stats.queries or []
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status_code": status_code,
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "db_ms": round(stats.db_time * 1000, 3),
+            "serialization_ms": round(stats.serialization_time * 1000, 3),
+            "statement_count": stats.statement_count,
+            "interval_ms": settings.profiling_interval_ms,
+            "samples": self.sample_count,
+            "queries": [
+                {
+                    "statement": " ".join(statement.split()),
+                    "ms": round(seconds * 1000, 3),
+                }
+                for statement, seconds in queries
+            ],
+            "top_self": [
+                {"function": label, "samples": count, "ms": round(count * sample_ms, 3)}
+                for label, count in self_samples.most_common(30)
+            ],
+            "top_total": [
+                {"function": label, "samples": count, "ms": round(count * sample_ms, 3)}
+                for label, count in total_samples.most_common(30)
+            ],
+            # Collapsed stacks, the input format of flamegraph.pl and speedscope
+            "stacks": [
+                f"{';'.join(stack)} {count}" for stack, count in self.samples.items()
+            ],
+        }
+
+
+class Sampler(threading.Thread):
+
+    def __init__(self, profile: RequestProfile, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.profile.sample()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+
+def _authorized(scope) -> bool:
+    # The shared token and a bearer token of one of the admin users
+    if not settings.profiling_token:
+        return False
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            if not hmac.compare_digest(
+                value, settings.profiling_token.encode("latin-1")
+            ):
+                return False
+            return bearer_owner_id(scope["headers"]) in settings.profiling_admin_ids
+    return False
+
+
+def _store(profile: dict) -> str:
+    os.makedirs(settings.profiling_dir, exist_ok=True)
+    name = "{}-{}{}.json".format(
+        datetime.now().strftime("%Y%m%dT%H%M%S%f"),
+        profile["method"],
+        profile["path"].replace("/", "_"),
+    )
+    filename = os.path.join(settings.profiling_dir, name)
+    with open(filename, "w") as output:
+        json.dump(profile, output)
+    return filename
+
+
+class ProfilingMiddleware:
+    """Profiles requests of admins carrying the X-Profile-Token header.
+
+    The profile replaces the response body, or is written to PROFILING_DIR
+    when it is set and the response goes out unchanged with an X-Profile-File
+    header. Streamed responses (SSE, zips) are passed through as they come,
+    their profile is only written to PROFILING_DIR.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _authorized(scope):
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_request_stats.get()
+        stats_token = None
+        if stats is None:
+            stats = RequestStats(scope["path"])
+            stats_token = current_request_stats.set(stats)
+        stats.queries = []
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        profile_token = current_profile.set(profile)
+        sampler = Sampler(profile, settings.profiling_interval_ms / 1000)
+        start_message = None
+        body_parts = []
+        streaming = False
+
+        async def capture(message):
+            nonlocal start_message, streaming
+            if streaming:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start_message = message
+            elif message["type"] == "http.response.body":
+                if message.get("more_body", False):
+                    # Buffering a stream would hold it until it ends, which
+                    # for an event stream is never
+                    streaming = True
+                    await send(start_message)
+                    await send(message)
+                else:
+                    body_parts.append(message.get("body", b""))
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            current_profile.reset(profile_token)
+            if stats_token is not None:
+                current_request_stats.reset(stats_token)
+
+        if start_message is None:
+            return
+
+        report = profile.report(start_message["status"], elapsed, stats)
+        stats.queries = None
+
+        filename = None
+        if settings.profiling_dir:
+            filename = _store(report)
+            logger.info(f"Stored profile of {scope['path']} in {filename}")
+        if streaming:
+            # Already sent
+            return
+
+        if filename is not None:
+            headers = list(start_message.get("headers", []))
+            headers.append((b"x-profile-file", filename.encode()))
+            await send(dict(start_message, headers=headers))
+            await send({"type": "http.response.body", "body": b"".join(body_parts)})
+            return
+
+        body = json.dumps(report).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+_MIDDLEWARE_CODE = ProfilingMiddleware.__call__.__code__
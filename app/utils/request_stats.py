@@ -0,0 +1,115 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.slow_queries import recorder
+
+
+class RequestStats:
+    __slots__ = (
+        "db_time",
+        "statement_count",
+        "serialization_time",
+        "serialization_started",
+        "statements",
+        "path",
+        "queries",
+    )
+
+    def __init__(self, path: str = ""):
+        self.db_time = 0.0
+        self.statement_count = 0
+        self.serialization_time = 0.0
+        # Set by TimedRoute when the endpoint returns
+        self.serialization_started: Optional[float] = None
+        # Statement text (the bound parameters are not part of it) -> count
+        self.statements: dict[str, int] = {}
+        self.path = path
+        # (statement, seconds) of every statement, only kept when profiling
+        self.queries: Optional[list] = None
+
+    def server_timing(self, elapsed: float) -> str:
+        return (
+            f"db;dur={self.db_time * 1000:.3f};"
+            f'desc="{self.statement_count} statements", '
+            f"total;dur={elapsed * 1000:.3f}"
+        )
+
+
+# Set by RequestStatsMiddleware. The object is mutated in place, so the
+# threadpool running sync endpoints sees the same instance.
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("query_started")
+
+    if elapsed * 1000 >= settings.slow_query_log_ms:
+        recorder.record(conn, statement, parameters, elapsed, executemany)
+
+    stats = current_request_stats.get()
+    if stats is None:
+        return
+
+    stats.db_time += elapsed
+    stats.statement_count += 1
+
+    if stats.queries is not None:
+        stats.queries.append((statement, elapsed))
+
+    count = stats.statements.get(statement, 0) + 1
+    stats.statements[statement] = count
+
+    # Warn once per statement shape, when it crosses the threshold
+    if count == settings.repeated_statement_threshold + 1:
+        logger.warning(
+            f"Possible N+1 in {stats.path or 'request'}: statement executed "
+            f"{count} times: {' '.join(statement.split())[:300]}"
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RequestStatsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["path"])
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (
+                        b"server-timing",
+                        stats.server_timing(time.perf_counter() - started).encode(),
+                    )
+                )
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request_stats.reset(token)
@@ -0,0 +1,45 @@
+from sqlalchemy import Index, func, literal, or_, select
+
+SEARCH_LIMIT = 10
+
+
+def search_text(*columns):
+    # Built with coalesce and || rather than concat_ws, which is not IMMUTABLE
+    # and can't be indexed. Queries must use the same expression as the index.
+    expression = func.coalesce(columns[0], "")
+    for column in columns[1:]:
+        expression = expression + " " + func.coalesce(column, "")
+    return expression
+
+
+def trigram_index(name: str, owner_id, text) -> Index:
+    # owner_id leads (through btree_gin) so a tenant's search never visits
+    # other tenants' rows
+    return Index(
+        name,
+        owner_id,
+        text.label("search_text"),
+        postgresql_using="gin",
+        postgresql_ops={"search_text": "gin_trgm_ops"},
+    )
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_query(model, text, q: str, limit: int):
+    # Substring matches for fragments of emails and phone numbers, word
+    # similarity for typos. Both are answered by the trigram index.
+    q = q.strip()
+    return (
+        select(model)
+        .where(
+            or_(
+                text.ilike(f"%{escape_like(q)}%", escape="\\"),
+                literal(q).op("<%")(text.self_group()),
+            )
+        )
+        .order_by(func.word_similarity(q, text).desc(), model.id)
+        .limit(limit)
+    )
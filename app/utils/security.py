@@ -1,29 +1,103 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import Annotated, Optional, Tuple
 from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 import jwt
 from app.auth.models import User
 from app.auth.schemas import TokenData
+from app.config import settings
 from app.database import get_db
+from app.utils.tenancy import set_current_owner
 from app.utils.constants import ALGORITHM, JWT_SECRET_KEY, ACCESS_TOKEN_EXPIRE_MINUTES
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds
+)
+
+# Hashing runs in worker processes so a burst of logins does not hold the
+# threadpool the sync endpoints share. Requests beyond the workers plus the
+# queue depth are rejected instead of waiting.
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+_hash_slots = threading.BoundedSemaphore(
+    max(settings.password_hash_workers, 0) + settings.password_hash_queue_depth
+)
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=False, cancel_futures=True)
+            _hash_pool = None
+
+
+async def _run_hashing(fn, *args):
+    if settings.password_hash_workers <= 0:
+        return await run_in_threadpool(fn, *args)
+
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        # Awaited on the event loop, a request waiting for its hash holds no
+        # threadpool thread
+        return await asyncio.wrap_future(_get_hash_pool().submit(fn, *args))
+    finally:
+        _hash_slots.release()
 
 
-def verify_password(plain_password, hashed_password):
+def _verify(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def hash_password(password):
+def _verify_and_update(plain_password, hashed_password):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def _hash(password):
     return pwd_context.hash(password)
 
 
+async def verify_password(plain_password, hashed_password):
+    return await _run_hashing(_verify, plain_password, hashed_password)
+
+
+async def verify_and_update_password(
+    plain_password, hashed_password
+) -> Tuple[bool, Optional[str]]:
+    # The new hash is set when the stored one uses outdated settings
+    return await _run_hashing(_verify_and_update, plain_password, hashed_password)
+
+
+async def hash_password(password):
+    return await _run_hashing(_hash, password)
+
+
 def create_access_token(token_data: TokenData, expires_delta: timedelta | None = None):
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -56,13 +130,38 @@ async def get_current_user(
     payload = decoded_token.get("sub")
     token_data = TokenData(**payload)
 
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    # The first statement of the request checks out its connection, which
+    # may wait for the pool, so it stays off the event loop
+    user = await run_in_threadpool(db.get, User, token_data.user_id)
 
     if user is None:
         raise credentials_exception
 
+    # Every service query sharing this request's session is scoped to the user
+    set_current_owner(db, user.id)
+
     return user
 
 
-def authenticate(request: Request, token: str = Depends(oauth2_scheme)):
-    return get_current_user(token)
+def token_owner_id(token: str) -> Optional[int]:
+    # The user id of a valid token, without loading the user
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
+        return TokenData(**payload["sub"]).user_id
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+        return None
+
+
+def bearer_owner_id(headers) -> Optional[int]:
+    # The user id of the bearer token in raw ASGI headers
+    for key, value in headers:
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token_owner_id(token)
+    return None
+
+
+async def authenticate(current_user: Annotated[User, Depends(get_current_user)]):
+    # get_current_user is cached per request, this reuses its user and session
+    return current_user
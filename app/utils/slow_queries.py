@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.config import settings
+from app.utils.logger import sql_logger
+
+EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+# Explains waiting or running at once, more are dropped
+MAX_PENDING_EXPLAINS = 2
+
+
+def _parameter_types(parameters, executemany: bool):
+    if executemany:
+        parameters = parameters[0] if parameters else {}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+class SlowQueryRecorder:
+    """Keeps the latest slow statements with the plan PostgreSQL chose.
+
+    Only the statement shape and the types of its parameters are kept, never
+    the values. A shape is explained at most once per
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS, on a background thread with its own
+    connection.
+    """
+
+    def __init__(self, size: int, explain_interval: float):
+        self.records: deque = deque(maxlen=size)
+        self.explain_interval = explain_interval
+        self.explained_at: dict[str, float] = {}
+        self._start()
+
+    def _start(self) -> None:
+        self.lock = threading.Lock()
+        self.explain_slots = threading.BoundedSemaphore(MAX_PENDING_EXPLAINS)
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="slow-query-explain"
+        )
+
+    def record(self, conn, statement, parameters, elapsed: float, executemany: bool):
+        shape = " ".join(statement.split())
+        if shape[:7].lower() == "explain":
+            return
+
+        duration_ms = round(elapsed * 1000, 3)
+        sql_logger.warning(
+            "Slow query", extra={"duration_ms": duration_ms, "statement": statement}
+        )
+
+        record = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms": duration_ms,
+            "statement": shape,
+            "parameter_types": _parameter_types(parameters, executemany),
+            "executemany": executemany,
+            "plan": None,
+        }
+
+        now = time.monotonic()
+        with self.lock:
+            self.records.append(record)
+            due = now - self.explained_at.get(shape, -self.explain_interval) >= (
+                self.explain_interval
+            )
+            if due:
+                if len(self.explained_at) >= 10_000:
+                    self.explained_at.clear()
+                self.explained_at[shape] = now
+
+        if (
+            due
+            and not executemany
+            and shape.split(" ", 1)[0].lower() in EXPLAINABLE
+            and self.explain_slots.acquire(blocking=False)
+        ):
+            self.executor.submit(
+                self._explain, conn.engine, statement, parameters, record
+            )
+
+    def _explain(self, engine, statement, parameters, record: dict) -> None:
+        # Without ANALYZE the statement is planned but not run, so explaining
+        # writes is safe
+        try:
+            with engine.connect() as conn:
+                record["plan"] = conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE OFF, FORMAT JSON) {statement}", parameters
+                ).scalar()
+        except Exception as exc:
+            record["explain_error"] = str(exc).splitlines()[0]
+        finally:
+            self.explain_slots.release()
+
+    def snapshot(self) -> list[dict]:
+        with self.lock:
+            return list(reversed(self.records))
+
+
+recorder = SlowQueryRecorder(
+    settings.slow_query_buffer_size, settings.slow_query_explain_interval_seconds
+)
+# The explain thread, and any lock it held, do not survive a fork
+os.register_at_fork(after_in_child=recorder._start)
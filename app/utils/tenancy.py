@@ -0,0 +1,56 @@
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, ORMExecuteState, with_loader_criteria
+
+from app.database import Base
+
+OWNER_KEY = "owner_id"
+
+
+def set_current_owner(db: Session, owner_id: int) -> None:
+    db.info[OWNER_KEY] = owner_id
+
+
+def get_current_owner(db: Session) -> Optional[int]:
+    return db.info.get(OWNER_KEY)
+
+
+def require_current_owner(db: Session) -> int:
+    # New rows always belong to the authenticated user, never to an owner_id
+    # sent by the client
+    owner_id = db.info.get(OWNER_KEY)
+    if owner_id is None:
+        raise RuntimeError("No owner is set on the session")
+    return owner_id
+
+
+def _owned_classes():
+    return [
+        mapper.class_
+        for mapper in Base.registry.mappers
+        if OWNER_KEY in mapper.columns
+    ]
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_owner(execute_state: ORMExecuteState):
+    owner_id = execute_state.session.info.get(OWNER_KEY)
+
+    if owner_id is None or execute_state.execution_options.get("skip_owner_scope"):
+        return
+
+    if not (
+        execute_state.is_select or execute_state.is_update or execute_state.is_delete
+    ):
+        return
+
+    execute_state.statement = execute_state.statement.options(
+        *(
+            with_loader_criteria(
+                cls,
+                lambda cls: cls.owner_id == owner_id,
+                include_aliases=True,
+            )
+            for cls in _owned_classes()
+        )
+    )
@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.utils.request_stats import RequestStats, current_request_stats
+
+
+@contextmanager
+def count_statements() -> Iterator[RequestStats]:
+    stats = RequestStats("test")
+    token = current_request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_request_stats.reset(token)
+
+
+@contextmanager
+def assert_max_statements(limit: int) -> Iterator[RequestStats]:
+    with count_statements() as stats:
+        yield stats
+
+    if stats.statement_count > limit:
+        executed = "\n".join(
+            f"  {count}x {' '.join(statement.split())[:200]}"
+            for statement, count in sorted(
+                stats.statements.items(), key=lambda entry: -entry[1]
+            )
+        )
+        raise AssertionError(
+            f"Expected at most {limit} statements, {stats.statement_count} were "
+            f"executed:\n{executed}"
+        )
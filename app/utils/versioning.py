@@ -0,0 +1,50 @@
+from typing import Optional
+from fastapi import Header, HTTPException, Response, status
+from sqlalchemy.orm import Session
+
+
+def if_match(
+    if_match: Optional[str] = Header(
+        None, description="ETag of the version the update is based on"
+    ),
+) -> Optional[int]:
+    """Dependency parsing If-Match into the version the client last read.
+
+    None when the header is absent or "*", the update then applies to the
+    current version, whatever it is.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="If-Match must be the ETag of a single version",
+        )
+
+
+def set_etag(response: Response, version: int) -> None:
+    response.headers["ETag"] = f'"{version}"'
+
+
+def version_filter(column, version: Optional[int]) -> tuple:
+    # Criteria for an UPDATE, the row only matches at the expected version
+    return () if version is None else (column == version,)
+
+
+def precondition_failed(name: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=f"{name} was modified since it was read",
+    )
+
+
+def update_failed(db: Session, id_column, row_id: int, name: str) -> HTTPException:
+    # A conditional UPDATE matched nothing, either the row is gone or its
+    # version moved on
+    if db.query(id_column).filter(id_column == row_id).first() is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"{name} not found"
+        )
+    return precondition_failed(name)
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+
+import typer
+from fastapi import FastAPI
+
+from app.auth.schemas import TokenData
+from app.utils.admission import (
+    AUTH,
+    READ,
+    REPORT,
+    WRITE,
+    AdmissionController,
+    AdmissionMiddleware,
+)
+from app.utils.security import create_access_token
+from benchmarks.asgi import call
+
+cli = typer.Typer()
+
+
+def build_app(controller, report_ms: float, write_ms: float) -> FastAPI:
+    app = FastAPI()
+
+    # Sync routes, so they hold a threadpool thread like the real ones
+    @app.get("/reports/export")
+    def export():
+        time.sleep(report_ms / 1000)
+        return {"rows": 0}
+
+    @app.post("/payments")
+    def create_payment():
+        time.sleep(write_ms / 1000)
+        return {"id": 1}
+
+    if controller is not None:
+        app.add_middleware(AdmissionMiddleware, controller=controller)
+    return app
+
+
+def bearer(user_id: int) -> list:
+    token = create_access_token(TokenData(user_id=user_id))
+    return [(b"authorization", f"Bearer {token}".encode())]
+
+
+async def measure(app, noisy: int, writers: int, writes: int) -> dict:
+    # One tenant keeps `noisy` exports in flight while other tenants write
+    stop = asyncio.Event()
+    report_statuses = Counter()
+    noisy_headers = bearer(1)
+
+    async def flood():
+        while not stop.is_set():
+            status_code = await call(app, "/reports/export", "GET", noisy_headers)
+            report_statuses[status_code] += 1
+            if status_code != 200:
+                # A well behaved client backs off, shortened from Retry-After
+                await asyncio.sleep(0.05)
+
+    async def write(user_id: int, latencies: list, statuses: Counter):
+        headers = bearer(user_id)
+        for _ in range(writes):
+            started = time.perf_counter()
+            statuses[await call(app, "/payments", "POST", headers)] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    flooders = [asyncio.create_task(flood()) for _ in range(noisy)]
+    await asyncio.sleep(0.2)
+
+    latencies, write_statuses = [], Counter()
+    await asyncio.gather(
+        *(
+            write(user_id, latencies, write_statuses)
+            for user_id in range(2, writers + 2)
+        )
+    )
+    stop.set()
+    await asyncio.gather(*flooders)
+
+    latencies.sort()
+    return {
+        "write_p50_ms": round(statistics.median(latencies), 2),
+        "write_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+        "write_statuses": dict(write_statuses),
+        "report_statuses": dict(report_statuses),
+    }
+
+
+@cli.command()
+def run(
+    noisy: int = typer.Option(100, help="Concurrent exports of the noisy tenant"),
+    writers: int = typer.Option(8, help="Other tenants creating payments"),
+    writes: int = typer.Option(50, help="Payments per writer"),
+    report_ms: float = typer.Option(200, help="Time an export holds a thread"),
+    write_ms: float = typer.Option(2, help="Time a payment holds a thread"),
+    owner_limit: int = typer.Option(8, help="ADMISSION_OWNER_LIMIT"),
+    report_limit: int = typer.Option(4, help="ADMISSION_REPORT_LIMIT"),
+):
+    results = {}
+    for name in ("off", "on"):
+        controller = None
+        if name == "on":
+            controller = AdmissionController(
+                {READ: 20, WRITE: 10, REPORT: report_limit, AUTH: 4},
+                queue_size=50,
+                queue_timeout=2,
+                owner_limit=owner_limit,
+            )
+        app = build_app(controller, report_ms, write_ms)
+        results[name] = asyncio.run(measure(app, noisy, writers, writes))
+
+    typer.echo(
+        json.dumps(
+            {
+                "noisy_exports": noisy,
+                "writers": writers,
+                "writes_per_writer": writes,
+                "admission_off": results["off"],
+                "admission_on": results["on"],
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,235 @@
+import json
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import typer
+from sqlalchemy import insert
+
+from app.database import SessionLocal, create_tables, engine
+from app.auth.models import User
+from app.client.models import Client
+from app.item.models import Item
+from app.invoice.models import Invoice, InvoiceItem
+from app.invoice.schemas import InvoiceStatus
+from app.payment.models import Payment
+from app.payment.schemas import PaymentMethod
+from app.report.service import RollupService
+from app.utils.partitions import ensure_partitions
+from app.utils.security import pwd_context
+
+cli = typer.Typer()
+
+PASSWORD = "benchmark"
+CURRENCIES = ["USD", "USD", "USD", "EUR", "GBP"]
+
+
+def pareto_count(rng: random.Random, mean: int) -> int:
+    # Most tenants are small, a few are large
+    return max(1, int(rng.paretovariate(1.5) * mean / 3))
+
+
+def insert_returning(db, model, rows: list[dict], batch_size: int = 5000) -> list:
+    ids = []
+    for start in range(0, len(rows), batch_size):
+        result = db.execute(
+            insert(model).returning(model.id), rows[start : start + batch_size]
+        )
+        ids.extend(result.scalars().all())
+    return ids
+
+
+def generate(
+    db,
+    users: int,
+    clients_per_user: int,
+    items_per_user: int,
+    invoices_per_client: int,
+    days: int,
+    seed: int,
+) -> dict:
+    rng = random.Random(seed)
+    today = datetime.now().replace(microsecond=0)
+    first_day = today - timedelta(days=days)
+    # One hash shared by every user, hashing each would dominate the run
+    password = pwd_context.hash(PASSWORD)
+    run_id = f"{seed}-{int(today.timestamp())}"
+
+    emails = [f"bench-{run_id}-{i}@example.com" for i in range(users)]
+    user_ids = insert_returning(
+        db,
+        User,
+        [
+            {
+                "first_name": f"User {i}",
+                "username": email,
+                "email": email,
+                "password": password,
+            }
+            for i, email in enumerate(emails)
+        ],
+    )
+
+    counts = {"users": len(user_ids), "clients": 0, "items": 0}
+    counts.update({"invoices": 0, "invoice_items": 0, "payments": 0})
+
+    for owner_id in user_ids:
+        client_ids = insert_returning(
+            db,
+            Client,
+            [
+                {
+                    "owner_id": owner_id,
+                    "first_name": f"Client {i}",
+                    "last_name": rng.choice(["Smith", "Jones", "Brown", "Garcia"]),
+                    "email": f"client{i}.{owner_id}@example.com",
+                    "phone": f"+1555{rng.randrange(10**7):07d}",
+                }
+                for i in range(pareto_count(rng, clients_per_user))
+            ],
+        )
+        items = [
+            {
+                "owner_id": owner_id,
+                "name": f"Item {i}",
+                "description": f"Service package {i}",
+                "price": Decimal(rng.randrange(500, 500000)) / 100,
+            }
+            for i in range(max(1, items_per_user))
+        ]
+        item_ids = insert_returning(db, Item, items)
+        prices = dict(zip(item_ids, (item["price"] for item in items)))
+
+        invoices = []
+        lines = []
+        for client_id in client_ids:
+            for _ in range(pareto_count(rng, invoices_per_client)):
+                issuing_date = first_day + timedelta(
+                    seconds=rng.randrange(days * 86400)
+                )
+                invoice_lines = []
+                picked = rng.sample(item_ids, min(len(item_ids), rng.randint(1, 5)))
+                for item_id in picked:
+                    quantity = rng.randint(1, 10)
+                    invoice_lines.append(
+                        {
+                            "item_id": item_id,
+                            "quantity": quantity,
+                            "price": prices[item_id],
+                            "item_amount": quantity * prices[item_id],
+                        }
+                    )
+                total = sum(line["item_amount"] for line in invoice_lines)
+                invoices.append(
+                    {
+                        "owner_id": owner_id,
+                        "client_id": client_id,
+                        "issuing_date": issuing_date,
+                        "due_date": issuing_date
+                        + timedelta(days=rng.choice([15, 30, 60])),
+                        "currency": rng.choice(CURRENCIES),
+                        "total_amount": total,
+                        "paid_amount": Decimal(0),
+                        "status": InvoiceStatus.UNPAID,
+                        "is_sent": rng.random() < 0.8,
+                    }
+                )
+                lines.append(invoice_lines)
+
+        payments = []
+        for invoice in invoices:
+            # 60% fully paid, 15% partially paid, the rest open
+            outcome = rng.random()
+            if outcome < 0.6:
+                amounts = [invoice["total_amount"]]
+            elif outcome < 0.75:
+                share = Decimal(rng.randint(10, 90)) / 100
+                amounts = [(invoice["total_amount"] * share).quantize(Decimal("0.01"))]
+            else:
+                amounts = []
+
+            paid_at = invoice["issuing_date"]
+            for amount in amounts:
+                paid_at = min(today, paid_at + timedelta(days=rng.randint(0, 45)))
+                payments.append(
+                    {
+                        "owner_id": owner_id,
+                        "client_id": invoice["client_id"],
+                        "amount": amount,
+                        "currency": invoice["currency"],
+                        "payment_method": rng.choice(list(PaymentMethod)),
+                        "payment_date": paid_at,
+                        "invoice": invoice,
+                    }
+                )
+                invoice["paid_amount"] += amount
+
+            if invoice["paid_amount"] >= invoice["total_amount"]:
+                invoice["status"] = InvoiceStatus.PAID
+                invoice["fully_paid_date"] = paid_at
+            elif invoice["due_date"] < today:
+                invoice["status"] = InvoiceStatus.OVERDUE
+            elif invoice["paid_amount"] > 0:
+                invoice["status"] = InvoiceStatus.PARTIALLY_PAID
+
+        invoice_ids = insert_returning(db, Invoice, invoices)
+        for invoice, invoice_id in zip(invoices, invoice_ids):
+            invoice["id"] = invoice_id
+
+        db.execute(
+            insert(InvoiceItem),
+            [
+                dict(line, invoice_id=invoice_id)
+                for invoice_id, invoice_lines in zip(invoice_ids, lines)
+                for line in invoice_lines
+            ],
+        )
+        if payments:
+            for payment in payments:
+                payment["invoice_id"] = payment.pop("invoice")["id"]
+            db.execute(insert(Payment), payments)
+        db.commit()
+
+        counts["clients"] += len(client_ids)
+        counts["items"] += len(item_ids)
+        counts["invoices"] += len(invoice_ids)
+        counts["invoice_items"] += sum(len(invoice_lines) for invoice_lines in lines)
+        counts["payments"] += len(payments)
+
+    RollupService(db).refresh(first_day.date(), date.today())
+
+    return {"emails": emails, "password": PASSWORD, "counts": counts}
+
+
+@cli.command()
+def run(
+    users: int = typer.Option(100, help="Users (tenants) to create"),
+    clients_per_user: int = typer.Option(20, help="Average clients per user"),
+    items_per_user: int = typer.Option(30, help="Items per user"),
+    invoices_per_client: int = typer.Option(10, help="Average invoices per client"),
+    days: int = typer.Option(730, help="Spread issuing dates over this many days"),
+    seed: int = typer.Option(42),
+    manifest: str = typer.Option(
+        "bench_manifest.json", help="Where to write the users for benchmarks.load"
+    ),
+):
+    create_tables()
+    with engine.begin() as conn:
+        ensure_partitions(conn, since=date.today() - timedelta(days=days))
+
+    db = SessionLocal()
+    try:
+        result = generate(
+            db, users, clients_per_user, items_per_user, invoices_per_client, days, seed
+        )
+    finally:
+        db.close()
+
+    with open(manifest, "w") as output:
+        json.dump(result, output)
+
+    typer.echo(json.dumps(result["counts"], indent=2))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,115 @@
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import typer
+from fastapi.encoders import jsonable_encoder
+
+from app.invoice.schemas import InvoiceInDB
+from app.utils import encoding
+from app.utils.encoding import MSGPACK_TYPE, NegotiatedResponse, compress
+
+cli = typer.Typer()
+
+
+def build_page(invoices: int, items: int) -> list:
+    now = datetime(2024, 1, 1)
+    page = [
+        InvoiceInDB(
+            id=invoice_id,
+            client_id=invoice_id % 20 + 1,
+            owner_id=1,
+            status="unpaid",
+            total_amount=items * 250.0,
+            paid_amount=0,
+            issuing_date=now + timedelta(days=invoice_id),
+            due_date=now + timedelta(days=invoice_id + 30),
+            created_at=now,
+            updated_at=now,
+            version=1,
+            items=[
+                {
+                    "id": invoice_id * items + n,
+                    "invoice_id": invoice_id,
+                    "item_id": n + 1,
+                    "item_name": f"Item {n + 1}",
+                    "quantity": n + 1,
+                    "price": 250.0 / (n + 1),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for n in range(items)
+            ],
+        )
+        for invoice_id in range(1, invoices + 1)
+    ]
+    # What the route hands to the response class
+    return jsonable_encoder(page)
+
+
+def render(content, media_type: str) -> bytes:
+    token = encoding.current_media_type.set(media_type)
+    try:
+        return NegotiatedResponse(content).body
+    finally:
+        encoding.current_media_type.reset(token)
+
+
+def measure(content, media_type: str, content_encoding, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        body = render(content, media_type)
+        if content_encoding is not None:
+            body = compress(body, content_encoding)
+        samples.append((time.process_time() - started) * 1000)
+    return {"bytes": len(body), "cpu_p50_ms": round(statistics.median(samples), 3)}
+
+
+@cli.command()
+def run(
+    invoices: int = typer.Option(100, help="Invoices on the page"),
+    items: int = typer.Option(3, help="Items per invoice"),
+    repeat: int = typer.Option(200, help="Encodings per configuration"),
+):
+    content = build_page(invoices, items)
+
+    media_types = {"json": "application/json"}
+    if encoding.msgpack is not None:
+        media_types["msgpack"] = MSGPACK_TYPE
+    content_encodings = {"identity": None, "gzip": "gzip"}
+    if encoding.zstandard is not None:
+        content_encodings["zstd"] = "zstd"
+
+    results = {}
+    for media_name, media_type in media_types.items():
+        for encoding_name, content_encoding in content_encodings.items():
+            results[f"{media_name}+{encoding_name}"] = measure(
+                content, media_type, content_encoding, repeat
+            )
+
+    typer.echo(
+        json.dumps(
+            {
+                "invoices": invoices,
+                "items_per_invoice": items,
+                "repeat": repeat,
+                # Missing optional packages leave their configurations out
+                "skipped": [
+                    name
+                    for name, module in (
+                        ("msgpack", encoding.msgpack),
+                        ("zstd", encoding.zstandard),
+                    )
+                    if module is None
+                ],
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    cli()
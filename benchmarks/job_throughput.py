@@ -0,0 +1,124 @@
+import json
+import multiprocessing
+import time
+
+import typer
+from sqlalchemy import func, insert, select
+
+from app.config import settings
+from app.database import SessionLocal, create_tables
+from app.auth.models import User  # noqa: F401
+from app.client.models import Client  # noqa: F401
+from app.item.models import Item  # noqa: F401
+from app.invoice.models import Invoice, InvoiceItem  # noqa: F401
+from app.payment.models import Payment  # noqa: F401
+from app.jobs.models import Job
+from app.jobs.schemas import JobStatus
+from app.jobs.service import task
+from app.jobs.worker import Worker
+
+cli = typer.Typer()
+
+
+@task("benchmark.sleep")
+def sleep(db, ms: float = 0):
+    if ms:
+        time.sleep(ms / 1000)
+
+
+def work(queue: str, concurrency: int, batch_size: int, start) -> None:
+    # Imports and connections are done before the clock starts
+    worker = Worker(queue, concurrency, batch_size, poll_interval=0.05)
+    start.wait()
+    worker.run(stop_when_empty=True)
+
+
+def seed_jobs(queue: str, jobs: int, work_ms: float) -> None:
+    db = SessionLocal()
+    try:
+        for offset in range(0, jobs, 5000):
+            db.execute(
+                insert(Job),
+                [
+                    {
+                        "queue": queue,
+                        "task": "benchmark.sleep",
+                        "payload": {"ms": work_ms},
+                        "max_attempts": settings.job_max_attempts,
+                    }
+                    for _ in range(min(5000, jobs - offset))
+                ],
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_statuses(queue: str) -> dict:
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Job.status, func.count())
+            .where(Job.queue == queue)
+            .group_by(Job.status)
+        ).all()
+    finally:
+        db.close()
+    return {status.value: count for status, count in rows}
+
+
+def measure(
+    jobs: int, processes: int, concurrency: int, batch_size: int, work_ms: float
+) -> dict:
+    queue = f"bench-{int(time.time() * 1000)}"
+    seed_jobs(queue, jobs, work_ms)
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    workers = [
+        context.Process(target=work, args=(queue, concurrency, batch_size, start))
+        for _ in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    # Give the workers time to import the app
+    time.sleep(3)
+
+    started = time.perf_counter()
+    start.set()
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = count_statuses(queue)
+    done = statuses.get(JobStatus.DONE.value, 0)
+    return {
+        "processes": processes,
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "jobs": jobs,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "jobs_per_second": round(done / elapsed, 1),
+    }
+
+
+@cli.command()
+def run(
+    jobs: int = typer.Option(20000, help="Jobs per measurement"),
+    processes: str = typer.Option("1,2,4", help="Worker process counts to measure"),
+    concurrency: int = typer.Option(4, help="Threads per worker process"),
+    batch_size: int = typer.Option(10, help="Jobs claimed per statement"),
+    work_ms: float = typer.Option(0, help="Time each job sleeps"),
+):
+    # Every measurement gets its own queue, so earlier runs do not interfere
+    create_tables()
+    results = [
+        measure(jobs, int(count), concurrency, batch_size, work_ms)
+        for count in processes.split(",")
+    ]
+    typer.echo(json.dumps({"results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
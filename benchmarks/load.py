@@ -0,0 +1,328 @@
+import http.client
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+import typer
+
+cli = typer.Typer()
+
+# Operation -> relative weight, used when --mix is not given
+DEFAULT_MIX = {
+    "auth_login": 1,
+    "auth_profile": 2,
+    "clients_list": 10,
+    "clients_get": 10,
+    "clients_create": 2,
+    "items_list": 8,
+    "items_get": 8,
+    "invoices_list": 15,
+    "invoices_get": 15,
+    "invoices_create": 4,
+    "payments_list": 8,
+    "payments_get": 8,
+    "payments_create": 3,
+    "reports_timeseries": 3,
+    "dashboard": 3,
+}
+
+
+class Connection:
+    """A keep-alive HTTP connection owned by a single worker thread."""
+
+    def __init__(self, base_url: str):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def request(self, method, path, token=None, body=None, form=None):
+        headers = {}
+        payload = None
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            payload = json.dumps(body)
+        elif form is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+            payload = urlencode(form)
+
+        try:
+            self.conn.request(method, path, payload, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            # Reconnect on the next request
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            return 0, None
+
+        if data and response.getheader("content-type", "").startswith(
+            "application/json"
+        ):
+            return response.status, json.loads(data)
+        return response.status, None
+
+
+class Tenant:
+    """A manifest user with the ids it can read, collected before the run."""
+
+    def __init__(self, email: str, password: str, token: str):
+        self.email = email
+        self.password = password
+        self.token = token
+        self.client_ids: list[int] = []
+        self.item_ids: list[int] = []
+        self.invoices: list[dict] = []
+        self.payment_ids: list[int] = []
+
+    def load(self, conn: Connection) -> None:
+        _, clients = conn.request("GET", "/clients?limit=100", self.token)
+        _, items = conn.request("GET", "/items?limit=100", self.token)
+        _, invoices = conn.request("GET", "/invoices?limit=100", self.token)
+        _, payments = conn.request("GET", "/payments?limit=100", self.token)
+
+        clients = clients if isinstance(clients, list) else []
+        self.client_ids = [client["id"] for client in clients]
+        self.item_ids = [
+            item["id"] for item in (items if isinstance(items, list) else [])
+        ]
+        self.invoices = invoices if isinstance(invoices, list) else []
+        payments = payments if isinstance(payments, list) else []
+        self.payment_ids = [payment["id"] for payment in payments]
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.client_ids and self.item_ids)
+
+
+def _invoice_body(tenant: Tenant, rng: random.Random) -> dict:
+    lines = rng.sample(tenant.item_ids, min(len(tenant.item_ids), rng.randint(1, 3)))
+    return {
+        "client_id": rng.choice(tenant.client_ids),
+        "issuing_date": datetime.now().isoformat(),
+        "due_date": datetime.now().isoformat(),
+        "items": [
+            {"item_id": item_id, "quantity": rng.randint(1, 5), "price": 10}
+            for item_id in lines
+        ],
+    }
+
+
+def _payment_body(tenant: Tenant, rng: random.Random):
+    open_invoices = [
+        invoice for invoice in tenant.invoices if invoice.get("status") != "paid"
+    ]
+    if not open_invoices:
+        return None
+    invoice = rng.choice(open_invoices)
+    return {
+        "client_id": invoice["client_id"],
+        "invoice_id": invoice["id"],
+        "amount": 0.01,
+        "currency": invoice.get("currency") or "USD",
+        "payment_date": datetime.now().isoformat(),
+    }
+
+
+def _pick(rng: random.Random, ids: list) -> int:
+    # Id 0 never exists, the request still runs and counts as an error
+    return rng.choice(ids) if ids else 0
+
+
+# Operations without per-request state
+STATIC_PATHS = {
+    "auth_profile": "/auth/profile",
+    "clients_list": "/clients?limit=50",
+    "items_list": "/items?limit=50",
+    "invoices_list": "/invoices?limit=50",
+    "payments_list": "/payments?limit=50",
+    "dashboard": "/dashboard",
+}
+
+OPERATIONS = [*DEFAULT_MIX]
+
+
+def build_request(name: str, tenant: Tenant, rng: random.Random):
+    """Returns (method, path, request kwargs), or None when it can't run."""
+    if name in STATIC_PATHS:
+        return "GET", STATIC_PATHS[name], {}
+
+    if name == "auth_login":
+        form = {"username": tenant.email, "password": tenant.password}
+        return "POST", "/auth/login", {"form": form}
+    if name == "clients_get":
+        return "GET", f"/clients/{_pick(rng, tenant.client_ids)}", {}
+    if name == "items_get":
+        return "GET", f"/items/{_pick(rng, tenant.item_ids)}", {}
+    if name == "invoices_get":
+        invoice_ids = [invoice["id"] for invoice in tenant.invoices]
+        return "GET", f"/invoices/{_pick(rng, invoice_ids)}", {}
+    if name == "payments_get":
+        return "GET", f"/payments/{_pick(rng, tenant.payment_ids)}", {}
+    if name == "reports_timeseries":
+        granularity = rng.choice(["day", "week", "month"])
+        return "GET", f"/reports/timeseries?granularity={granularity}", {}
+
+    if name == "clients_create":
+        first_name = f"Load {rng.randrange(10**9)}"
+        body = {"first_name": first_name}
+        return "POST", "/clients", {"body": body}
+    if name == "invoices_create":
+        return "POST", "/invoices", {"body": _invoice_body(tenant, rng)}
+    if name == "payments_create":
+        body = _payment_body(tenant, rng)
+        return ("POST", "/payments", {"body": body}) if body else None
+
+    raise ValueError(name)
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    if not mix:
+        return dict(DEFAULT_MIX)
+
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise typer.BadParameter(
+                f"Unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}"
+            )
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def prepare_tenants(base_url: str, manifest: dict, users: int) -> list[Tenant]:
+    conn = Connection(base_url)
+    tenants = []
+    for email in manifest["emails"][:users]:
+        status, data = conn.request(
+            "POST",
+            "/auth/login",
+            form={"username": email, "password": manifest["password"]},
+        )
+        if status != 200:
+            continue
+        tenant = Tenant(email, manifest["password"], data["access_token"])
+        tenant.load(conn)
+        if tenant.ready:
+            tenants.append(tenant)
+    return tenants
+
+
+def worker(
+    base_url: str,
+    tenants: list[Tenant],
+    mix: dict[str, float],
+    deadline: float,
+    seed: int,
+    samples: dict[str, list[float]],
+    errors: dict[str, int],
+    lock: threading.Lock,
+) -> None:
+    rng = random.Random(seed)
+    conn = Connection(base_url)
+    names = list(mix)
+    weights = list(mix.values())
+    local_samples = {name: [] for name in names}
+    local_errors = dict.fromkeys(names, 0)
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        tenant = rng.choice(tenants)
+        request = build_request(name, tenant, rng)
+        if request is None:
+            continue
+        method, path, kwargs = request
+
+        started = time.perf_counter()
+        status, _ = conn.request(method, path, tenant.token, **kwargs)
+        local_samples[name].append(time.perf_counter() - started)
+        if not 200 <= status < 300:
+            local_errors[name] += 1
+
+    with lock:
+        for name in names:
+            samples[name].extend(local_samples[name])
+            errors[name] += local_errors[name]
+
+
+@cli.command()
+def run(
+    base_url: str = typer.Option("http://127.0.0.1:8000"),
+    manifest: str = typer.Option(
+        "bench_manifest.json", help="Users written by benchmarks.datagen"
+    ),
+    users: int = typer.Option(50, help="Manifest users to spread the load over"),
+    concurrency: int = typer.Option(16, help="Concurrent connections"),
+    duration: float = typer.Option(30, help="Seconds to run for"),
+    mix: str = typer.Option(
+        "", help="Comma separated operation=weight pairs, defaults to all operations"
+    ),
+    seed: int = typer.Option(42),
+):
+    weights = parse_mix(mix)
+    with open(manifest) as source:
+        tenants = prepare_tenants(base_url, json.load(source), users)
+    if not tenants:
+        raise typer.Exit("No usable users in the manifest, run benchmarks.datagen")
+
+    samples = {name: [] for name in weights}
+    errors = dict.fromkeys(weights, 0)
+    lock = threading.Lock()
+
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(base_url, tenants, weights, deadline, seed + i),
+            kwargs={"samples": samples, "errors": errors, "lock": lock},
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name, timings in samples.items():
+        if not timings:
+            continue
+        endpoints[name] = {
+            "requests": len(timings),
+            "errors": errors[name],
+            "throughput_rps": round(len(timings) / elapsed, 2),
+            "p50_ms": round(percentile(timings, 50) * 1000, 3),
+            "p95_ms": round(percentile(timings, 95) * 1000, 3),
+            "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        }
+
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    result = {
+        "base_url": base_url,
+        "users": len(tenants),
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": total,
+        "errors": sum(errors.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+    typer.echo(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+import typer
+from fastapi import FastAPI
+
+from benchmarks.asgi import call
+from app.utils.logger import configure_logging, logger, shutdown_logging
+
+cli = typer.Typer()
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/invoices/{invoice_id}")
+    def get_invoice(invoice_id: int):
+        logger.info(f"Loading invoice {invoice_id}")
+        logger.info("Invoice loaded", extra={"invoice_id": invoice_id})
+        return {"id": invoice_id, "status": "unpaid", "total_amount": 100.0}
+
+    return app
+
+
+async def requests_per_second(app, requests: int) -> float:
+    for i in range(min(requests, 500)):
+        await call(app, f"/invoices/{i}")
+
+    started = time.perf_counter()
+    for i in range(requests):
+        await call(app, f"/invoices/{i}")
+    return requests / (time.perf_counter() - started)
+
+
+@cli.command()
+def run(
+    requests: int = typer.Option(5000, help="Requests per configuration"),
+    rounds: int = typer.Option(3, help="Alternating rounds per configuration"),
+):
+    app = build_app()
+    results = {"off": [], "on": []}
+
+    with open(os.devnull, "w") as devnull:
+        configure_logging(devnull)
+        for _ in range(rounds):
+            logging.disable(logging.CRITICAL)
+            results["off"].append(asyncio.run(requests_per_second(app, requests)))
+            logging.disable(logging.NOTSET)
+            results["on"].append(asyncio.run(requests_per_second(app, requests)))
+        shutdown_logging()
+
+    off = max(results["off"])
+    on = max(results["on"])
+    typer.echo(
+        json.dumps(
+            {
+                "requests": requests,
+                "rounds": rounds,
+                "logging_off_rps": round(off, 1),
+                "logging_on_rps": round(on, 1),
+                "slowdown_pct": round((off - on) / off * 100, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    cli()
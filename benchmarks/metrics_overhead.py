@@ -0,0 +1,76 @@
+import asyncio
+import json
+import statistics
+import time
+
+import typer
+from fastapi import FastAPI
+
+from benchmarks.asgi import call
+from app.utils.metrics import (
+    MetricsMiddleware,
+    MetricsRegistry,
+    TimedJSONResponse,
+)
+
+cli = typer.Typer()
+
+
+def build_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI(default_response_class=TimedJSONResponse)
+
+    @app.get("/invoices/{invoice_id}")
+    async def get_invoice(invoice_id: int):
+        return {"id": invoice_id, "status": "unpaid", "total_amount": 100.0}
+
+    if with_metrics:
+        registry = MetricsRegistry()
+        app.add_middleware(MetricsMiddleware, registry=registry)
+        registry.prepare(app.routes)
+
+    return app
+
+
+async def measure(app, requests: int) -> list[float]:
+    for i in range(min(requests, 1000)):
+        await call(app, f"/invoices/{i}")
+
+    samples = []
+    for i in range(requests):
+        started = time.perf_counter()
+        await call(app, f"/invoices/{i}")
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+
+@cli.command()
+def run(
+    requests: int = typer.Option(20000, help="Requests per configuration"),
+    rounds: int = typer.Option(5, help="Alternating rounds per configuration"),
+):
+    # Alternate the configurations so drift affects both the same way
+    results = {"plain": [], "metrics": []}
+    apps = {"plain": build_app(False), "metrics": build_app(True)}
+
+    for _ in range(rounds):
+        for name, app in apps.items():
+            results[name].append(statistics.median(asyncio.run(measure(app, requests))))
+
+    plain = statistics.median(results["plain"])
+    metrics = statistics.median(results["metrics"])
+    typer.echo(
+        json.dumps(
+            {
+                "requests": requests,
+                "rounds": rounds,
+                "plain_p50_us": round(plain, 2),
+                "metrics_p50_us": round(metrics, 2),
+                "overhead_us": round(metrics - plain, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,110 @@
+import json
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import typer
+
+cli = typer.Typer()
+
+SERVERS = {
+    "uvicorn": ["-m", "uvicorn", "app.main:app", "--workers"],
+    "prefork": ["-m", "app.server", "serve", "--workers"],
+}
+
+
+def children(pid: int) -> list[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def workers(pid: int) -> list[int]:
+    # The processes serving requests are the leaves of the tree
+    leaves = []
+    for child in children(pid):
+        leaves.extend(workers(child) or [child])
+    return leaves
+
+
+def memory(pid: int) -> dict:
+    # Rss counts shared pages in full, Pss splits them between the sharers
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty"):
+                values[name] = int(rest.split()[0]) / 1024
+    return {
+        "rss_mb": round(values["Rss"], 1),
+        "pss_mb": round(values["Pss"], 1),
+        "shared_mb": round(values["Shared_Clean"] + values["Shared_Dirty"], 1),
+    }
+
+
+def get(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            response.read()
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def measure(server: str, processes: int, port: int, requests: int) -> dict:
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *SERVERS[server], str(processes), "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while not get(f"{base_url}/"):
+            if process.poll() is not None:
+                raise RuntimeError(f"{server} exited with {process.returncode}")
+            time.sleep(0.01)
+        first_request = time.perf_counter() - started
+
+        # Let every worker start, then warm them the way traffic would
+        pids = []
+        while len(pids) < processes:
+            time.sleep(0.5)
+            pids = workers(process.pid)
+        for _ in range(requests):
+            get(f"{base_url}/openapi.json")
+
+        per_worker = [memory(pid) for pid in pids]
+        # Master, zygote and workers
+        everything = {process.pid, *children(process.pid), *pids}
+        return {
+            "time_to_first_request_s": round(first_request, 3),
+            "worker_rss_mb": statistics.median(m["rss_mb"] for m in per_worker),
+            "worker_pss_mb": statistics.median(m["pss_mb"] for m in per_worker),
+            "worker_shared_mb": statistics.median(m["shared_mb"] for m in per_worker),
+            "total_pss_mb": round(sum(memory(pid)["pss_mb"] for pid in everything), 1),
+        }
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(60)
+
+
+@cli.command()
+def run(
+    processes: int = typer.Option(4, help="Worker processes"),
+    port: int = typer.Option(8100),
+    requests: int = typer.Option(50, help="Warm-up requests before measuring"),
+):
+    results = {
+        server: measure(server, processes, port, requests) for server in SERVERS
+    }
+    typer.echo(json.dumps({"workers": processes, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
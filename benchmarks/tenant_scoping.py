@@ -0,0 +1,131 @@
+import json
+import random
+import statistics
+import time
+
+import typer
+from sqlalchemy import insert
+
+from app.database import SessionLocal, create_tables
+from app.auth.models import User
+from app.client.models import Client
+from app.item.models import Item
+from app.invoice.models import Invoice, InvoiceItem  # noqa: F401
+from app.payment.models import Payment  # noqa: F401
+from app.client.service import ClientService
+from app.item.service import ItemService
+from app.utils.tenancy import set_current_owner
+
+cli = typer.Typer()
+
+
+def seed_tenants(db, tenants: int, run_id: str) -> list[int]:
+    rows = [
+        {
+            "first_name": f"Tenant {i}",
+            "username": f"bench-{run_id}-{i}@example.com",
+            "email": f"bench-{run_id}-{i}@example.com",
+            "password": "!",
+        }
+        for i in range(tenants)
+    ]
+    owner_ids = db.execute(insert(User).returning(User.id), rows).scalars().all()
+    db.commit()
+    return list(owner_ids)
+
+
+def seed_rows(db, owner_ids: list[int], per_tenant: int) -> None:
+    for owner_id in owner_ids:
+        db.execute(
+            insert(Client),
+            [
+                {"owner_id": owner_id, "first_name": f"Client {i}"}
+                for i in range(per_tenant)
+            ],
+        )
+        db.execute(
+            insert(Item),
+            [
+                {"owner_id": owner_id, "name": f"Item {i}", "price": 10}
+                for i in range(per_tenant)
+            ],
+        )
+    db.commit()
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(owner_ids: list[int], repeats: int) -> dict:
+    timings = {"clients": [], "items": []}
+
+    db = SessionLocal()
+    try:
+        for owner_id in owner_ids:
+            set_current_owner(db, owner_id)
+            for _ in range(repeats):
+                started = time.perf_counter()
+                ClientService(db).get_client_list(0, 100)
+                timings["clients"].append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                ItemService(db).get_item_list(0, 100)
+                timings["items"].append((time.perf_counter() - started) * 1000)
+            db.rollback()
+    finally:
+        db.close()
+
+    return {
+        name: {
+            "p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(percentile(samples, 95), 3),
+            "p99_ms": round(percentile(samples, 99), 3),
+        }
+        for name, samples in timings.items()
+    }
+
+
+@cli.command()
+def run(
+    tenants: int = typer.Option(1000, help="Number of tenants"),
+    rows_per_tenant: int = typer.Option(20, help="Rows per tenant in each round"),
+    rounds: int = typer.Option(3, help="Each round adds rows for every tenant"),
+    sample: int = typer.Option(100, help="Tenants measured per round"),
+    repeats: int = typer.Option(10, help="List calls per measured tenant"),
+    seed: int = typer.Option(42),
+):
+    # The measured tenants keep the same amount of rows while the rest of the
+    # table grows, so flat latencies mean the lists only touch their own range.
+    random.seed(seed)
+    create_tables()
+    run_id = str(int(time.time()))
+
+    db = SessionLocal()
+    try:
+        owner_ids = seed_tenants(db, tenants, run_id)
+        measured = random.sample(owner_ids, min(sample, len(owner_ids)))
+        seed_rows(db, measured, rows_per_tenant)
+
+        measured_set = set(measured)
+        others = [owner_id for owner_id in owner_ids if owner_id not in measured_set]
+        results = []
+        for round_number in range(rounds):
+            seed_rows(db, others, rows_per_tenant * 10**round_number)
+            total_clients = db.query(Client).count()
+            results.append(
+                {
+                    "round": round_number,
+                    "total_clients": total_clients,
+                    "latency": measure(measured, repeats),
+                }
+            )
+    finally:
+        db.close()
+
+    typer.echo(json.dumps({"tenants": tenants, "rounds": results}, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,52 @@
+from logging.config import fileConfig
+
+from sqlalchemy import create_engine, pool
+
+from alembic import context
+
+from app.config import settings
+from app.database import Base
+from app.auth.models import User  # noqa: F401
+from app.client.models import Client  # noqa: F401
+from app.item.models import Item  # noqa: F401
+from app.invoice.models import Invoice, InvoiceItem  # noqa: F401
+from app.payment.models import Payment  # noqa: F401
+from app.report.models import DailyRollup  # noqa: F401
+from app.fx.models import FxRate  # noqa: F401
+from app.jobs.models import Job  # noqa: F401
+from app.events.models import Event  # noqa: F401
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=settings.database_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(settings.database_url, poolclass=pool.NullPool)
+
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
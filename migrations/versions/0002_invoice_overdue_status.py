@@ -0,0 +1,37 @@
+"""invoice overdue status
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE invoicestatus ADD VALUE IF NOT EXISTS 'OVERDUE'")
+    op.create_index(
+        "ix_invoices_status_due_date",
+        "invoices",
+        ["status", "due_date"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_invoices_status_due_date", table_name="invoices")
+    op.execute(
+        "UPDATE invoices SET status = CASE WHEN paid_amount > 0 "
+        "THEN 'PARTIALLY_PAID'::invoicestatus ELSE 'UNPAID'::invoicestatus END "
+        "WHERE status = 'OVERDUE'"
+    )
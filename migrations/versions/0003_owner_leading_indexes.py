@@ -0,0 +1,52 @@
+"""owner leading indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_clients_owner_id_id", "clients", ["owner_id", "id"]),
+    ("ix_items_owner_id_id", "items", ["owner_id", "id"]),
+    ("ix_invoices_owner_id_id", "invoices", ["owner_id", "id"]),
+    ("ix_invoices_owner_id_issuing_date", "invoices", ["owner_id", "issuing_date"]),
+    ("ix_invoices_owner_id_client_id", "invoices", ["owner_id", "client_id"]),
+    ("ix_invoice_items_invoice_id", "invoice_items", ["invoice_id"]),
+    ("ix_payments_owner_id_id", "payments", ["owner_id", "id"]),
+    ("ix_payments_owner_id_payment_date", "payments", ["owner_id", "payment_date"]),
+    ("ix_payments_invoice_id", "payments", ["invoice_id"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
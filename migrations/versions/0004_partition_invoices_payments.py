@@ -0,0 +1,119 @@
+"""partition invoices and payments by month
+
+Rebuilds invoices and payments as tables range partitioned by issuing_date
+and payment_date. Partitioned tables need the partition key in their primary
+key, so the foreign keys from invoice_items and payments to invoices are
+dropped and the services delete related rows themselves. The tables are
+rewritten, run it in a maintenance window.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import text
+
+from app.config import settings
+from app.utils.partitions import ensure_partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {
+    "invoices": {
+        "key": "issuing_date",
+        "indexes": [
+            ("ix_invoices_status_due_date", "status, due_date"),
+            ("ix_invoices_owner_id_id", "owner_id, id"),
+            ("ix_invoices_owner_id_issuing_date", "owner_id, issuing_date"),
+            ("ix_invoices_owner_id_client_id", "owner_id, client_id"),
+        ],
+    },
+    "payments": {
+        "key": "payment_date",
+        "indexes": [
+            ("ix_payments_id", "id"),
+            ("ix_payments_owner_id_id", "owner_id, id"),
+            ("ix_payments_owner_id_payment_date", "owner_id, payment_date"),
+            ("ix_payments_invoice_id", "invoice_id"),
+        ],
+    },
+}
+
+
+def _add_constraints(table: str, primary_key: str) -> None:
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})")
+    op.execute(
+        f"ALTER TABLE {table} ADD FOREIGN KEY (owner_id) REFERENCES users (id)"
+    )
+    op.execute(
+        f"ALTER TABLE {table} ADD FOREIGN KEY (client_id) REFERENCES clients (id)"
+    )
+    for name, columns in TABLES[table]["indexes"]:
+        op.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    op.execute(
+        "ALTER TABLE invoice_items DROP CONSTRAINT IF EXISTS invoice_items_invoice_id_fkey"
+    )
+    op.execute(
+        "ALTER TABLE payments DROP CONSTRAINT IF EXISTS payments_invoice_id_fkey"
+    )
+
+    for table, spec in TABLES.items():
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({spec['key']})"
+        )
+
+    since = conn.execute(
+        text(
+            "SELECT LEAST("
+            "(SELECT min(issuing_date) FROM invoices_unpartitioned), "
+            "(SELECT min(payment_date) FROM payments_unpartitioned))"
+        )
+    ).scalar()
+    ensure_partitions(
+        conn, settings.partition_months_ahead, since.date() if since else None
+    )
+
+    for table, spec in TABLES.items():
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned")
+        op.execute(f"DROP TABLE {table}_unpartitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        _add_constraints(table, f"id, {spec['key']}")
+
+
+def downgrade() -> None:
+    # Partitions moved to <table>_archive are not brought back
+    for table in TABLES:
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS)"
+        )
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_partitioned")
+        op.execute(f"DROP TABLE {table}_partitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        _add_constraints(table, "id")
+
+    op.execute(
+        "ALTER TABLE invoice_items ADD CONSTRAINT invoice_items_invoice_id_fkey "
+        "FOREIGN KEY (invoice_id) REFERENCES invoices (id) ON DELETE CASCADE"
+    )
+    op.execute(
+        "ALTER TABLE payments ADD CONSTRAINT payments_invoice_id_fkey "
+        "FOREIGN KEY (invoice_id) REFERENCES invoices (id) ON DELETE CASCADE"
+    )
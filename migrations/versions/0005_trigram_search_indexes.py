@@ -0,0 +1,49 @@
+"""trigram search indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 16:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to app.utils.search.search_text, or queries stop using
+# the indexes
+INDEXES = {
+    "ix_clients_search_trgm": (
+        "clients",
+        "coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || "
+        "coalesce(email, '') || ' ' || coalesce(phone, '')",
+    ),
+    "ix_items_search_trgm": (
+        "items",
+        "coalesce(name, '') || ' ' || coalesce(description, '')",
+    ),
+}
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+
+    with op.get_context().autocommit_block():
+        for name, (table, expression) in INDEXES.items():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} "
+                f"USING gin (owner_id, ({expression}) gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,43 @@
+"""version columns
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The archive parents take partitions detached from the hot tables, their
+# columns have to stay identical
+TABLES = (
+    "clients",
+    "items",
+    "invoices",
+    "payments",
+    "invoices_archive",
+    "payments_archive",
+)
+
+
+def upgrade() -> None:
+    # A constant default only changes the catalog, existing rows are not
+    # rewritten
+    for table in TABLES:
+        op.execute(
+            f"ALTER TABLE IF EXISTS {table} "
+            f"ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1"
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"ALTER TABLE IF EXISTS {table} DROP COLUMN IF EXISTS version")
@@ -0,0 +1,42 @@
+"""daily rollups
+
+create_tables() also creates the table, IF NOT EXISTS keeps the migration
+harmless on a database made that way.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 19:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            owner_id integer NOT NULL REFERENCES users (id),
+            day date NOT NULL,
+            currency varchar NOT NULL,
+            invoiced_amount numeric NOT NULL,
+            collected_amount numeric NOT NULL,
+            invoice_count integer NOT NULL,
+            payment_count integer NOT NULL,
+            updated_at timestamp DEFAULT now(),
+            PRIMARY KEY (owner_id, day, currency)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS daily_rollups")
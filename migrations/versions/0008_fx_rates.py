@@ -0,0 +1,39 @@
+"""fx rates
+
+create_tables() also creates the table, IF NOT EXISTS keeps the migration
+harmless on a database made that way.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 19:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fx_rates (
+            currency varchar NOT NULL,
+            day date NOT NULL,
+            rate numeric NOT NULL,
+            is_filled boolean NOT NULL,
+            updated_at timestamp DEFAULT now(),
+            PRIMARY KEY (currency, day)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS fx_rates")
@@ -0,0 +1,59 @@
+"""jobs
+
+create_tables() also creates the table, IF NOT EXISTS keeps the migration
+harmless on a database made that way.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 19:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Enum labels are the member names, as SQLAlchemy stores them
+    op.execute(
+        """
+        DO $$ BEGIN
+            CREATE TYPE jobstatus AS ENUM ('QUEUED', 'RUNNING', 'DONE', 'FAILED');
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id bigserial PRIMARY KEY,
+            queue varchar NOT NULL,
+            task varchar NOT NULL,
+            payload jsonb NOT NULL,
+            status jobstatus NOT NULL,
+            run_at timestamp NOT NULL DEFAULT now(),
+            attempts integer NOT NULL,
+            max_attempts integer NOT NULL,
+            locked_by varchar,
+            last_error varchar,
+            created_at timestamp DEFAULT now(),
+            finished_at timestamp
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_jobs_claim ON jobs (queue, run_at) "
+        "WHERE status IN ('QUEUED', 'RUNNING')"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS jobs")
+    op.execute("DROP TYPE IF EXISTS jobstatus")
@@ -0,0 +1,65 @@
+"""events
+
+create_tables() also creates the table, IF NOT EXISTS keeps the migration
+harmless on a database made that way.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 19:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ENUMS = {
+    "evententity": ("INVOICE", "PAYMENT"),
+    "eventaction": ("CREATED", "UPDATED", "DELETED"),
+}
+
+
+def upgrade() -> None:
+    # Enum labels are the member names, as SQLAlchemy stores them
+    for name, labels in ENUMS.items():
+        values = ", ".join(f"'{label}'" for label in labels)
+        op.execute(
+            f"""
+            DO $$ BEGIN
+                CREATE TYPE {name} AS ENUM ({values});
+            EXCEPTION WHEN duplicate_object THEN NULL;
+            END $$
+            """
+        )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS events (
+            id bigserial PRIMARY KEY,
+            owner_id integer NOT NULL,
+            entity evententity NOT NULL,
+            entity_id integer NOT NULL,
+            action eventaction NOT NULL,
+            created_at timestamp NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_events_owner_id_id ON events (owner_id, id)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_events_created_at ON events "
+        "USING brin (created_at)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS events")
+    for name in ENUMS:
+        op.execute(f"DROP TYPE IF EXISTS {name}")
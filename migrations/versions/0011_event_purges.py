@@ -0,0 +1,42 @@
+"""event purges
+
+Records how far the events outbox was purged, replacing the guess from the
+oldest kept id. Earlier purges always kept the newest event, so the oldest
+kept id seeds the watermark.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 20:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS event_purges (
+            id integer PRIMARY KEY,
+            purged_through bigint NOT NULL,
+            purged_at timestamp NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO event_purges (id, purged_through) "
+        "SELECT 1, min(id) - 1 FROM events HAVING count(*) > 0 "
+        "ON CONFLICT (id) DO NOTHING"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS event_purges")
@@ -0,0 +1,122 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# Every model, so create_all builds the whole schema
+import app.auth.models  # noqa: F401
+import app.client.models  # noqa: F401
+import app.events.models  # noqa: F401
+import app.fx.models  # noqa: F401
+import app.invoice.models  # noqa: F401
+import app.item.models  # noqa: F401
+import app.jobs.models  # noqa: F401
+import app.payment.models  # noqa: F401
+import app.report.models  # noqa: F401
+from app.auth.models import User
+from app.client.models import Client
+from app.config import settings
+from app.database import Base
+from app.invoice.schemas import InvoiceCreate
+from app.item.models import Item
+from app.utils.partitions import ensure_partitions
+from app.utils.request_stats import instrument_engine
+from app.utils.tenancy import set_current_owner
+from app.utils.testing import assert_max_statements
+
+
+@pytest.fixture(scope="session")
+def engine():
+    engine = create_engine(settings.testing_database_url)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+    except OperationalError:
+        pytest.skip("The TESTING_DATABASE_URL database is not reachable")
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        ensure_partitions(conn, settings.partition_months_ahead)
+
+    # Counted like the app's engine
+    instrument_engine(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    # Commits of the services only release savepoints, the test's writes are
+    # rolled back with the outer transaction
+    conn = engine.connect()
+    transaction = conn.begin()
+    db = Session(bind=conn, join_transaction_mode="create_savepoint")
+    try:
+        yield db
+    finally:
+        db.close()
+        transaction.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def max_statements():
+    """`with max_statements(2): service.get_invoice(invoice_id)`"""
+    return assert_max_statements
+
+
+class Tenant:
+    """A user with a client and items, kept as ids.
+
+    Rows of another tenant can not be refreshed on a session scoped to
+    this one.
+    """
+
+    def __init__(self, user: User, client: Client, items: list[Item]):
+        self.user_id = user.id
+        self.client_id = client.id
+        self.item_ids = [item.id for item in items]
+
+    def invoice_data(self, lines: int) -> InvoiceCreate:
+        return InvoiceCreate(
+            client_id=self.client_id,
+            items=[
+                {"item_id": item_id, "quantity": 2, "price": 10}
+                for item_id in self.item_ids[:lines]
+            ],
+        )
+
+
+def make_tenant(db, name: str) -> Tenant:
+    user = User(
+        first_name=name,
+        username=name,
+        email=f"{name}@example.com",
+        password="not-a-hash",
+    )
+    db.add(user)
+    db.flush()
+    client = Client(owner_id=user.id, first_name=f"{name} client")
+    items = [
+        Item(owner_id=user.id, name=f"{name} item {n}", price=10 * n)
+        for n in range(1, 6)
+    ]
+    db.add_all([client, *items])
+    db.flush()
+    tenant = Tenant(user, client, items)
+    db.commit()
+    return tenant
+
+
+@pytest.fixture
+def other_tenant(db):
+    return make_tenant(db, "other")
+
+
+@pytest.fixture
+def tenant(db, other_tenant):
+    # Created last and set on the session, like get_current_user does
+    tenant = make_tenant(db, "tenant")
+    set_current_owner(db, tenant.user_id)
+    return tenant
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.utils.admission import AUTH, READ, REPORT, WRITE, Limiter, route_class
+
+
+def test_route_class():
+    assert route_class("GET", "/") is None
+    assert route_class("GET", "/events") is None
+    assert route_class("GET", "/metrics") is None
+    assert route_class("GET", "/openapi.json") is None
+    assert route_class("POST", "/auth/login") == AUTH
+    assert route_class("GET", "/reports/timeseries") == REPORT
+    assert route_class("GET", "/invoices/7/pdf") == REPORT
+    assert route_class("POST", "/invoices/recalculate") == REPORT
+    assert route_class("GET", "/invoices") == READ
+    assert route_class("POST", "/invoices") == WRITE
+    assert route_class("DELETE", "/clients/1") == WRITE
+
+
+def test_limiter_admits_up_to_the_limit_then_queues():
+    async def scenario():
+        limiter = Limiter(limit=1, queue_size=1)
+        assert await limiter.acquire(timeout=1)
+
+        waiting = asyncio.ensure_future(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+        assert len(limiter.waiters) == 1
+        # The queue is full
+        assert not await limiter.acquire(timeout=1)
+
+        # The slot goes to the waiter, active stays at the limit
+        limiter.release()
+        assert await waiting
+        assert limiter.active == 1
+        limiter.release()
+        assert limiter.active == 0
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.admitted == 2
+    assert dict(limiter.rejected) == {"queue_full": 1}
+
+
+def test_limiter_rejects_after_the_timeout():
+    async def scenario():
+        limiter = Limiter(limit=1, queue_size=5)
+        await limiter.acquire(timeout=1)
+        assert not await limiter.acquire(timeout=0.01)
+        assert not limiter.waiters
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert dict(limiter.rejected) == {"timeout": 1}
+
+
+def test_limiter_drops_a_cancelled_waiter():
+    async def scenario():
+        limiter = Limiter(limit=1, queue_size=5)
+        await limiter.acquire(timeout=1)
+        waiting = asyncio.ensure_future(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+
+        # The client went away while waiting, the slot is freed on release
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert not limiter.waiters
+        limiter.release()
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.active == 0
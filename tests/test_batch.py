@@ -0,0 +1,26 @@
+import pytest
+from fastapi import HTTPException
+
+from app.utils.batch import BATCH_LIMIT, check_found, id_list
+
+
+def test_id_list():
+    assert id_list(None) is None
+    assert id_list("3,1,3, 2,") == [3, 1, 2]
+
+
+@pytest.mark.parametrize(
+    "ids", ["", ",", "1,a", ",".join(str(n) for n in range(BATCH_LIMIT + 1))]
+)
+def test_id_list_rejects(ids):
+    with pytest.raises(HTTPException) as raised:
+        id_list(ids)
+    assert raised.value.status_code == 400
+
+
+def test_check_found():
+    check_found([1, 2], [2, 1, 3], "Invoices")
+    with pytest.raises(HTTPException) as raised:
+        check_found([3, 1, 2], [2], "Invoices")
+    assert raised.value.status_code == 404
+    assert raised.value.detail == "Invoices not found: [1, 3]"
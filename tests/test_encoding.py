@@ -0,0 +1,67 @@
+import zlib
+
+import pytest
+
+from app.utils import encoding
+from app.utils.encoding import (
+    JSON_TYPE,
+    MSGPACK_TYPE,
+    StreamCompressor,
+    negotiate_encoding,
+    negotiate_media_type,
+)
+
+
+def test_negotiate_media_type_defaults_to_json():
+    assert negotiate_media_type("") == JSON_TYPE
+    assert negotiate_media_type("text/html") == JSON_TYPE
+
+
+@pytest.mark.skipif(encoding.msgpack is None, reason="msgpack is not installed")
+def test_negotiate_media_type_follows_the_quality():
+    assert negotiate_media_type("application/msgpack") == MSGPACK_TYPE
+    assert negotiate_media_type("application/x-msgpack, */*;q=0.5") == MSGPACK_TYPE
+    assert (
+        negotiate_media_type("application/msgpack;q=0.5, application/json")
+        == JSON_TYPE
+    )
+
+
+def test_negotiate_media_type_without_msgpack(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", None)
+    assert negotiate_media_type("application/msgpack") == JSON_TYPE
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("GZIP;q=bad") is None
+
+
+def test_negotiate_encoding_prefers_zstd(monkeypatch):
+    monkeypatch.setattr(encoding, "zstandard", object())
+    assert negotiate_encoding("gzip, zstd;q=0.5") == "zstd"
+    assert negotiate_encoding("gzip, zstd;q=0") == "gzip"
+    monkeypatch.setattr(encoding, "zstandard", None)
+    assert negotiate_encoding("zstd") is None
+
+
+def test_stream_compressor_flushes_every_chunk():
+    compressor = StreamCompressor("gzip")
+    decompressor = zlib.decompressobj(31)
+
+    # Each chunk can be decompressed on its own arrival
+    for data in (b"data: 1\n\n", b"data: 2\n\n"):
+        assert decompressor.decompress(compressor.chunk(data)) == data
+    assert decompressor.decompress(compressor.finish()) == b""
+    assert decompressor.eof
+
+
+@pytest.mark.skipif(encoding.zstandard is None, reason="zstandard is not installed")
+def test_stream_compressor_zstd():
+    compressor = StreamCompressor("zstd")
+    body = compressor.chunk(b"a" * 100) + compressor.chunk(b"b") + compressor.finish()
+    decompressor = encoding.zstandard.ZstdDecompressor().decompressobj()
+    assert decompressor.decompress(body) == b"a" * 100 + b"b"
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from app.events.schemas import EventAction, EventEntity
+from app.events.service import EventService, record_events
+
+
+def test_purge_records_how_far_it_went(db, tenant):
+    service = EventService(db)
+    record_events(
+        db,
+        EventEntity.INVOICE,
+        EventAction.CREATED,
+        [(tenant.user_id, entity_id) for entity_id in (1, 2, 3)],
+    )
+    ids = [event["id"] for event in service.get_events_after(tenant.user_id, 0, 10)]
+
+    assert service.purge(datetime(9999, 1, 1)) >= len(ids)
+    assert service.is_retained(ids[-1])
+    assert not service.is_retained(ids[-2])
+    # Nothing older left, a second purge keeps the watermark
+    assert service.purge(datetime(9999, 1, 1)) == 0
+    assert service.is_retained(ids[-1])
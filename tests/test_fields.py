@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.invoice.schemas import InvoiceInDB, InvoiceStatus
+from app.utils.fields import FieldSelection, sparse_model
+
+
+def test_sparse_model_keeps_the_selected_fields():
+    model = sparse_model(InvoiceInDB, frozenset({"id", "status", "issuing_date"}))
+
+    assert set(model.model_fields) == {"id", "status", "issuing_date"}
+    sparse = model.model_validate(
+        {"id": 1, "status": "paid", "issuing_date": "2026-01-02T00:00:00"}
+    )
+    assert sparse.status is InvoiceStatus.PAID
+    assert sparse.issuing_date == datetime(2026, 1, 2)
+    assert sparse.model_dump(mode="json")["status"] == "paid"
+
+
+def test_sparse_model_is_cached():
+    fields = frozenset({"id", "status"})
+    assert sparse_model(InvoiceInDB, fields) is sparse_model(InvoiceInDB, fields)
+
+
+def test_field_selection():
+    selection = FieldSelection(InvoiceInDB, relations=("items",))
+
+    assert selection(None, None) is None
+    assert selection("status", None) == {"id", "status"}
+    assert "items" not in selection(None, "")
+    assert selection("status", "items") == {"id", "status", "items"}
+    with pytest.raises(HTTPException) as raised:
+        selection("status,nope", None)
+    assert raised.value.status_code == 400
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+
+from app.auth.schemas import TokenData
+from app.database import get_db
+from app.invoice.routers import router as invoice_router
+from app.utils.security import create_access_token
+
+
+async def request(app, method: str, path: str, token: str, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"authorization", f"Bearer {token}".encode()),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+        ],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 8000),
+    }
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+    start, body_parts = {}, []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(message)
+        else:
+            body_parts.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return start["status"], json.loads(b"".join(body_parts) or b"null")
+
+
+def test_authenticated_write_shares_the_request_session(db, tenant):
+    # get_current_user queries the session before the route runs, the write
+    # has to work in the transaction that query began
+    app = FastAPI()
+    app.include_router(invoice_router)
+
+    async def request_session():
+        yield db
+
+    app.dependency_overrides[get_db] = request_session
+    token = create_access_token(TokenData(user_id=tenant.user_id))
+    body = tenant.invoice_data(2).model_dump(mode="json")
+
+    status_code, invoice = asyncio.run(
+        request(app, "POST", "/invoices", token, body)
+    )
+
+    assert status_code == 201, invoice
+    assert invoice["owner_id"] == tenant.user_id
+    assert len(invoice["items"]) == 2
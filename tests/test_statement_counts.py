@@ -0,0 +1,32 @@
+from app.invoice.service import InvoiceService
+from app.utils.testing import count_statements
+
+
+def test_create_invoice_statements_do_not_grow_with_lines(
+    db, tenant, max_statements
+):
+    service = InvoiceService(db)
+    with count_statements() as one_line:
+        service.create_invoice(tenant.invoice_data(1))
+
+    with max_statements(one_line.statement_count):
+        service.create_invoice(tenant.invoice_data(5))
+
+
+def test_get_invoice_joins_its_lines(db, tenant, max_statements):
+    service = InvoiceService(db)
+    invoice = service.create_invoice(tenant.invoice_data(5))
+    db.expunge_all()
+
+    with max_statements(1):
+        loaded = service.get_invoice(invoice.id)
+    assert len(loaded.items) == 5
+
+
+def test_get_invoice_fields_skip_the_lines(db, tenant, max_statements):
+    service = InvoiceService(db)
+    invoice = service.create_invoice(tenant.invoice_data(5))
+    db.expunge_all()
+
+    with max_statements(1):
+        service.get_invoice(invoice.id, frozenset({"id", "status"}))
@@ -0,0 +1,81 @@
+import pytest
+from fastapi import HTTPException
+
+from app.auth.models import User
+from app.client.service import ClientService
+from app.invoice.schemas import InvoiceCreate, InvoiceUpdate
+from app.invoice.service import InvoiceService
+from app.utils.tenancy import set_current_owner
+
+
+def test_create_invoice_after_the_session_has_queried(db, tenant):
+    # get_current_user loads the user on the request's session first, so the
+    # session is already in a transaction when the service runs
+    db.get(User, tenant.user_id)
+    assert db.in_transaction()
+
+    invoice = InvoiceService(db).create_invoice(tenant.invoice_data(2))
+
+    assert invoice.owner_id == tenant.user_id
+    assert len(invoice.items) == 2
+
+
+def test_create_invoice_for_another_tenants_client(db, tenant, other_tenant):
+    data = InvoiceCreate(
+        client_id=other_tenant.client_id,
+        items=[{"item_id": tenant.item_ids[0], "quantity": 1, "price": 10}],
+    )
+    with pytest.raises(HTTPException) as raised:
+        InvoiceService(db).create_invoice(data)
+    assert raised.value.status_code == 404
+
+
+def test_create_invoice_with_another_tenants_item(db, tenant, other_tenant):
+    data = InvoiceCreate(
+        client_id=tenant.client_id,
+        items=[
+            {"item_id": tenant.item_ids[0], "quantity": 1, "price": 10},
+            {"item_id": other_tenant.item_ids[0], "quantity": 1, "price": 10},
+        ],
+    )
+    with pytest.raises(HTTPException) as raised:
+        InvoiceService(db).create_invoice(data)
+    assert raised.value.status_code == 404
+
+
+@pytest.fixture
+def other_invoice_id(db, tenant, other_tenant):
+    set_current_owner(db, other_tenant.user_id)
+    invoice = InvoiceService(db).create_invoice(other_tenant.invoice_data(1))
+    set_current_owner(db, tenant.user_id)
+    return invoice.id
+
+
+def test_another_tenants_invoice_is_not_found(db, other_invoice_id):
+    with pytest.raises(HTTPException) as raised:
+        InvoiceService(db).get_invoice(other_invoice_id)
+    assert raised.value.status_code == 404
+
+
+def test_another_tenants_invoice_can_not_be_updated(db, tenant, other_invoice_id):
+    data = InvoiceUpdate(
+        items=[{"item_id": tenant.item_ids[0], "quantity": 1, "price": 10}]
+    )
+    with pytest.raises(HTTPException) as raised:
+        InvoiceService(db).update_invoice(other_invoice_id, data)
+    assert raised.value.status_code == 404
+
+
+def test_another_tenants_invoice_is_not_deleted(
+    db, other_tenant, other_invoice_id
+):
+    InvoiceService(db).delete_invoice(other_invoice_id)
+
+    set_current_owner(db, other_tenant.user_id)
+    assert InvoiceService(db).get_invoice(other_invoice_id).id == other_invoice_id
+
+
+def test_another_tenants_client_is_not_found(db, tenant, other_tenant):
+    with pytest.raises(HTTPException) as raised:
+        ClientService(db).get_client(other_tenant.client_id)
+    assert raised.value.status_code == 404